@@ -0,0 +1,49 @@
+"""Add calendar_sync_jobs table
+
+Revision ID: a4d7e9c2b160
+Revises: c3e8a6d24f91
+Create Date: 2026-10-18 18:12:09.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d7e9c2b160'
+down_revision: Union[str, None] = 'c3e8a6d24f91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'calendar_sync_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('target_type', sa.String(), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('event_id', sa.String(), nullable=True),
+        sa.Column('idempotency_key', sa.String(), nullable=False),
+        sa.Column('revision', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('EN_ATTENTE', 'SYNCHRONISE', 'ECHEC', name='calendarsyncstatus'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('synced_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_calendar_sync_jobs_id'), 'calendar_sync_jobs', ['id'], unique=False)
+    op.create_index('ix_calendar_sync_jobs_status_next_attempt', 'calendar_sync_jobs', ['status', 'next_attempt_at'])
+    op.create_index('ix_calendar_sync_jobs_target_status', 'calendar_sync_jobs', ['target_type', 'target_id', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_calendar_sync_jobs_target_status', table_name='calendar_sync_jobs')
+    op.drop_index('ix_calendar_sync_jobs_status_next_attempt', table_name='calendar_sync_jobs')
+    op.drop_index(op.f('ix_calendar_sync_jobs_id'), table_name='calendar_sync_jobs')
+    op.drop_table('calendar_sync_jobs')
+    sa.Enum(name='calendarsyncstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,26 @@
+"""Add pdf_sha256 to sickness_declarations
+
+Revision ID: a7c4e1f08b52
+Revises: f3a9d2c6b817
+Create Date: 2026-10-18 15:42:10.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e1f08b52'
+down_revision: Union[str, None] = 'f3a9d2c6b817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('sickness_declarations', sa.Column('pdf_sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sickness_declarations', 'pdf_sha256')
@@ -0,0 +1,33 @@
+"""Add stored_files table
+
+Revision ID: b9d2f5a13c76
+Revises: a7c4e1f08b52
+Create Date: 2026-10-18 16:27:48.905112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d2f5a13c76'
+down_revision: Union[str, None] = 'a7c4e1f08b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stored_files',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('storage_ref', sa.String(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stored_files')
@@ -0,0 +1,32 @@
+"""Add stored_file_chunks table
+
+Revision ID: c3e8a6d24f91
+Revises: b9d2f5a13c76
+Create Date: 2026-10-18 17:03:36.441270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a6d24f91'
+down_revision: Union[str, None] = 'b9d2f5a13c76'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stored_file_chunks',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256', 'seq')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stored_file_chunks')
@@ -0,0 +1,38 @@
+"""Add leave_balances table
+
+Revision ID: c41f7a9e2d18
+Revises: 5af70045bede
+Create Date: 2026-10-18 09:12:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a9e2d18'
+down_revision: Union[str, None] = '5af70045bede'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Les soldes sont remplis à la demande; lancer rebuild_leave_balances.py pour tout recalculer
+    op.create_table(
+        'leave_balances',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('period_year', sa.Integer(), nullable=False),
+        sa.Column('used_leave_days', sa.Integer(), nullable=False),
+        sa.Column('sick_days', sa.Integer(), nullable=False),
+        sa.Column('pending_requests', sa.Integer(), nullable=False),
+        sa.Column('approved_requests', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'period_year')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('leave_balances')
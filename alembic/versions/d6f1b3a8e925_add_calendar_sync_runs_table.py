@@ -0,0 +1,44 @@
+"""Add calendar_sync_runs table
+
+Revision ID: d6f1b3a8e925
+Revises: a4d7e9c2b160
+Create Date: 2026-10-18 19:02:47.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6f1b3a8e925'
+down_revision: Union[str, None] = 'a4d7e9c2b160'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'calendar_sync_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('mode', sa.String(), nullable=False),
+        sa.Column('completed', sa.Boolean(), nullable=False),
+        sa.Column('absence_cursor', sa.Integer(), nullable=False),
+        sa.Column('sickness_cursor', sa.Integer(), nullable=False),
+        sa.Column('absences_synced', sa.Integer(), nullable=False),
+        sa.Column('absences_failed', sa.Integer(), nullable=False),
+        sa.Column('sickness_synced', sa.Integer(), nullable=False),
+        sa.Column('sickness_failed', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_calendar_sync_runs_id'), 'calendar_sync_runs', ['id'], unique=False)
+    op.create_index('ix_calendar_sync_runs_mode_completed', 'calendar_sync_runs', ['mode', 'completed'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_calendar_sync_runs_mode_completed', table_name='calendar_sync_runs')
+    op.drop_index(op.f('ix_calendar_sync_runs_id'), table_name='calendar_sync_runs')
+    op.drop_table('calendar_sync_runs')
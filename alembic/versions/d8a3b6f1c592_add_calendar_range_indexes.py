@@ -0,0 +1,31 @@
+"""Add calendar range indexes on absence_requests and sickness_declarations
+
+Revision ID: d8a3b6f1c592
+Revises: c41f7a9e2d18
+Create Date: 2026-10-18 10:41:07.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a3b6f1c592'
+down_revision: Union[str, None] = 'c41f7a9e2d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_absence_requests_user_status_type_start', 'absence_requests', ['user_id', 'status', 'type', 'start_date'])
+    op.create_index('ix_absence_requests_start_end', 'absence_requests', ['start_date', 'end_date'])
+    op.create_index('ix_sickness_declarations_user_start', 'sickness_declarations', ['user_id', 'start_date'])
+    op.create_index('ix_sickness_declarations_start_end', 'sickness_declarations', ['start_date', 'end_date'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sickness_declarations_start_end', table_name='sickness_declarations')
+    op.drop_index('ix_sickness_declarations_user_start', table_name='sickness_declarations')
+    op.drop_index('ix_absence_requests_start_end', table_name='absence_requests')
+    op.drop_index('ix_absence_requests_user_status_type_start', table_name='absence_requests')
@@ -0,0 +1,33 @@
+"""Add (created_at, id) indexes for keyset pagination
+
+Revision ID: e5b2c7d94a31
+Revises: d8a3b6f1c592
+Create Date: 2026-10-18 11:52:36.418207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2c7d94a31'
+down_revision: Union[str, None] = 'd8a3b6f1c592'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_users_created_id', 'users', ['created_at', 'id'])
+    op.create_index('ix_absence_requests_created_id', 'absence_requests', ['created_at', 'id'])
+    op.create_index('ix_absence_requests_user_created_id', 'absence_requests', ['user_id', 'created_at', 'id'])
+    op.create_index('ix_sickness_declarations_created_id', 'sickness_declarations', ['created_at', 'id'])
+    op.create_index('ix_sickness_declarations_user_created_id', 'sickness_declarations', ['user_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sickness_declarations_user_created_id', table_name='sickness_declarations')
+    op.drop_index('ix_sickness_declarations_created_id', table_name='sickness_declarations')
+    op.drop_index('ix_absence_requests_user_created_id', table_name='absence_requests')
+    op.drop_index('ix_absence_requests_created_id', table_name='absence_requests')
+    op.drop_index('ix_users_created_id', table_name='users')
@@ -0,0 +1,36 @@
+"""Add calendar payload hashes and sync tokens
+
+Revision ID: e8c4a1f7d302
+Revises: d6f1b3a8e925
+Create Date: 2026-10-18 19:48:31.552087
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c4a1f7d302'
+down_revision: Union[str, None] = 'd6f1b3a8e925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('absence_requests', 'sickness_declarations'):
+        op.add_column(table, sa.Column('calendar_payload_hash', sa.String(length=64), nullable=True))
+        op.add_column(table, sa.Column('calendar_synced_at', sa.DateTime(), nullable=True))
+    op.add_column('calendar_sync_runs', sa.Column('absences_unchanged', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('calendar_sync_runs', sa.Column('sickness_unchanged', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('calendar_sync_runs', sa.Column('sync_token', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('calendar_sync_runs', 'sync_token')
+    op.drop_column('calendar_sync_runs', 'sickness_unchanged')
+    op.drop_column('calendar_sync_runs', 'absences_unchanged')
+    for table in ('absence_requests', 'sickness_declarations'):
+        op.drop_column(table, 'calendar_synced_at')
+        op.drop_column(table, 'calendar_payload_hash')
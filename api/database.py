@@ -4,6 +4,7 @@ import os
 from datetime import datetime
 
 _pg_conn = None
+_pg_engine = None
 
 def _init_db_postgres(db_url: str):
     """Initialise (si besoin) la base Postgres (Neon) et renvoie une connexion réutilisable."""
@@ -108,6 +109,18 @@ def _init_db_postgres(db_url: str):
         return None
 
 
+def _pooled_postgres_connection(db_url: str):
+    """Connexion psycopg en autocommit issue d'un pool partagé, configuré comme celui de l'application"""
+    global _pg_engine
+    if _pg_engine is None:
+        from sqlalchemy import create_engine, event
+        from app.database import engine_options
+        url = "postgresql+psycopg://" + db_url.split("://", 1)[1]
+        _pg_engine = create_engine(url, **engine_options(url))
+        event.listen(_pg_engine, "connect", lambda dbapi_connection, record: setattr(dbapi_connection, "autocommit", True))
+    return _pg_engine.raw_connection()
+
+
 def init_db():
     """Initialise la base de données persistante (fichier) pour l'environnement serverless.
 
@@ -126,9 +139,8 @@ def init_db():
         # S'assurer que le schéma est prêt (connexion globale d'initialisation)
         _init_db_postgres(db_url)
         try:
-            import psycopg
-            # IMPORTANT: retourner une NOUVELLE connexion par requête
-            return psycopg.connect(db_url, autocommit=True)
+            # Connexion prise dans le pool (rendue au pool par close()), pas une connexion neuve par requête
+            return _pooled_postgres_connection(db_url)
         except Exception:
             pass
 
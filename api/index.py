@@ -1,14 +1,59 @@
 """
-Point d'entrée Vercel pour l'application FastAPI
+Point d'entrée Vercel pour l'application FastAPI.
+Démarrage à froid minimal: /health répond sans charger l'application; app.main (routes, SQLAlchemy,
+services) n'est importé qu'à la première autre requête.
+Le schéma est créé par init_db.py (deploy.sh), sauf pour la base SQLite de repli propre à l'instance
 """
 import os
 import sys
+import json
+import threading
 
 # Ajouter le répertoire parent au PYTHONPATH pour les imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Importer l'application FastAPI principale
-from app.main import app
+_application = None
+_lock = threading.Lock()
+
+def get_application():
+    """Application FastAPI principale, importée une seule fois"""
+    global _application
+    if _application is None:
+        with _lock:
+            if _application is None:
+                from app.main import app as application
+                from init_db import init_ephemeral_db
+                init_ephemeral_db()
+                _application = application
+    return _application
+
+async def _health(send):
+    body = json.dumps({"status": "OK", "environment": os.getenv("ENVIRONMENT", "development")}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _lifespan(receive, send):
+    # Rien à initialiser au démarrage: l'application est chargée à la première requête
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    """Application ASGI servie par Vercel"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/health" and scope["method"] == "GET":
+        await _health(send)
+    else:
+        await get_application()(scope, receive, send)
 
 # Vercel utilise cette variable pour servir l'application
 handler = app
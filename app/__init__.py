@@ -0,0 +1,7 @@
+"""
+Application de gestion des absences.
+Le fichier .env est chargé une seule fois, à l'import du paquet, avant les modules qui lisent la configuration
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,98 @@
+"""
+Pièces jointes lues et encodées en base64 par morceaux depuis le disque
+"""
+import os
+import json
+import uuid
+import base64
+import mimetypes
+from email.mime.application import MIMEApplication
+from email.encoders import encode_noop
+from typing import Iterator, List, Tuple
+
+# Multiple de 57 (= 3 x 19): chaque morceau s'encode sans padding et en lignes MIME de 76 caractères
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+MIME_LINE_LENGTH = 76
+
+class FileAttachment:
+    """Pièce jointe sur disque, jamais chargée entièrement en mémoire"""
+
+    def __init__(self, path: str, filename: str = None, content_type: str = None, chunk_size: int = ATTACHMENT_CHUNK_SIZE):
+        if chunk_size % 57:
+            raise ValueError("La taille des morceaux doit être un multiple de 57 octets")
+        self.path = path
+        self.filename = filename or os.path.basename(path)
+        self.content_type = content_type or mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+        self.chunk_size = chunk_size
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    @property
+    def encoded_size(self) -> int:
+        """Taille du contenu encodé en base64 (sans retours à la ligne)"""
+        return 4 * ((self.size + 2) // 3)
+
+    def iter_base64(self, line_length: int = None) -> Iterator[bytes]:
+        """Contenu encodé en base64, morceau par morceau (coupé en lignes si line_length)"""
+        with open(self.path, "rb", buffering=0) as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                encoded = base64.b64encode(chunk)
+                if line_length:
+                    encoded = b"".join(
+                        encoded[i:i + line_length] + b"\n" for i in range(0, len(encoded), line_length)
+                    )
+                yield encoded
+
+    def mime_part(self) -> MIMEApplication:
+        """Partie MIME encodée en base64 directement depuis le disque"""
+        maintype, subtype = self.content_type.split("/", 1)
+        part = MIMEApplication(b"", subtype, _encoder=encode_noop)
+        if maintype != "application":
+            part.replace_header("Content-Type", self.content_type)
+        # Un seul tampon: le texte base64 final, sans copie des octets bruts
+        part.set_payload("".join(chunk.decode("ascii") for chunk in self.iter_base64(MIME_LINE_LENGTH)))
+        part["Content-Transfer-Encoding"] = "base64"
+        part.add_header("Content-Disposition", "attachment", filename=self.filename)
+        return part
+
+def _split_json(payload: dict) -> Tuple[List[bytes], List[FileAttachment]]:
+    """
+    Sérialiser le payload en JSON en laissant un emplacement pour chaque pièce jointe:
+    renvoie les fragments de JSON et les pièces jointes à insérer entre eux
+    """
+    files = []
+    placeholder = f"attachment-{uuid.uuid4().hex}"
+
+    def default(value):
+        if isinstance(value, FileAttachment):
+            files.append(value)
+            return placeholder
+        raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+    document = json.dumps(payload, default=default)
+    return [fragment.encode() for fragment in document.split(placeholder)], files
+
+def json_stream_length(payload: dict) -> int:
+    """Taille exacte en octets du JSON produit par iter_json"""
+    fragments, files = _split_json(payload)
+    return sum(len(fragment) for fragment in fragments) + sum(attachment.encoded_size for attachment in files)
+
+def iter_json(payload: dict) -> Iterator[bytes]:
+    """JSON du payload généré au fil de l'eau, les pièces jointes encodées par morceaux"""
+    fragments, files = _split_json(payload)
+    yield fragments[0]
+    for attachment, fragment in zip(files, fragments[1:]):
+        yield from attachment.iter_base64()
+        yield fragment
+
+def has_file_attachment(payload: dict) -> bool:
+    """Le payload contient-il une pièce jointe à lire sur disque"""
+    return any(
+        isinstance(attachment.get("content"), FileAttachment)
+        for attachment in (payload.get("attachments") or [])
+    )
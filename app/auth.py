@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
@@ -5,14 +6,15 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
-from dotenv import load_dotenv
+import time
+import hashlib
+import threading
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app import crud, schemas, models
 
-load_dotenv()
-
 # Configuration sécurisée
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
@@ -21,9 +23,89 @@ if not SECRET_KEY:
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Cache des utilisateurs authentifiés par token: pas de requête SQL tant que l'entrée est valide.
+# Invalidé par crud.update_user/delete_user dans l'instance; la durée de vie borne l'écart entre instances
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+# Autoriser sur les seules revendications du token (uid, role, active), sans base de données:
+# un changement de rôle ou une désactivation ne prend alors effet qu'à l'expiration du token
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+class Principal:
+    """Utilisateur authentifié, réduit aux champs nécessaires aux autorisations"""
+    __slots__ = ("id", "email", "role", "is_active")
+
+    def __init__(self, id: int, email: str, role: models.UserRole, is_active: bool):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.id, user.email, user.role, user.is_active)
+
+class PrincipalCache:
+    """Cache LRU à courte durée de vie des utilisateurs authentifiés, par empreinte SHA-256 du token"""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # empreinte -> (Principal, échéance time.monotonic())
+        self._lock = threading.Lock()
+        # Incrémenté à chaque invalidation: une lecture commencée avant n'est pas mise en cache
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Principal]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, token: str, principal: Principal, expires_at: Optional[float], generation: int):
+        """Mettre en cache jusqu'à la fin de la durée de vie, sans dépasser l'expiration du token (timestamp)"""
+        lifetime = self.ttl if expires_at is None else min(self.ttl, expires_at - time.time())
+        if lifetime <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            key = self._key(token)
+            self._entries[key] = (principal, time.monotonic() + lifetime)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Oublier les tokens d'un utilisateur modifié ou supprimé"""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key, (principal, _) in self._entries.items() if principal.id == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+# Instance globale
+principal_cache = PrincipalCache()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Vérifier le mot de passe"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -41,6 +123,10 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[models
         return None
     return user
 
+def principal_claims(user: models.User) -> dict:
+    """Revendications d'un token d'accès: email (sub) et champs d'autorisation"""
+    return {"sub": user.email, "uid": user.id, "role": user.role.value, "active": user.is_active}
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Créer un token d'accès JWT"""
     to_encode = data.copy()
@@ -52,36 +138,91 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
-    """Récupérer l'utilisateur actuel depuis le token"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_token(token: str) -> dict:
+    """Revendications d'un token valide (sub obligatoire)"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        if payload.get("sub") is None:
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    user = crud.get_user_by_email(db, email=email)
+        raise _credentials_exception()
+    return payload
+
+def _ensure_active(user: models.User) -> models.User:
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+def _ensure_admin(user: models.User) -> models.User:
+    if user.role != models.UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return user
+
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+    """Récupérer l'utilisateur actuel depuis le token"""
+    user = crud.get_user_by_email(db, email=_decode_token(token)["sub"])
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
 def get_current_active_user(current_user: models.User = Depends(get_current_user)) -> models.User:
     """Récupérer l'utilisateur actuel actif"""
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+    return _ensure_active(current_user)
 
 async def get_current_admin_user(current_user: models.User = Depends(get_current_active_user)) -> models.User:
     """Obtenir l'utilisateur connecté avec rôle admin"""
-    if current_user.role != models.UserRole.ADMIN:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    return current_user
\ No newline at end of file
+    return _ensure_admin(current_user)
+
+# Variantes pour les routes qui utilisent get_async_db: une seule session (asynchrone) par requête
+
+async def get_current_user_async(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)) -> models.User:
+    """Récupérer l'utilisateur actuel depuis le token (session asynchrone)"""
+    user = await crud.get_user_by_email_async(db, email=_decode_token(token)["sub"])
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+async def get_current_active_user_async(current_user: models.User = Depends(get_current_user_async)) -> models.User:
+    """Récupérer l'utilisateur actuel actif (session asynchrone)"""
+    return _ensure_active(current_user)
+
+async def get_current_admin_user_async(current_user: models.User = Depends(get_current_active_user_async)) -> models.User:
+    """Obtenir l'utilisateur connecté avec rôle admin (session asynchrone)"""
+    return _ensure_admin(current_user)
+
+# Autorisation seule (id, rôle, actif): sans requête SQL tant que le token est en cache
+
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """Utilisateur authentifié (cache par token, puis revendications du token ou base de données)"""
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    payload = _decode_token(token)
+    generation = principal_cache.generation
+    if AUTH_TRUST_TOKEN_CLAIMS and "uid" in payload and "role" in payload:
+        principal = Principal(payload["uid"], payload["sub"], models.UserRole(payload["role"]), payload.get("active", True))
+    else:
+        user = await crud.get_user_by_email_async(db, email=payload["sub"])
+        if user is None:
+            raise _credentials_exception()
+        principal = Principal.from_user(user)
+    principal_cache.put(token, principal, payload.get("exp"), generation)
+    return principal
+
+async def get_current_active_principal(principal: Principal = Depends(get_current_principal)) -> Principal:
+    """Utilisateur authentifié actif (autorisation seule)"""
+    return _ensure_active(principal)
+
+async def get_current_admin_principal(principal: Principal = Depends(get_current_active_principal)) -> Principal:
+    """Administrateur authentifié (autorisation seule)"""
+    return _ensure_admin(principal)
@@ -0,0 +1,210 @@
+"""
+Synchronisation Google Calendar en arrière-plan (calendar_sync_jobs)
+"""
+import os
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import crud
+from app.google_calendar_service import BATCH_SIZE, google_calendar_service
+
+logger = logging.getLogger(__name__)
+
+# Tolérance entre l'horloge locale et celle de Google pour détecter une modification distante
+REMOTE_CLOCK_SKEW = timedelta(seconds=30)
+
+def _idempotency_key(target, key: str):
+    """
+    ID idempotent de la création, conservé si l'ID enregistré a été perdu après un envoi réussi
+    (point de reprise non enregistré): le 409 renvoie alors l'événement existant.
+    Un événement supprimé dans Google garde son ID: sa recréation (empreinte effacée par
+    la lecture des modifications distantes) laisse Google en attribuer un nouveau
+    """
+    deleted_remotely = target.calendar_synced_at is not None and target.calendar_payload_hash is None
+    return None if deleted_remotely else key
+
+def _needs_push(target, payload_hash: str) -> bool:
+    """Événement absent, données modifiées depuis le dernier envoi, ou cible modifiée après celui-ci"""
+    return (
+        not target.google_calendar_event_id
+        or target.calendar_payload_hash != payload_hash
+        or target.calendar_synced_at is None
+        or target.updated_at.replace(tzinfo=None) > target.calendar_synced_at
+    )
+
+def _remote_updated(event: dict) -> datetime:
+    """Date de dernière modification d'un événement Google (UTC, sans fuseau)"""
+    updated = datetime.fromisoformat(event['updated'].replace('Z', '+00:00'))
+    return updated.astimezone(timezone.utc).replace(tzinfo=None)
+
+class CalendarSyncService:
+    """Exécute les jobs de synchronisation Google Calendar avec nouvelles tentatives et backoff"""
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("CALENDAR_SYNC_BATCH_SIZE", "50"))
+        # "background": après la réponse (pool de threads), "cron": uniquement via /google-calendar/drain
+        self.dispatch_mode = os.getenv("CALENDAR_SYNC_DISPATCH", "background")
+        # Durée maximale d'un appel à /google-calendar/sync ou /resync avant interruption (secondes)
+        self.time_budget = float(os.getenv("CALENDAR_SYNC_TIME_BUDGET", "20"))
+
+    def request(self, db: Session, target, action: str = crud.calendar_sync.UPSERT):
+        """Planifier la synchronisation d'une cible (sans commit), si Google Calendar est configuré"""
+        if google_calendar_service.is_enabled():
+            return crud.enqueue_calendar_sync(db, target, action)
+        return None
+
+    def _sync(self, db: Session, job) -> bool:
+        """Appliquer l'état actuel de la cible dans Google Calendar"""
+        if job.action == crud.calendar_sync.DELETE:
+            return google_calendar_service.delete_event(job.event_id)
+
+        target = crud.get_calendar_sync_target(db, job)
+        if target is None:
+            return True  # Supprimée depuis: le job de suppression s'en charge
+        is_absence = job.target_type == crud.ABSENCE_REQUEST
+        payload_hash = google_calendar_service.payload_hash(self._event_data(job.target_type, target))
+        event_id = target.google_calendar_event_id
+        if event_id:
+            if target.calendar_payload_hash == payload_hash:
+                return True  # Événement déjà à jour
+            update = google_calendar_service.update_event if is_absence else google_calendar_service.update_sickness_event
+            if not update(event_id, target):
+                return False
+        else:
+            create = google_calendar_service.create_event if is_absence else google_calendar_service.create_sickness_event
+            event_id = create(target, event_id=_idempotency_key(target, job.idempotency_key))
+            if not event_id:
+                return False
+        crud.set_calendar_sync_state(db, job, event_id, payload_hash)
+        return True
+
+    def deliver(self, db: Session, job) -> bool:
+        """Exécuter un job réservé et enregistrer le résultat"""
+        revision = job.revision
+        try:
+            synced = self._sync(db, job)
+            error = None if synced else "Appel à l'API Google Calendar en échec"
+        except Exception as e:
+            db.rollback()
+            synced, error = False, str(e)
+
+        if synced:
+            crud.mark_calendar_sync_done(db, job, revision)
+        else:
+            logger.warning(f"Échec de la synchronisation {job.id} ({job.target_type} {job.target_id}): {error}")
+            crud.mark_calendar_sync_failed(db, job, error)
+        return synced
+
+    def drain(self, db: Session, limit: int = None) -> dict:
+        """Exécuter les jobs en attente dont la tentative est échue"""
+        synced = failed = 0
+        for job in crud.get_due_calendar_sync_jobs(db, limit=limit or self.batch_size):
+            if not crud.claim_calendar_sync_job(db, job):
+                continue  # Déjà pris par un autre worker
+            if self.deliver(db, job):
+                synced += 1
+            else:
+                failed += 1
+        return {"synced": synced, "failed": failed}
+
+    @staticmethod
+    def _event_data(target_type: str, target) -> dict:
+        if target_type == crud.ABSENCE_REQUEST:
+            return google_calendar_service._build_event_data(target)
+        return google_calendar_service._build_sickness_event_data(target)
+
+    def run_full_sync(self, db: Session, mode: str, time_budget: float = None):
+        """
+        Synchroniser toutes les absences puis toutes les déclarations par requêtes batch.
+        Seules les cibles dont les données ont changé depuis le dernier envoi sont envoyées.
+        La progression est enregistrée après chaque vague de batchs parallèles: une fois le budget
+        de temps dépassé l'appel s'arrête, et l'appel suivant reprend au point de reprise
+        """
+        run = crud.get_calendar_sync_run(db, mode) or crud.start_calendar_sync_run(db, mode)
+        deadline = time.monotonic() + (self.time_budget if time_budget is None else time_budget)
+        wave_size = BATCH_SIZE * google_calendar_service.batch_concurrency
+        progress = (
+            (crud.ABSENCE_REQUEST, "absence_cursor", "absences_synced", "absences_failed", "absences_unchanged"),
+            (crud.SICKNESS_DECLARATION, "sickness_cursor", "sickness_synced", "sickness_failed", "sickness_unchanged")
+        )
+        for target_type, cursor, synced, failed, unchanged in progress:
+            while True:
+                targets = crud.get_calendar_sync_candidates(db, target_type, mode, getattr(run, cursor), wave_size)
+                if not targets:
+                    break
+                pending = []
+                for target in targets:
+                    event_data = self._event_data(target_type, target)
+                    payload_hash = google_calendar_service.payload_hash(event_data)
+                    if _needs_push(target, payload_hash):
+                        pending.append((target, event_data, payload_hash))
+                results = google_calendar_service.batch_upsert([
+                    (str(target.id), event_data, target.google_calendar_event_id,
+                     _idempotency_key(target, crud.calendar_idempotency_key(target)))
+                    for target, event_data, _ in pending
+                ]) if pending else {}
+                states = [
+                    {
+                        "id": target.id,
+                        "google_calendar_event_id": results[str(target.id)],
+                        "calendar_payload_hash": payload_hash,
+                        "updated_at": target.updated_at
+                    }
+                    for target, _, payload_hash in pending
+                    if results.get(str(target.id))
+                ]
+                crud.save_calendar_sync_states(db, target_type, states)
+                setattr(run, synced, getattr(run, synced) + len(states))
+                setattr(run, failed, getattr(run, failed) + len(pending) - len(states))
+                setattr(run, unchanged, getattr(run, unchanged) + len(targets) - len(pending))
+                setattr(run, cursor, targets[-1].id)
+                db.commit()  # Point de reprise
+                if len(targets) < wave_size:
+                    break
+                if time.monotonic() >= deadline:
+                    return run
+        run.completed = True
+        db.commit()
+        return run
+
+    def pull_remote_changes(self, db: Session) -> dict:
+        """
+        Lire les événements modifiés ou supprimés dans Google Calendar depuis la passe précédente (syncToken).
+        Un événement supprimé est recréé, un événement modifié après notre dernier envoi est renvoyé,
+        à la prochaine resync
+        """
+        last_pull = crud.get_last_calendar_pull(db)
+        events, sync_token = google_calendar_service.list_event_changes(last_pull.sync_token if last_pull else None)
+        events_by_id = {event['id']: event for event in events}
+        modified = deleted = 0
+        for target in crud.get_calendar_targets_by_event_ids(db, list(events_by_id)):
+            event = events_by_id[target.google_calendar_event_id]
+            if event.get('status') == 'cancelled':
+                crud.reset_calendar_sync_state(db, target, event_deleted=True)
+                deleted += 1
+            elif target.calendar_synced_at and _remote_updated(event) > target.calendar_synced_at + REMOTE_CLOCK_SKEW:
+                crud.reset_calendar_sync_state(db, target, event_deleted=False)
+                modified += 1
+        crud.record_calendar_pull(db, sync_token)
+        return {"modified": modified, "deleted": deleted}
+
+    def _drain_with_bind(self, bind):
+        """Exécuter les jobs dans une session dédiée (hors requête HTTP)"""
+        db = sessionmaker(autocommit=False, autoflush=False, bind=bind)()
+        try:
+            self.drain(db)
+        except Exception as e:
+            logger.error(f"Erreur lors de la synchronisation Google Calendar: {e}")
+        finally:
+            db.close()
+
+    def schedule(self, background_tasks: BackgroundTasks, db: Session):
+        """Planifier la synchronisation après la réponse HTTP (exécutée dans le pool de threads)"""
+        if self.dispatch_mode == "background" and google_calendar_service.is_enabled():
+            background_tasks.add_task(self._drain_with_bind, db.get_bind())
+
+# Instance globale
+calendar_sync_service = CalendarSyncService()
@@ -3,6 +3,11 @@ from .users import (
     get_user,
     get_user_by_email,
     get_users,
+    get_users_page,
+    get_user_async,
+    get_user_by_email_async,
+    get_users_async,
+    get_users_page_async,
     create_user,
     update_user,
     delete_user
@@ -11,25 +16,98 @@ from .users import (
 from .absences import (
     get_absence_request,
     get_absence_requests,
+    get_absence_requests_page,
+    get_absence_requests_async,
+    get_absence_requests_page_async,
+    add_absence_request,
     create_absence_request,
+    add_admin_absence,
     create_admin_absence,
     update_absence_request,
     update_absence_request_status,
     delete_absence_request,
+    overlap_filter,
     get_calendar_events
 )
 
+from .calendar_events import (
+    ABSENCE_REQUEST,
+    SICKNESS_DECLARATION,
+    get_calendar_event_rows,
+    get_calendar_event_rows_async,
+    get_approved_vacation_periods,
+    get_approved_vacation_periods_async
+)
+
 from .calculations import (
     calculate_business_days,
     calculate_used_leave_days,
     get_dashboard_data,
+    get_dashboard_data_async,
     get_user_absence_summary
 )
 
+from .pagination import (
+    encode_cursor,
+    decode_cursor
+)
+
+from .balances import (
+    compute_balances
+)
+
+from .ledger import (
+    sickness_snapshot,
+    rebuild_ledger
+)
+
+from .notifications import (
+    enqueue_notification,
+    get_due_notifications,
+    claim_notification,
+    mark_notification_sent,
+    mark_notification_failed,
+    cancel_pending_notifications,
+    get_notification_counts
+)
+
+from .calendar_sync import (
+    calendar_idempotency_key,
+    enqueue_calendar_sync,
+    get_calendar_sync_target,
+    set_calendar_sync_state,
+    get_due_calendar_sync_jobs,
+    claim_calendar_sync_job,
+    mark_calendar_sync_done,
+    mark_calendar_sync_failed,
+    get_calendar_sync_counts,
+    get_calendar_sync_candidates,
+    save_calendar_sync_states,
+    get_calendar_targets_by_event_ids,
+    reset_calendar_sync_state,
+    get_last_calendar_pull,
+    record_calendar_pull,
+    get_calendar_sync_run,
+    start_calendar_sync_run
+)
+
+from .files import (
+    get_stored_file,
+    acquire_stored_file,
+    reserve_stored_file,
+    release_stored_file,
+    cancel_stored_file
+)
+
 from .sickness import (
     get_sickness_declaration,
     get_sickness_declarations,
+    get_sickness_declarations_page,
+    get_sickness_declarations_async,
+    get_sickness_declarations_page_async,
     create_sickness_declaration,
+    delete_sickness_declaration,
+    discard_sickness_declaration,
     update_sickness_declaration_file,
     mark_sickness_declaration_email_sent,
     mark_sickness_declaration_viewed
@@ -41,6 +119,11 @@ __all__ = [
     'get_user',
     'get_user_by_email', 
     'get_users',
+    'get_users_page',
+    'get_user_async',
+    'get_user_by_email_async',
+    'get_users_async',
+    'get_users_page_async',
     'create_user',
     'update_user',
     'delete_user',
@@ -48,23 +131,85 @@ __all__ = [
     # Absences
     'get_absence_request',
     'get_absence_requests',
+    'get_absence_requests_page',
+    'get_absence_requests_async',
+    'get_absence_requests_page_async',
+    'add_absence_request',
     'create_absence_request',
+    'add_admin_absence',
     'create_admin_absence',
     'update_absence_request',
     'update_absence_request_status',
     'delete_absence_request',
+    'overlap_filter',
     'get_calendar_events',
     
+    # Calendar
+    'ABSENCE_REQUEST',
+    'SICKNESS_DECLARATION',
+    'get_calendar_event_rows',
+    'get_calendar_event_rows_async',
+    'get_approved_vacation_periods',
+    'get_approved_vacation_periods_async',
+    
     # Calculations
     'calculate_business_days',
     'calculate_used_leave_days',
     'get_dashboard_data',
+    'get_dashboard_data_async',
     'get_user_absence_summary',
+    'compute_balances',
+    'sickness_snapshot',
+    'rebuild_ledger',
+    
+    # Pagination
+    'encode_cursor',
+    'decode_cursor',
+    
+    # Notifications
+    'enqueue_notification',
+    'get_due_notifications',
+    'claim_notification',
+    'mark_notification_sent',
+    'mark_notification_failed',
+    'cancel_pending_notifications',
+    'get_notification_counts',
+    
+    # Calendar sync
+    'calendar_idempotency_key',
+    'enqueue_calendar_sync',
+    'get_calendar_sync_target',
+    'set_calendar_sync_state',
+    'get_due_calendar_sync_jobs',
+    'claim_calendar_sync_job',
+    'mark_calendar_sync_done',
+    'mark_calendar_sync_failed',
+    'get_calendar_sync_counts',
+    'get_calendar_sync_candidates',
+    'save_calendar_sync_states',
+    'get_calendar_targets_by_event_ids',
+    'reset_calendar_sync_state',
+    'get_last_calendar_pull',
+    'record_calendar_pull',
+    'get_calendar_sync_run',
+    'start_calendar_sync_run',
+    
+    # Files
+    'get_stored_file',
+    'acquire_stored_file',
+    'reserve_stored_file',
+    'release_stored_file',
+    'cancel_stored_file',
     
     # Sickness
     'get_sickness_declaration',
     'get_sickness_declarations',
+    'get_sickness_declarations_page',
+    'get_sickness_declarations_async',
+    'get_sickness_declarations_page_async',
     'create_sickness_declaration',
+    'delete_sickness_declaration',
+    'discard_sickness_declaration',
     'update_sickness_declaration_file',
     'mark_sickness_declaration_email_sent',
     'mark_sickness_declaration_viewed'
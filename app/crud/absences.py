@@ -1,32 +1,62 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 from app import models, schemas
+from .ledger import absence_snapshot, apply_absence_change
+from .pagination import keyset_page, keyset_page_async
 # Google Calendar supprimé
 
 def get_absence_request(db: Session, request_id: int) -> Optional[models.AbsenceRequest]:
     """Récupérer une demande d'absence par ID"""
-    return db.query(models.AbsenceRequest).filter(models.AbsenceRequest.id == request_id).first()
+    return db.query(models.AbsenceRequest).options(
+        joinedload(models.AbsenceRequest.user),
+        joinedload(models.AbsenceRequest.approved_by)
+    ).filter(models.AbsenceRequest.id == request_id).first()
 
-def get_absence_requests(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None, status: Optional[models.AbsenceStatus] = None) -> List[models.AbsenceRequest]:
-    """Récupérer les demandes d'absence avec filtres optionnels"""
+def _absence_requests_statement(user_id: Optional[int] = None, status: Optional[models.AbsenceStatus] = None):
+    """Requête des demandes d'absence avec filtres optionnels"""
     # Charger les relations nécessaires pour la sérialisation (évite user=None côté frontend)
-    query = db.query(models.AbsenceRequest).options(
+    statement = select(models.AbsenceRequest).options(
         joinedload(models.AbsenceRequest.user),
         joinedload(models.AbsenceRequest.approved_by)
     )
     
     if user_id:
-        query = query.filter(models.AbsenceRequest.user_id == user_id)
+        statement = statement.where(models.AbsenceRequest.user_id == user_id)
     if status:
-        query = query.filter(models.AbsenceRequest.status == status)
-    
-    return query.order_by(models.AbsenceRequest.created_at.desc()).offset(skip).limit(limit).all()
+        statement = statement.where(models.AbsenceRequest.status == status)
+    return statement
 
-def create_absence_request(db: Session, request: schemas.AbsenceRequestCreate, user_id: int) -> models.AbsenceRequest:
-    """Créer une nouvelle demande d'absence"""
+def _absence_requests_list(skip: int, limit: int, user_id: Optional[int], status: Optional[models.AbsenceStatus]):
+    statement = _absence_requests_statement(user_id=user_id, status=status)
+    return statement.order_by(models.AbsenceRequest.created_at.desc()).offset(skip).limit(limit)
+
+def get_absence_requests(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None, status: Optional[models.AbsenceStatus] = None) -> List[models.AbsenceRequest]:
+    """Récupérer les demandes d'absence avec filtres optionnels"""
+    return db.scalars(_absence_requests_list(skip, limit, user_id, status)).all()
+
+def get_absence_requests_page(db: Session, cursor: Optional[str] = None, limit: int = 100, user_id: Optional[int] = None, status: Optional[models.AbsenceStatus] = None) -> Tuple[List[models.AbsenceRequest], Optional[str]]:
+    """Récupérer une page de demandes d'absence après le curseur (created_at, id)"""
+    statement = _absence_requests_statement(user_id=user_id, status=status)
+    return keyset_page(db, statement, models.AbsenceRequest, cursor, limit)
+
+async def get_absence_requests_async(db: AsyncSession, skip: int = 0, limit: int = 100, user_id: Optional[int] = None, status: Optional[models.AbsenceStatus] = None) -> List[models.AbsenceRequest]:
+    """Variante asynchrone de get_absence_requests"""
+    return (await db.scalars(_absence_requests_list(skip, limit, user_id, status))).all()
+
+async def get_absence_requests_page_async(db: AsyncSession, cursor: Optional[str] = None, limit: int = 100, user_id: Optional[int] = None, status: Optional[models.AbsenceStatus] = None) -> Tuple[List[models.AbsenceRequest], Optional[str]]:
+    """Variante asynchrone de get_absence_requests_page"""
+    statement = _absence_requests_statement(user_id=user_id, status=status)
+    return await keyset_page_async(db, statement, models.AbsenceRequest, cursor, limit)
+
+def add_absence_request(db: Session, request: schemas.AbsenceRequestCreate, user_id: int) -> models.AbsenceRequest:
+    """
+    Ajouter une nouvelle demande d'absence (sans commit): son ID est attribué,
+    les écritures liées (synchronisation du calendrier) partagent son commit
+    """
     db_request = models.AbsenceRequest(
         user_id=user_id,
         type=request.type,
@@ -35,12 +65,19 @@ def create_absence_request(db: Session, request: schemas.AbsenceRequestCreate, u
         reason=request.reason
     )
     db.add(db_request)
+    db.flush()  # Appliquer les valeurs par défaut (statut) avant de capturer l'état
+    apply_absence_change(db, None, absence_snapshot(db_request))
+    return db_request
+
+def create_absence_request(db: Session, request: schemas.AbsenceRequestCreate, user_id: int) -> models.AbsenceRequest:
+    """Créer une nouvelle demande d'absence"""
+    db_request = add_absence_request(db, request, user_id)
     db.commit()
     db.refresh(db_request)
     return db_request
 
-def create_admin_absence(db: Session, request: schemas.AdminAbsenceCreate, admin_id: int) -> models.AbsenceRequest:
-    """Créer une nouvelle absence par un administrateur"""
+def add_admin_absence(db: Session, request: schemas.AdminAbsenceCreate, admin_id: int) -> models.AbsenceRequest:
+    """Ajouter une nouvelle absence par un administrateur (sans commit)"""
     db_request = models.AbsenceRequest(
         user_id=request.user_id,
         type=request.type,
@@ -52,11 +89,15 @@ def create_admin_absence(db: Session, request: schemas.AdminAbsenceCreate, admin
         approved_by_id=admin_id
     )
     db.add(db_request)
+    db.flush()  # Appliquer les valeurs par défaut (statut) avant de capturer l'état
+    apply_absence_change(db, None, absence_snapshot(db_request))
+    return db_request
+
+def create_admin_absence(db: Session, request: schemas.AdminAbsenceCreate, admin_id: int) -> models.AbsenceRequest:
+    """Créer une nouvelle absence par un administrateur"""
+    db_request = add_admin_absence(db, request, admin_id)
     db.commit()
     db.refresh(db_request)
-    
-    # Intégration Google Calendar supprimée
-    
     return db_request
 
 def update_absence_request(db: Session, request_id: int, request_update: schemas.AbsenceRequestUpdate) -> Optional[models.AbsenceRequest]:
@@ -65,12 +106,14 @@ def update_absence_request(db: Session, request_id: int, request_update: schemas
     if not db_request:
         return None
     
+    before = absence_snapshot(db_request)
     update_data = request_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_request, field, value)
     
     # Intégration Google Calendar supprimée
     
+    apply_absence_change(db, before, absence_snapshot(db_request))
     db.commit()
     db.refresh(db_request)
     return db_request
@@ -81,13 +124,14 @@ def update_absence_request_status(db: Session, request_id: int, admin_update: sc
     if not db_request:
         return None
     
-    old_status = db_request.status
+    before = absence_snapshot(db_request)
     db_request.status = admin_update.status
     db_request.admin_comment = admin_update.admin_comment
     db_request.approved_by_id = admin_id
     
     # Intégration Google Calendar supprimée
     
+    apply_absence_change(db, before, absence_snapshot(db_request))
     db.commit()
     db.refresh(db_request)
     return db_request
@@ -100,19 +144,26 @@ def delete_absence_request(db: Session, request_id: int) -> bool:
     
     # Intégration Google Calendar supprimée
     
+    before = absence_snapshot(db_request)
     db.delete(db_request)
+    apply_absence_change(db, before, None)
     db.commit()
     return True
 
+def overlap_filter(model, start_date: date, end_date: date):
+    """
+    Filtre des périodes [start_date, end_date] du modèle qui chevauchent la plage demandée.
+    Forme compatible avec les index (start_date, end_date) et (user_id, ..., start_date)
+    """
+    return and_(model.start_date <= end_date, model.end_date >= start_date)
+
 def get_calendar_events(db: Session, start_date: date, end_date: date) -> List[models.AbsenceRequest]:
     """Récupérer les événements pour le calendrier"""
-    return db.query(models.AbsenceRequest).filter(
+    return db.query(models.AbsenceRequest).options(
+        joinedload(models.AbsenceRequest.user)
+    ).filter(
         and_(
             models.AbsenceRequest.status == models.AbsenceStatus.APPROUVE,
-            or_(
-                and_(models.AbsenceRequest.start_date >= start_date, models.AbsenceRequest.start_date <= end_date),
-                and_(models.AbsenceRequest.end_date >= start_date, models.AbsenceRequest.end_date <= end_date),
-                and_(models.AbsenceRequest.start_date <= start_date, models.AbsenceRequest.end_date >= end_date)
-            )
+            overlap_filter(models.AbsenceRequest, start_date, end_date)
         )
-    ).all() 
\ No newline at end of file
+    ).all()
\ No newline at end of file
@@ -0,0 +1,110 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, literal, select, union_all, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from datetime import datetime, date
+
+from app import models, schemas
+from app.working_calendar import working_calendar
+
+class day_number(FunctionElement):
+    """Nombre de jours écoulés depuis le 1970-01-01 (SQLite et PostgreSQL)"""
+    type = Integer()
+    inherit_cache = True
+
+@compiles(day_number)
+def _compile_day_number(element, compiler, **kw):
+    # PostgreSQL: la différence de deux dates est un entier
+    return "(%s - DATE '1970-01-01')" % compiler.process(element.clauses, **kw)
+
+@compiles(day_number, "sqlite")
+def _compile_day_number_sqlite(element, compiler, **kw):
+    return "CAST(julianday(%s) - 2440587.5 AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+def _weekdays_before(days_since_monday):
+    """Jours du lundi au vendredi dans [lundi 1969-12-29, jour) en forme close"""
+    remainder = days_since_monday % 7
+    return (days_since_monday // 7) * 5 + case((remainder > 5, 5), else_=remainder)
+
+def business_days_sql(start_column, end_column, window_start: date, window_end: date):
+    """
+    Expression SQL du nombre de jours ouvrés entre deux colonnes date (incluses),
+    équivalente à working_calendar.business_days pour les dates de la fenêtre
+    """
+    # Le 1970-01-01 est un jeudi: +3 pour compter depuis le lundi précédent
+    start_number = day_number(start_column) + 3
+    end_number = day_number(end_column) + 4
+    weekdays = _weekdays_before(end_number) - _weekdays_before(start_number)
+    for holiday in working_calendar.holidays_between(window_start, window_end):
+        weekdays = weekdays - case((and_(start_column <= holiday, end_column >= holiday), 1), else_=0)
+    return weekdays
+
+def aggregate_dashboard_data(db: Session, user_id: int, year: int = None) -> schemas.DashboardData:
+    """
+    Calculer les données du tableau de bord depuis les tables sources en une seule requête
+    (agrégats conditionnels sur absence_requests et sickness_declarations)
+    """
+    if year is None:
+        year = datetime.now().year
+    leave_start, leave_end = date(year, 6, 1), date(year + 1, 5, 31)
+    sick_start, sick_end = date(year, 1, 1), date(year, 12, 31)
+    approved = models.AbsenceStatus.APPROUVE
+
+    absences = select(
+        models.AbsenceRequest.user_id,
+        literal(1).label("is_request"),
+        case((models.AbsenceRequest.type == models.AbsenceType.VACANCES, 1), else_=0).label("is_vacation"),
+        case(
+            (models.AbsenceRequest.status == models.AbsenceStatus.EN_ATTENTE, 1),
+            (models.AbsenceRequest.status == approved, 2),
+            else_=0
+        ).label("status_code"),
+        models.AbsenceRequest.start_date,
+        models.AbsenceRequest.end_date
+    ).where(models.AbsenceRequest.user_id == user_id)
+    # Les déclarations de maladie sont toujours approuvées
+    declarations = select(
+        models.SicknessDeclaration.user_id,
+        literal(0).label("is_request"),
+        literal(0).label("is_vacation"),
+        literal(2).label("status_code"),
+        models.SicknessDeclaration.start_date,
+        models.SicknessDeclaration.end_date
+    ).where(models.SicknessDeclaration.user_id == user_id)
+    events = union_all(absences, declarations).subquery("events")
+
+    days = business_days_sql(events.c.start_date, events.c.end_date, sick_start, leave_end)
+    is_approved = events.c.status_code == 2
+    counts_as_leave = and_(
+        is_approved, events.c.is_vacation == 1,
+        events.c.start_date >= leave_start, events.c.end_date <= leave_end
+    )
+    counts_as_sick = and_(
+        is_approved, events.c.is_vacation == 0,
+        events.c.start_date >= sick_start, events.c.end_date <= sick_end
+    )
+
+    row = db.execute(
+        select(
+            models.User.annual_leave_days,
+            func.coalesce(func.sum(case((counts_as_leave, days), else_=0)), 0).label("used_days"),
+            func.coalesce(func.sum(case((counts_as_sick, days), else_=0)), 0).label("sick_days"),
+            func.coalesce(func.sum(case((and_(events.c.is_request == 1, events.c.status_code == 1), 1), else_=0)), 0).label("pending_count"),
+            func.coalesce(func.sum(case((and_(events.c.is_request == 1, is_approved), 1), else_=0)), 0).label("approved_count")
+        ).select_from(
+            models.User.__table__.outerjoin(events, events.c.user_id == models.User.id)
+        ).where(
+            models.User.id == user_id
+        ).group_by(models.User.id, models.User.annual_leave_days)
+    ).first()
+    if not row:
+        raise ValueError("Utilisateur non trouvé")
+
+    return schemas.DashboardData(
+        remaining_leave_days=max(0, row.annual_leave_days - row.used_days),
+        used_leave_days=row.used_days,
+        total_leave_days=row.annual_leave_days,
+        pending_requests=row.pending_count,
+        approved_requests=row.approved_count,
+        sick_days=row.sick_days
+    )
@@ -0,0 +1,98 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, literal, select, union_all
+from datetime import datetime, date
+from typing import Optional, List
+
+from app import models, schemas
+from app.working_calendar import working_calendar
+
+def _active_user_ids(db: Session) -> List[int]:
+    """Identifiants des utilisateurs actifs (hors administrateurs)"""
+    return [
+        user_id for (user_id,) in db.query(models.User.id).filter(
+            models.User.is_active == True,
+            models.User.role == models.UserRole.USER
+        ).order_by(models.User.id)
+    ]
+
+def compute_balances(db: Session, user_ids: Optional[List[int]] = None, year: int = None) -> List[schemas.LeaveBalance]:
+    """
+    Calculer les soldes de congés de plusieurs utilisateurs en une passe.
+    Mêmes règles que get_dashboard_data: congés sur la période du 1er juin
+    au 31 mai suivant, maladie sur l'année civile.
+    """
+    import numpy as np
+
+    if year is None:
+        year = datetime.now().year
+    if user_ids is None:
+        user_ids = _active_user_ids(db)
+    if not user_ids:
+        return []
+
+    leave_start, leave_end = date(year, 6, 1), date(year + 1, 5, 31)
+    sick_start, sick_end = date(year, 1, 1), date(year, 12, 31)
+
+    # Une seule requête pour les absences approuvées et les déclarations de maladie
+    absences = select(
+        models.AbsenceRequest.user_id,
+        case((models.AbsenceRequest.type == models.AbsenceType.VACANCES, 1), else_=0).label("is_vacation"),
+        models.AbsenceRequest.start_date,
+        models.AbsenceRequest.end_date
+    ).where(
+        and_(
+            models.AbsenceRequest.user_id.in_(user_ids),
+            models.AbsenceRequest.status == models.AbsenceStatus.APPROUVE,
+            models.AbsenceRequest.start_date >= sick_start,
+            models.AbsenceRequest.end_date <= leave_end
+        )
+    )
+    declarations = select(
+        models.SicknessDeclaration.user_id,
+        literal(0).label("is_vacation"),
+        models.SicknessDeclaration.start_date,
+        models.SicknessDeclaration.end_date
+    ).where(
+        and_(
+            models.SicknessDeclaration.user_id.in_(user_ids),
+            models.SicknessDeclaration.start_date >= sick_start,
+            models.SicknessDeclaration.end_date <= sick_end
+        )
+    )
+    rows = db.execute(union_all(absences, declarations)).all()
+
+    users = db.query(models.User.id, models.User.annual_leave_days).filter(models.User.id.in_(user_ids)).all()
+    known_ids = np.array(sorted(user_id for user_id, _ in users), dtype=np.int64)
+    total_days = np.array([days for _, days in sorted(users)], dtype=np.int64)
+
+    used_days = np.zeros(len(known_ids), dtype=np.int64)
+    sick_days = np.zeros(len(known_ids), dtype=np.int64)
+    if rows:
+        row_users = np.array([row.user_id for row in rows], dtype=np.int64)
+        is_vacation = np.array([row.is_vacation for row in rows], dtype=bool)
+        starts = np.array([row.start_date for row in rows], dtype="datetime64[D]")
+        ends = np.array([row.end_date for row in rows], dtype="datetime64[D]")
+
+        holidays = np.array(working_calendar.holidays_between(sick_start, leave_end), dtype="datetime64[D]")
+        days = np.clip(np.busday_count(starts, ends + np.timedelta64(1, "D"), holidays=holidays), 0, None)
+
+        in_leave_period = (starts >= np.datetime64(leave_start)) & (ends <= np.datetime64(leave_end))
+        in_sick_period = ends <= np.datetime64(sick_end)
+
+        positions = np.searchsorted(known_ids, row_users)
+        used_days = np.bincount(positions, weights=days * (is_vacation & in_leave_period), minlength=len(known_ids)).astype(np.int64)
+        sick_days = np.bincount(positions, weights=days * (~is_vacation & in_sick_period), minlength=len(known_ids)).astype(np.int64)
+
+    remaining_days = np.maximum(total_days - used_days, 0)
+
+    return [
+        schemas.LeaveBalance(
+            user_id=int(user_id),
+            year=year,
+            total_leave_days=int(total),
+            used_leave_days=int(used),
+            remaining_leave_days=int(remaining),
+            sick_days=int(sick)
+        )
+        for user_id, total, used, remaining, sick in zip(known_ids, total_days, used_days, remaining_days, sick_days)
+    ]
@@ -1,26 +1,17 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from datetime import datetime, date, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, case, func, select
+from datetime import datetime, date
 from typing import Optional
 
 from app import models, schemas
+from app.working_calendar import working_calendar
 from .users import get_user
+from .aggregates import aggregate_dashboard_data
 
 def calculate_business_days(start_date: date, end_date: date) -> int:
     """Calculer le nombre de jours ouvrés entre deux dates (inclus)"""
-    if start_date > end_date:
-        return 0
-    
-    business_days = 0
-    current_date = start_date
-    
-    while current_date <= end_date:
-        # 0 = Monday, 6 = Sunday
-        if current_date.weekday() < 5:  # Monday to Friday
-            business_days += 1
-        current_date += timedelta(days=1)
-    
-    return business_days
+    return working_calendar.business_days(start_date, end_date)
 
 def calculate_used_leave_days(db: Session, user_id: int, year: int = None) -> int:
     """Calculer le nombre de jours de congés utilisés pour un utilisateur"""
@@ -43,7 +34,7 @@ def calculate_used_leave_days(db: Session, user_id: int, year: int = None) -> in
     
     total_days = 0
     for request in approved_requests:
-        days = calculate_business_days(request.start_date, request.end_date)
+        days = working_calendar.business_days(request.start_date, request.end_date)
         total_days += days
     
     return total_days
@@ -71,7 +62,7 @@ def calculate_sick_days(db: Session, user_id: int, year: int = None) -> int:
     ).all()
     
     for request in sick_requests:
-        days = calculate_business_days(request.start_date, request.end_date)
+        days = working_calendar.business_days(request.start_date, request.end_date)
         total_sick_days += days
     
     # Jours de maladie via SicknessDeclaration
@@ -85,48 +76,65 @@ def calculate_sick_days(db: Session, user_id: int, year: int = None) -> int:
     ).all()
     
     for declaration in sick_declarations:
-        days = calculate_business_days(declaration.start_date, declaration.end_date)
+        days = working_calendar.business_days(declaration.start_date, declaration.end_date)
         total_sick_days += days
     
     return total_sick_days
 
-def get_dashboard_data(db: Session, user_id: int) -> schemas.DashboardData:
-    """Récupérer les données du tableau de bord pour un utilisateur"""
-    user = get_user(db, user_id)
-    if not user:
-        raise ValueError("Utilisateur non trouvé")
-    
-    # Utiliser l'année courante pour le calcul
-    current_year = datetime.now().year
-    used_days = calculate_used_leave_days(db, user_id, current_year)
-    total_days = user.annual_leave_days
+def _dashboard_balance_statement(user_id: int, current_year: int):
+    """Solde matérialisé de l'utilisateur (une ligne, nombre de lignes de solde nul si pas encore calculé)"""
+    balance = models.LeaveBalance
+    return select(
+        models.User.annual_leave_days,
+        func.count(balance.user_id).label("ledger_rows"),
+        func.coalesce(func.sum(case((balance.period_year == current_year, balance.used_leave_days), else_=0)), 0).label("used_days"),
+        func.coalesce(func.sum(case((balance.period_year == current_year, balance.sick_days), else_=0)), 0).label("sick_days"),
+        func.coalesce(func.sum(balance.pending_requests), 0).label("pending_count"),
+        func.coalesce(func.sum(balance.approved_requests), 0).label("approved_count")
+    ).outerjoin(
+        balance, balance.user_id == models.User.id
+    ).where(
+        models.User.id == user_id
+    ).group_by(models.User.id, models.User.annual_leave_days)
+
+def _dashboard_data(row) -> schemas.DashboardData:
+    total_days = row.annual_leave_days
+    used_days = row.used_days
     remaining_days = total_days - used_days
-    sick_days = calculate_sick_days(db, user_id, current_year)
-    
-    # Compter les demandes en attente et approuvées
-    pending_count = db.query(models.AbsenceRequest).filter(
-        and_(
-            models.AbsenceRequest.user_id == user_id,
-            models.AbsenceRequest.status == models.AbsenceStatus.EN_ATTENTE
-        )
-    ).count()
-    
-    approved_count = db.query(models.AbsenceRequest).filter(
-        and_(
-            models.AbsenceRequest.user_id == user_id,
-            models.AbsenceRequest.status == models.AbsenceStatus.APPROUVE
-        )
-    ).count()
     
     return schemas.DashboardData(
         remaining_leave_days=max(0, remaining_days),
         used_leave_days=used_days,
         total_leave_days=total_days,
-        pending_requests=pending_count,
-        approved_requests=approved_count,
-        sick_days=sick_days
+        pending_requests=row.pending_count,
+        approved_requests=row.approved_count,
+        sick_days=row.sick_days
     )
 
+def get_dashboard_data(db: Session, user_id: int) -> schemas.DashboardData:
+    """Récupérer les données du tableau de bord pour un utilisateur (depuis le solde matérialisé)"""
+    # Utiliser l'année courante pour le calcul
+    current_year = datetime.now().year
+    row = db.execute(_dashboard_balance_statement(user_id, current_year)).first()
+    if not row:
+        raise ValueError("Utilisateur non trouvé")
+    
+    if not row.ledger_rows:
+        # Solde pas encore matérialisé: une seule requête sur les tables sources
+        return aggregate_dashboard_data(db, user_id, current_year)
+    return _dashboard_data(row)
+
+async def get_dashboard_data_async(db: AsyncSession, user_id: int) -> schemas.DashboardData:
+    """Variante asynchrone de get_dashboard_data"""
+    current_year = datetime.now().year
+    row = (await db.execute(_dashboard_balance_statement(user_id, current_year))).first()
+    if not row:
+        raise ValueError("Utilisateur non trouvé")
+    
+    if not row.ledger_rows:
+        return await db.run_sync(aggregate_dashboard_data, user_id, current_year)
+    return _dashboard_data(row)
+
 def get_user_absence_summary(db: Session, user_id: int) -> schemas.UserAbsenceSummary:
     """Récupérer le résumé des absences d'un utilisateur"""
     user = get_user(db, user_id)
@@ -149,7 +157,7 @@ def get_user_absence_summary(db: Session, user_id: int) -> schemas.UserAbsenceSu
     # Traiter les demandes d'absence
     for request in all_requests:
         if request.status == models.AbsenceStatus.APPROUVE:
-            days = calculate_business_days(request.start_date, request.end_date)
+            days = working_calendar.business_days(request.start_date, request.end_date)
             total_absence_days += days
             
             if request.type == models.AbsenceType.VACANCES:
@@ -163,14 +171,12 @@ def get_user_absence_summary(db: Session, user_id: int) -> schemas.UserAbsenceSu
     
     # Traiter les déclarations de maladie
     for declaration in all_sickness_declarations:
-        days = calculate_business_days(declaration.start_date, declaration.end_date)
+        days = working_calendar.business_days(declaration.start_date, declaration.end_date)
         sick_days += days
         total_absence_days += days
     
-    # Récupérer les 10 absences les plus récentes
-    recent_requests = db.query(models.AbsenceRequest).filter(
-        models.AbsenceRequest.user_id == user_id
-    ).order_by(models.AbsenceRequest.created_at.desc()).limit(10).all()
+    # Les 10 plus récentes sont déjà chargées (triées par date de création décroissante)
+    recent_requests = all_requests[:10]
     
     return schemas.UserAbsenceSummary(
         user=user,
@@ -0,0 +1,87 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, literal, select, union_all, Boolean, String
+from datetime import date
+from typing import Optional, List
+
+from app import models
+from .absences import overlap_filter
+
+ABSENCE_REQUEST = "absence_request"
+SICKNESS_DECLARATION = "sickness_declaration"
+
+def _calendar_event_rows_statement(start_date: date, end_date: date, user_id: Optional[int] = None, active_users_only: bool = False):
+    """Absences et déclarations de maladie qui chevauchent la période (UNION ALL)"""
+    absence = models.AbsenceRequest
+    declaration = models.SicknessDeclaration
+
+    absences = select(
+        literal(ABSENCE_REQUEST).label("event_source"),
+        absence.id,
+        absence.user_id,
+        models.User.first_name,
+        models.User.last_name,
+        absence.type,
+        absence.status,
+        absence.start_date,
+        absence.end_date,
+        absence.reason,
+        literal(None, String).label("pdf_filename"),
+        literal(False, Boolean).label("email_sent")
+    ).join(models.User, absence.user_id == models.User.id).where(overlap_filter(absence, start_date, end_date))
+
+    # Les déclarations de maladie sont toujours de type MALADIE et approuvées
+    declarations = select(
+        literal(SICKNESS_DECLARATION).label("event_source"),
+        declaration.id,
+        declaration.user_id,
+        models.User.first_name,
+        models.User.last_name,
+        literal(models.AbsenceType.MALADIE, absence.type.type).label("type"),
+        literal(models.AbsenceStatus.APPROUVE, absence.status.type).label("status"),
+        declaration.start_date,
+        declaration.end_date,
+        declaration.description.label("reason"),
+        declaration.pdf_filename,
+        declaration.email_sent
+    ).join(models.User, declaration.user_id == models.User.id).where(overlap_filter(declaration, start_date, end_date))
+
+    if user_id is not None:
+        absences = absences.where(absence.user_id == user_id)
+        declarations = declarations.where(declaration.user_id == user_id)
+    if active_users_only:
+        absences = absences.where(models.User.is_active == True)
+        declarations = declarations.where(models.User.is_active == True)
+
+    return union_all(absences, declarations)
+
+def get_calendar_event_rows(db: Session, start_date: date, end_date: date, user_id: Optional[int] = None, active_users_only: bool = False) -> List:
+    """
+    Récupérer en une requête (UNION ALL) les absences et déclarations de maladie
+    qui chevauchent la période, sous forme de lignes légères (sans entités ORM).
+    Colonnes: event_source, id, user_id, first_name, last_name, type, status,
+    start_date, end_date, reason, pdf_filename, email_sent
+    """
+    return db.execute(_calendar_event_rows_statement(start_date, end_date, user_id, active_users_only)).all()
+
+async def get_calendar_event_rows_async(db: AsyncSession, start_date: date, end_date: date, user_id: Optional[int] = None, active_users_only: bool = False) -> List:
+    """Variante asynchrone de get_calendar_event_rows"""
+    return (await db.execute(_calendar_event_rows_statement(start_date, end_date, user_id, active_users_only))).all()
+
+def _approved_vacation_periods_statement(user_id: int, start_date: date, end_date: date):
+    return select(models.AbsenceRequest.start_date, models.AbsenceRequest.end_date).where(
+        and_(
+            models.AbsenceRequest.user_id == user_id,
+            models.AbsenceRequest.status == models.AbsenceStatus.APPROUVE,
+            models.AbsenceRequest.type == models.AbsenceType.VACANCES,
+            overlap_filter(models.AbsenceRequest, start_date, end_date)
+        )
+    )
+
+def get_approved_vacation_periods(db: Session, user_id: int, start_date: date, end_date: date) -> List:
+    """Périodes (start_date, end_date) des congés approuvés d'un utilisateur qui chevauchent la plage"""
+    return db.execute(_approved_vacation_periods_statement(user_id, start_date, end_date)).all()
+
+async def get_approved_vacation_periods_async(db: AsyncSession, user_id: int, start_date: date, end_date: date) -> List:
+    """Variante asynchrone de get_approved_vacation_periods"""
+    return (await db.execute(_approved_vacation_periods_statement(user_id, start_date, end_date))).all()
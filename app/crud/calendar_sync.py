@@ -0,0 +1,269 @@
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, update
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import hashlib
+
+from app import models
+from .calendar_events import ABSENCE_REQUEST, SICKNESS_DECLARATION
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Modes de synchronisation complète: événements manquants uniquement, ou événements modifiés;
+# passe "pull": lecture des modifications faites directement dans Google Calendar
+SYNC = "sync"
+RESYNC = "resync"
+PULL = "pull"
+
+# Nombre maximal de tentatives avant abandon, délai de base du backoff exponentiel
+MAX_CALENDAR_SYNC_ATTEMPTS = 6
+CALENDAR_SYNC_RETRY_DELAY = timedelta(seconds=30)
+# Durée de réservation d'un job par un worker
+CALENDAR_SYNC_LEASE = timedelta(minutes=2)
+
+_TARGET_MODELS = {
+    ABSENCE_REQUEST: models.AbsenceRequest,
+    SICKNESS_DECLARATION: models.SicknessDeclaration
+}
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _target_type(target) -> str:
+    return ABSENCE_REQUEST if isinstance(target, models.AbsenceRequest) else SICKNESS_DECLARATION
+
+def calendar_idempotency_key(target) -> str:
+    """
+    ID d'événement Google déterministe (caractères hexadécimaux, acceptés par l'API):
+    la création d'un même événement, rejouée après un échec réseau, est refusée au lieu d'être dupliquée
+    """
+    created_at = target.created_at.replace(tzinfo=None).isoformat() if target.created_at else ""
+    return hashlib.sha256(f"{_target_type(target)}:{target.id}:{created_at}".encode()).hexdigest()[:32]
+
+def enqueue_calendar_sync(db: Session, target, action: str = UPSERT) -> models.CalendarSyncJob:
+    """
+    Planifier la synchronisation d'une absence ou d'une déclaration (sans commit).
+    Les modifications successives d'une même cible sont regroupées dans son job en attente:
+    un seul appel à l'API Google pour l'état final
+    """
+    target_type = _target_type(target)
+    event_id = target.google_calendar_event_id
+    if action == DELETE and event_id is None:
+        # Une création a pu aboutir sans que l'ID soit enregistré
+        event_id = calendar_idempotency_key(target)
+
+    # Job ajouté plus tôt dans la même transaction (autoflush désactivé: absent du résultat de la requête)
+    job = next((
+        pending for pending in db.new
+        if isinstance(pending, models.CalendarSyncJob)
+        and pending.target_type == target_type
+        and pending.target_id == target.id
+        and pending.status == models.CalendarSyncStatus.EN_ATTENTE
+    ), None)
+    if job is None:
+        job = db.query(models.CalendarSyncJob).filter(
+            models.CalendarSyncJob.target_type == target_type,
+            models.CalendarSyncJob.target_id == target.id,
+            models.CalendarSyncJob.status == models.CalendarSyncStatus.EN_ATTENTE
+        ).first()
+    if job is None:
+        job = models.CalendarSyncJob(
+            target_type=target_type,
+            target_id=target.id,
+            idempotency_key=calendar_idempotency_key(target),
+            revision=0,
+            attempts=0,
+            status=models.CalendarSyncStatus.EN_ATTENTE,
+            next_attempt_at=_utcnow()
+        )
+        db.add(job)
+    else:
+        # Job réservé ou en attente de nouvelle tentative: son échéance est conservée
+        job.revision += 1
+    job.action = action
+    job.event_id = event_id if action == DELETE else None
+    return job
+
+def get_calendar_sync_target(db: Session, job: models.CalendarSyncJob):
+    """Absence ou déclaration synchronisée par le job (None si supprimée)"""
+    return db.get(_TARGET_MODELS[job.target_type], job.target_id)
+
+def set_calendar_sync_state(db: Session, job: models.CalendarSyncJob, event_id: str, payload_hash: str):
+    """Enregistrer l'événement synchronisé et l'empreinte des données envoyées sur la cible du job"""
+    model = _TARGET_MODELS[job.target_type]
+    db.execute(
+        update(model).where(model.id == job.target_id).values(
+            google_calendar_event_id=event_id,
+            calendar_payload_hash=payload_hash,
+            calendar_synced_at=_utcnow(),
+            updated_at=model.updated_at  # Pas une modification de la cible
+        )
+        .execution_options(synchronize_session="fetch")
+    )
+    db.commit()
+
+def get_due_calendar_sync_jobs(db: Session, limit: int = 50) -> List[models.CalendarSyncJob]:
+    """Jobs en attente dont la prochaine tentative est échue"""
+    return db.query(models.CalendarSyncJob).filter(
+        models.CalendarSyncJob.status == models.CalendarSyncStatus.EN_ATTENTE,
+        models.CalendarSyncJob.next_attempt_at <= _utcnow()
+    ).order_by(models.CalendarSyncJob.next_attempt_at, models.CalendarSyncJob.id).limit(limit).all()
+
+def claim_calendar_sync_job(db: Session, job: models.CalendarSyncJob) -> bool:
+    """Réserver un job (mise à jour conditionnelle): un seul worker concurrent obtient la réservation"""
+    result = db.execute(
+        update(models.CalendarSyncJob)
+        .where(
+            models.CalendarSyncJob.id == job.id,
+            models.CalendarSyncJob.status == models.CalendarSyncStatus.EN_ATTENTE,
+            models.CalendarSyncJob.next_attempt_at == job.next_attempt_at
+        )
+        .values(next_attempt_at=_utcnow() + CALENDAR_SYNC_LEASE)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return False
+    db.refresh(job)
+    return True
+
+def mark_calendar_sync_done(db: Session, job: models.CalendarSyncJob, revision: int) -> bool:
+    """
+    Marquer un job comme synchronisé, sauf si une modification y a été regroupée
+    pendant l'appel à Google: il est alors ré-exécuté immédiatement
+    """
+    result = db.execute(
+        update(models.CalendarSyncJob)
+        .where(models.CalendarSyncJob.id == job.id, models.CalendarSyncJob.revision == revision)
+        .values(
+            status=models.CalendarSyncStatus.SYNCHRONISE,
+            attempts=models.CalendarSyncJob.attempts + 1,
+            synced_at=_utcnow(),
+            last_error=None
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.execute(
+            update(models.CalendarSyncJob)
+            .where(models.CalendarSyncJob.id == job.id)
+            .values(next_attempt_at=_utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    db.refresh(job)
+    return result.rowcount == 1
+
+def mark_calendar_sync_failed(db: Session, job: models.CalendarSyncJob, error: str):
+    """Enregistrer un échec: nouvelle tentative avec backoff exponentiel, ou abandon"""
+    job.attempts += 1
+    job.last_error = error
+    if job.attempts >= MAX_CALENDAR_SYNC_ATTEMPTS:
+        job.status = models.CalendarSyncStatus.ECHEC
+    else:
+        job.next_attempt_at = _utcnow() + CALENDAR_SYNC_RETRY_DELAY * (2 ** (job.attempts - 1))
+    db.commit()
+
+def get_calendar_sync_counts(db: Session) -> dict:
+    """Nombre de jobs de synchronisation par statut"""
+    rows = db.query(models.CalendarSyncJob.status, func.count(models.CalendarSyncJob.id)).group_by(
+        models.CalendarSyncJob.status
+    ).all()
+    counts = {status.value: 0 for status in models.CalendarSyncStatus}
+    counts.update({status.value: count for status, count in rows})
+    return counts
+
+def get_calendar_sync_candidates(db: Session, target_type: str, mode: str, after_id: int, limit: int) -> List:
+    """
+    Prochaines cibles d'une synchronisation complète, par ID croissant après le point de reprise.
+    En resync toutes les cibles sont relues: seules celles dont l'empreinte a changé sont envoyées
+    """
+    model = _TARGET_MODELS[target_type]
+    query = db.query(model).options(joinedload(model.user)).filter(model.id > after_id)
+    if mode == SYNC:
+        query = query.filter(model.google_calendar_event_id.is_(None))
+    return query.order_by(model.id).limit(limit).all()
+
+def save_calendar_sync_states(db: Session, target_type: str, states: List[dict]):
+    """
+    Enregistrer les événements synchronisés d'un lot (une seule requête UPDATE, sans commit).
+    states: id, google_calendar_event_id, calendar_payload_hash et updated_at (inchangé) de chaque cible
+    """
+    if states:
+        synced_at = _utcnow()
+        db.execute(update(_TARGET_MODELS[target_type]), [{**state, "calendar_synced_at": synced_at} for state in states])
+
+def get_calendar_targets_by_event_ids(db: Session, event_ids: List[str]) -> List:
+    """Absences et déclarations liées aux événements Google donnés"""
+    if not event_ids:
+        return []
+    return [
+        target
+        for model in _TARGET_MODELS.values()
+        for target in db.query(model).filter(model.google_calendar_event_id.in_(event_ids)).all()
+    ]
+
+def reset_calendar_sync_state(db: Session, target, event_deleted: bool):
+    """
+    Forcer le renvoi d'une cible modifiée dans Google Calendar (empreinte effacée),
+    ou sa recréation si l'événement y a été supprimé (sans commit)
+    """
+    model = type(target)
+    values = {"calendar_payload_hash": None, "updated_at": model.updated_at}
+    if event_deleted:
+        values["google_calendar_event_id"] = None
+    db.execute(
+        update(model).where(model.id == target.id).values(**values)
+        .execution_options(synchronize_session="fetch")
+    )
+
+def get_last_calendar_pull(db: Session) -> Optional[models.CalendarSyncRun]:
+    """Dernière passe de lecture des modifications distantes (porte le syncToken)"""
+    return db.query(models.CalendarSyncRun).filter(
+        models.CalendarSyncRun.mode == PULL
+    ).order_by(models.CalendarSyncRun.id.desc()).first()
+
+def record_calendar_pull(db: Session, sync_token: Optional[str]) -> models.CalendarSyncRun:
+    """Enregistrer une passe de lecture et le syncToken de la suivante"""
+    run = models.CalendarSyncRun(
+        mode=PULL,
+        completed=True,
+        absence_cursor=0,
+        sickness_cursor=0,
+        absences_synced=0,
+        absences_failed=0,
+        sickness_synced=0,
+        sickness_failed=0,
+        absences_unchanged=0,
+        sickness_unchanged=0,
+        sync_token=sync_token
+    )
+    db.add(run)
+    db.commit()
+    return run
+
+def get_calendar_sync_run(db: Session, mode: str) -> Optional[models.CalendarSyncRun]:
+    """Synchronisation complète interrompue à reprendre (la plus récente)"""
+    return db.query(models.CalendarSyncRun).filter(
+        models.CalendarSyncRun.mode == mode,
+        models.CalendarSyncRun.completed == False
+    ).order_by(models.CalendarSyncRun.id.desc()).first()
+
+def start_calendar_sync_run(db: Session, mode: str) -> models.CalendarSyncRun:
+    """Démarrer une synchronisation complète"""
+    run = models.CalendarSyncRun(
+        mode=mode,
+        completed=False,
+        absence_cursor=0,
+        sickness_cursor=0,
+        absences_synced=0,
+        absences_failed=0,
+        sickness_synced=0,
+        sickness_failed=0,
+        absences_unchanged=0,
+        sickness_unchanged=0
+    )
+    db.add(run)
+    db.commit()
+    return run
@@ -0,0 +1,71 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import update, delete
+from typing import Optional
+
+from app import models
+from app.file_service import file_service
+
+def get_stored_file(db: Session, sha256: str) -> Optional[models.StoredFile]:
+    """Récupérer un contenu stocké par son empreinte"""
+    return db.query(models.StoredFile).filter(models.StoredFile.sha256 == sha256).first()
+
+def acquire_stored_file(db: Session, sha256: str, storage_ref: str) -> None:
+    """
+    Ajouter une référence à un contenu stocké (sans commit), par un upsert atomique.
+    La ligne reste verrouillée jusqu'au commit: une suppression concurrente du même contenu attend
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(models.StoredFile).values(sha256=sha256, storage_ref=storage_ref, ref_count=1)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[models.StoredFile.sha256],
+        set_={"ref_count": models.StoredFile.ref_count + 1}
+    ))
+
+def reserve_stored_file(db: Session, sha256: str, storage_ref: str) -> None:
+    """
+    Acquérir la référence d'un contenu avant de le déposer dans le stockage (commit):
+    un contenu déjà présent, dont le dépôt est alors ignoré, ne peut plus être supprimé
+    par la libération concurrente de sa dernière référence
+    """
+    acquire_stored_file(db, sha256, storage_ref)
+    db.commit()
+
+def release_stored_file(db: Session, sha256: str) -> Optional[str]:
+    """
+    Retirer une référence à un contenu stocké (sans commit).
+    Renvoie la référence de stockage à supprimer quand plus aucune déclaration ne l'utilise.
+    """
+    db.execute(
+        update(models.StoredFile)
+        .where(models.StoredFile.sha256 == sha256)
+        .values(ref_count=models.StoredFile.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    stored = db.query(models.StoredFile.storage_ref).filter(
+        models.StoredFile.sha256 == sha256, models.StoredFile.ref_count <= 0
+    ).first()
+    if stored is None:
+        return None
+    db.execute(
+        delete(models.StoredFile)
+        .where(models.StoredFile.sha256 == sha256, models.StoredFile.ref_count <= 0)
+        .execution_options(synchronize_session=False)
+    )
+    return stored.storage_ref
+
+def delete_unreferenced_file(db: Session, storage_ref: str) -> None:
+    """
+    Supprimer le contenu dont la dernière référence vient d'être retirée, avant le commit:
+    la ligne supprimée reste verrouillée, un dépôt concurrent du même contenu attend puis le stocke à nouveau
+    """
+    file_service.delete_file(storage_ref, connection=db.connection())
+
+def cancel_stored_file(db: Session, sha256: str) -> None:
+    """Retirer la référence réservée par un dépôt abandonné (commit); le contenu est supprimé s'il n'est plus utilisé"""
+    orphan = release_stored_file(db, sha256)
+    if orphan:
+        delete_unreferenced_file(db, orphan)
+    db.commit()
@@ -0,0 +1,177 @@
+from sqlalchemy.orm import Session
+from collections import Counter, defaultdict
+from datetime import date, datetime, timezone
+from typing import Optional, List, Dict, Tuple
+
+from app import models
+from app.working_calendar import working_calendar
+
+LEDGER_FIELDS = ("used_leave_days", "sick_days", "pending_requests", "approved_requests")
+
+# Instantané des champs d'une absence qui influencent le solde:
+# (user_id, type, status, start_date, end_date)
+AbsenceSnapshot = Tuple[int, models.AbsenceType, models.AbsenceStatus, date, date]
+SicknessSnapshot = Tuple[int, date, date]
+
+def leave_period_of(day: date) -> int:
+    """Année de début de la période de congés (1er juin - 31 mai) contenant la date"""
+    return day.year if day.month >= 6 else day.year - 1
+
+def absence_snapshot(request: Optional[models.AbsenceRequest]) -> Optional[AbsenceSnapshot]:
+    """Capturer l'état d'une demande d'absence avant/après une écriture"""
+    if request is None:
+        return None
+    return (request.user_id, request.type, request.status, request.start_date, request.end_date)
+
+def sickness_snapshot(declaration: Optional[models.SicknessDeclaration]) -> Optional[SicknessSnapshot]:
+    """Capturer l'état d'une déclaration de maladie avant/après une écriture"""
+    if declaration is None:
+        return None
+    return (declaration.user_id, declaration.start_date, declaration.end_date)
+
+def _absence_contributions(snapshot: Optional[AbsenceSnapshot]) -> Dict[int, Counter]:
+    """Contribution d'une demande d'absence à chaque période du solde"""
+    contributions = defaultdict(Counter)
+    if snapshot is None:
+        return contributions
+    _, absence_type, status, start_date, end_date = snapshot
+    period = leave_period_of(start_date)
+
+    if status == models.AbsenceStatus.EN_ATTENTE:
+        contributions[period]["pending_requests"] += 1
+    elif status == models.AbsenceStatus.APPROUVE:
+        contributions[period]["approved_requests"] += 1
+        days = working_calendar.business_days(start_date, end_date)
+        # Mêmes règles que calculate_used_leave_days / calculate_sick_days
+        if absence_type == models.AbsenceType.VACANCES and end_date <= date(period + 1, 5, 31):
+            contributions[period]["used_leave_days"] += days
+        elif absence_type == models.AbsenceType.MALADIE and start_date.year == end_date.year:
+            contributions[start_date.year]["sick_days"] += days
+    return contributions
+
+def _sickness_contributions(snapshot: Optional[SicknessSnapshot]) -> Dict[int, Counter]:
+    """Contribution d'une déclaration de maladie à chaque période du solde"""
+    contributions = defaultdict(Counter)
+    if snapshot is None:
+        return contributions
+    _, start_date, end_date = snapshot
+    if start_date.year == end_date.year:
+        contributions[start_date.year]["sick_days"] += working_calendar.business_days(start_date, end_date)
+    return contributions
+
+def _diff(before: Dict[int, Counter], after: Dict[int, Counter]) -> Dict[int, Counter]:
+    """Écart par période entre deux contributions"""
+    deltas = {}
+    for period in set(before) | set(after):
+        delta = Counter(after.get(period, Counter()))
+        delta.subtract(before.get(period, Counter()))
+        delta = Counter({field: value for field, value in delta.items() if value})
+        if delta:
+            deltas[period] = delta
+    return deltas
+
+def _is_materialized(db: Session, user_id: int) -> bool:
+    """Le solde d'un utilisateur est-il déjà matérialisé ?"""
+    return db.query(models.LeaveBalance.user_id).filter(models.LeaveBalance.user_id == user_id).first() is not None
+
+def _insert(db: Session):
+    """INSERT du dialecte courant (ON CONFLICT)"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(models.LeaveBalance)
+
+def _apply_deltas(db: Session, user_id: int, deltas: Dict[int, Counter]):
+    """Appliquer des écarts au solde d'un utilisateur (dans la transaction en cours)"""
+    if not deltas:
+        return
+    db.flush()
+    if not _is_materialized(db, user_id):
+        # Premier passage: solde recalculé sans l'écriture en cours (déjà flushée), sans écraser celui
+        # d'une première écriture concurrente, qui l'a déjà inséré; l'écart est appliqué ensuite
+        baseline = compute_user_ledger(db, user_id)
+        for period, delta in deltas.items():
+            baseline[period].subtract(delta)
+        db.execute(_insert(db).values([
+            {"user_id": user_id, "period_year": period, **{field: values.get(field, 0) for field in LEDGER_FIELDS}}
+            for period, values in baseline.items()
+        ]).on_conflict_do_nothing(index_elements=[models.LeaveBalance.user_id, models.LeaveBalance.period_year]))
+
+    for period, delta in deltas.items():
+        # Incrément atomique côté base pour ne pas perdre d'écritures concurrentes (ligne créée si besoin)
+        statement = _insert(db).values(user_id=user_id, period_year=period, **{field: delta.get(field, 0) for field in LEDGER_FIELDS})
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[models.LeaveBalance.user_id, models.LeaveBalance.period_year],
+            set_={
+                **{field: getattr(models.LeaveBalance, field) + value for field, value in delta.items()},
+                "updated_at": datetime.now(timezone.utc)
+            }
+        ))
+
+def apply_absence_change(db: Session, before: Optional[AbsenceSnapshot], after: Optional[AbsenceSnapshot]):
+    """Mettre à jour le solde suite à la création, modification ou suppression d'une absence"""
+    user_id = (after or before)[0]
+    _apply_deltas(db, user_id, _diff(_absence_contributions(before), _absence_contributions(after)))
+
+def apply_sickness_change(db: Session, before: Optional[SicknessSnapshot], after: Optional[SicknessSnapshot]):
+    """Mettre à jour le solde suite à la création ou suppression d'une déclaration de maladie"""
+    user_id = (after or before)[0]
+    _apply_deltas(db, user_id, _diff(_sickness_contributions(before), _sickness_contributions(after)))
+
+def compute_user_ledger(db: Session, user_id: int) -> Dict[int, Counter]:
+    """Recalculer le solde complet d'un utilisateur depuis les tables sources"""
+    totals = defaultdict(Counter)
+    requests = db.query(models.AbsenceRequest).filter(models.AbsenceRequest.user_id == user_id).all()
+    for request in requests:
+        for period, contribution in _absence_contributions(absence_snapshot(request)).items():
+            totals[period].update(contribution)
+    declarations = db.query(models.SicknessDeclaration).filter(models.SicknessDeclaration.user_id == user_id).all()
+    for declaration in declarations:
+        for period, contribution in _sickness_contributions(sickness_snapshot(declaration)).items():
+            totals[period].update(contribution)
+    return totals
+
+def materialize_user_ledger(db: Session, user_id: int) -> Dict[int, Counter]:
+    """Écrire le solde complet d'un utilisateur (sans commit)"""
+    totals = compute_user_ledger(db, user_id)
+    if not totals:
+        # Au moins une ligne pour marquer l'utilisateur comme matérialisé
+        totals[leave_period_of(date.today())] = Counter()
+    db.query(models.LeaveBalance).filter(models.LeaveBalance.user_id == user_id).delete()
+    for period, values in totals.items():
+        db.add(models.LeaveBalance(user_id=user_id, period_year=period, **{field: values.get(field, 0) for field in LEDGER_FIELDS}))
+    db.flush()
+    return totals
+
+def rebuild_ledger(db: Session, user_ids: Optional[List[int]] = None) -> List[dict]:
+    """
+    Recalculer les soldes depuis zéro et signaler les écarts avec les valeurs stockées
+    Returns: liste des écarts (user_id, period_year, field, stored, expected)
+    """
+    if user_ids is None:
+        user_ids = [user_id for (user_id,) in db.query(models.User.id).order_by(models.User.id)]
+
+    drift = []
+    for user_id in user_ids:
+        stored = {
+            row.period_year: Counter({field: getattr(row, field) for field in LEDGER_FIELDS})
+            for row in db.query(models.LeaveBalance).filter(models.LeaveBalance.user_id == user_id)
+        }
+        expected = compute_user_ledger(db, user_id)
+        if stored:
+            for period in sorted(set(stored) | set(expected)):
+                for field in LEDGER_FIELDS:
+                    stored_value = stored.get(period, Counter()).get(field, 0)
+                    expected_value = expected.get(period, Counter()).get(field, 0)
+                    if stored_value != expected_value:
+                        drift.append({
+                            "user_id": user_id,
+                            "period_year": period,
+                            "field": field,
+                            "stored": stored_value,
+                            "expected": expected_value
+                        })
+        materialize_user_ledger(db, user_id)
+    db.commit()
+    return drift
@@ -0,0 +1,104 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List
+import json
+
+from app import models
+
+# Nombre maximal de tentatives avant abandon, délai de base du backoff exponentiel
+MAX_NOTIFICATION_ATTEMPTS = 5
+NOTIFICATION_RETRY_DELAY = timedelta(minutes=1)
+# Durée de réservation d'une notification par un worker (évite les doubles envois)
+NOTIFICATION_LEASE = timedelta(minutes=5)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def enqueue_notification(db: Session, notification: str, sickness_declaration_id: Optional[int] = None, **kwargs) -> models.NotificationOutbox:
+    """
+    Ajouter une notification à l'outbox (sans commit): elle est enregistrée
+    par le commit de la modification métier en cours
+    """
+    entry = models.NotificationOutbox(
+        notification=notification,
+        payload=json.dumps(kwargs, default=str),
+        sickness_declaration_id=sickness_declaration_id,
+        next_attempt_at=_utcnow()
+    )
+    db.add(entry)
+    return entry
+
+def get_due_notifications(db: Session, limit: int = 50) -> List[models.NotificationOutbox]:
+    """Notifications en attente dont la prochaine tentative est échue"""
+    return db.query(models.NotificationOutbox).filter(
+        models.NotificationOutbox.status == models.NotificationStatus.EN_ATTENTE,
+        models.NotificationOutbox.next_attempt_at <= _utcnow()
+    ).order_by(models.NotificationOutbox.next_attempt_at, models.NotificationOutbox.id).limit(limit).all()
+
+def claim_notification(db: Session, entry: models.NotificationOutbox) -> bool:
+    """
+    Réserver une notification pour l'envoyer (mise à jour conditionnelle):
+    un seul worker concurrent obtient la réservation
+    """
+    result = db.execute(
+        update(models.NotificationOutbox)
+        .where(
+            models.NotificationOutbox.id == entry.id,
+            models.NotificationOutbox.status == models.NotificationStatus.EN_ATTENTE,
+            models.NotificationOutbox.next_attempt_at == entry.next_attempt_at
+        )
+        .values(next_attempt_at=_utcnow() + NOTIFICATION_LEASE)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return False
+    db.refresh(entry)
+    return True
+
+def mark_notification_sent(db: Session, entry: models.NotificationOutbox):
+    """Marquer une notification comme envoyée (et la déclaration associée le cas échéant)"""
+    entry.status = models.NotificationStatus.ENVOYE
+    entry.attempts += 1
+    entry.sent_at = _utcnow()
+    entry.last_error = None
+    if entry.sickness_declaration_id is not None:
+        db.execute(
+            update(models.SicknessDeclaration)
+            .where(models.SicknessDeclaration.id == entry.sickness_declaration_id)
+            .values(email_sent=True)
+        )
+    db.commit()
+
+def mark_notification_failed(db: Session, entry: models.NotificationOutbox, error: str):
+    """Enregistrer un échec: nouvelle tentative avec backoff exponentiel, ou abandon"""
+    entry.attempts += 1
+    entry.last_error = error
+    if entry.attempts >= MAX_NOTIFICATION_ATTEMPTS:
+        entry.status = models.NotificationStatus.ECHEC
+    else:
+        entry.next_attempt_at = _utcnow() + NOTIFICATION_RETRY_DELAY * (2 ** (entry.attempts - 1))
+    db.commit()
+
+def cancel_pending_notifications(db: Session, sickness_declaration_id: int) -> int:
+    """Abandonner les notifications non envoyées d'une déclaration supprimée (sans commit)"""
+    result = db.execute(
+        update(models.NotificationOutbox)
+        .where(
+            models.NotificationOutbox.sickness_declaration_id == sickness_declaration_id,
+            models.NotificationOutbox.status == models.NotificationStatus.EN_ATTENTE
+        )
+        .values(status=models.NotificationStatus.ECHEC, last_error="Annulée: déclaration supprimée")
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+def get_notification_counts(db: Session) -> dict:
+    """Nombre de notifications par statut"""
+    rows = db.query(models.NotificationOutbox.status, func.count(models.NotificationOutbox.id)).group_by(
+        models.NotificationOutbox.status
+    ).all()
+    counts = {status.value: 0 for status in models.NotificationStatus}
+    counts.update({status.value: count for status, count in rows})
+    return counts
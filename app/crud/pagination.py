@@ -0,0 +1,50 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Select, tuple_
+from datetime import datetime
+from typing import Optional, List, Tuple
+import base64
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encoder la position (created_at, id) d'une ligne en curseur opaque"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Décoder un curseur opaque (ValueError si invalide)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Curseur invalide") from e
+
+def _keyset_window(statement, model, cursor: Optional[str], limit: int):
+    """Filtre après le curseur, tri (created_at, id) décroissants et une ligne de plus que la page"""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Comparaison de tuples: sert directement l'index (created_at, id)
+        statement = statement.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    return statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+def _keyset_result(rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+def keyset_page(db: Session, statement: Select, model, cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """
+    Page suivante d'une requête (select d'entités) triée par (created_at, id) décroissants.
+    Un curseur vide ou absent renvoie la première page.
+    Returns: (lignes de la page, curseur de la page suivante ou None)
+    """
+    rows = db.scalars(_keyset_window(statement, model, cursor, limit)).all()
+    return _keyset_result(rows, limit)
+
+async def keyset_page_async(db: AsyncSession, statement: Select, model, cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """keyset_page sur une session asynchrone"""
+    rows = (await db.scalars(_keyset_window(statement, model, cursor, limit))).all()
+    return _keyset_result(rows, limit)
@@ -1,20 +1,49 @@
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from typing import Optional, List, Tuple
 
 from app import models, schemas
+from .ledger import SicknessSnapshot, sickness_snapshot, apply_sickness_change
+from .pagination import keyset_page, keyset_page_async
+from .files import acquire_stored_file, release_stored_file, delete_unreferenced_file
+from .notifications import cancel_pending_notifications
 
 def get_sickness_declaration(db: Session, declaration_id: int) -> Optional[models.SicknessDeclaration]:
     """Récupérer une déclaration de maladie par ID"""
-    return db.query(models.SicknessDeclaration).filter(models.SicknessDeclaration.id == declaration_id).first()
+    return db.query(models.SicknessDeclaration).options(
+        joinedload(models.SicknessDeclaration.user)
+    ).filter(models.SicknessDeclaration.id == declaration_id).first()
 
-def get_sickness_declarations(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None) -> List[models.SicknessDeclaration]:
-    """Récupérer les déclarations de maladie avec filtres optionnels"""
-    query = db.query(models.SicknessDeclaration)
+def _sickness_declarations_statement(user_id: Optional[int] = None):
+    """Requête des déclarations de maladie avec filtres optionnels"""
+    # Charger l'utilisateur sérialisé dans la réponse (évite une requête par déclaration)
+    statement = select(models.SicknessDeclaration).options(joinedload(models.SicknessDeclaration.user))
     
     if user_id:
-        query = query.filter(models.SicknessDeclaration.user_id == user_id)
-    
-    return query.order_by(models.SicknessDeclaration.created_at.desc()).offset(skip).limit(limit).all()
+        statement = statement.where(models.SicknessDeclaration.user_id == user_id)
+    return statement
+
+def _sickness_declarations_list(skip: int, limit: int, user_id: Optional[int]):
+    statement = _sickness_declarations_statement(user_id=user_id)
+    return statement.order_by(models.SicknessDeclaration.created_at.desc()).offset(skip).limit(limit)
+
+def get_sickness_declarations(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None) -> List[models.SicknessDeclaration]:
+    """Récupérer les déclarations de maladie avec filtres optionnels"""
+    return db.scalars(_sickness_declarations_list(skip, limit, user_id)).all()
+
+def get_sickness_declarations_page(db: Session, cursor: Optional[str] = None, limit: int = 100, user_id: Optional[int] = None) -> Tuple[List[models.SicknessDeclaration], Optional[str]]:
+    """Récupérer une page de déclarations de maladie après le curseur (created_at, id)"""
+    return keyset_page(db, _sickness_declarations_statement(user_id=user_id), models.SicknessDeclaration, cursor, limit)
+
+async def get_sickness_declarations_async(db: AsyncSession, skip: int = 0, limit: int = 100, user_id: Optional[int] = None) -> List[models.SicknessDeclaration]:
+    """Variante asynchrone de get_sickness_declarations"""
+    return (await db.scalars(_sickness_declarations_list(skip, limit, user_id))).all()
+
+async def get_sickness_declarations_page_async(db: AsyncSession, cursor: Optional[str] = None, limit: int = 100, user_id: Optional[int] = None) -> Tuple[List[models.SicknessDeclaration], Optional[str]]:
+    """Variante asynchrone de get_sickness_declarations_page"""
+    statement = _sickness_declarations_statement(user_id=user_id)
+    return await keyset_page_async(db, statement, models.SicknessDeclaration, cursor, limit)
 
 def create_sickness_declaration(db: Session, declaration: schemas.SicknessDeclarationCreate, user_id: int) -> models.SicknessDeclaration:
     """Créer une nouvelle déclaration de maladie"""
@@ -25,18 +54,68 @@ def create_sickness_declaration(db: Session, declaration: schemas.SicknessDeclar
         description=declaration.description
     )
     db.add(db_declaration)
+    apply_sickness_change(db, None, sickness_snapshot(db_declaration))
     db.commit()
     db.refresh(db_declaration)
     return db_declaration
 
-def update_sickness_declaration_file(db: Session, declaration_id: int, filename: str, file_path: str) -> Optional[models.SicknessDeclaration]:
-    """Mettre à jour les informations de fichier d'une déclaration de maladie"""
+def delete_sickness_declaration(db: Session, declaration_id: int) -> bool:
+    """Supprimer une déclaration de maladie"""
+    db_declaration = get_sickness_declaration(db, declaration_id)
+    if not db_declaration:
+        return False
+    
+    before = sickness_snapshot(db_declaration)
+    orphan = release_stored_file(db, db_declaration.pdf_sha256) if db_declaration.pdf_sha256 else None
+    # Pas d'email pour une déclaration qui n'existe plus
+    cancel_pending_notifications(db, declaration_id)
+    db.delete(db_declaration)
+    apply_sickness_change(db, before, None)
+    # Le fichier n'est supprimé qu'une fois la dernière référence retirée
+    if orphan:
+        delete_unreferenced_file(db, orphan)
+    db.commit()
+    return True
+
+def discard_sickness_declaration(db: Session, declaration_id: int, before: SicknessSnapshot, reserved_sha256: Optional[str] = None) -> None:
+    """
+    Supprimer en une transaction une déclaration dont le dépôt du PDF a échoué, après rollback des écritures
+    en cours: la référence réservée est retirée et la ligne supprimée directement (ni fichier ni email validés)
+    """
+    if reserved_sha256:
+        orphan = release_stored_file(db, reserved_sha256)
+        if orphan:
+            delete_unreferenced_file(db, orphan)
+    db.execute(
+        delete(models.SicknessDeclaration)
+        .where(models.SicknessDeclaration.id == declaration_id)
+        .execution_options(synchronize_session=False)
+    )
+    apply_sickness_change(db, before, None)
+    db.commit()
+
+def update_sickness_declaration_file(db: Session, declaration_id: int, filename: str, file_path: str, sha256: Optional[str] = None, reference_held: bool = False) -> Optional[models.SicknessDeclaration]:
+    """
+    Mettre à jour les informations de fichier d'une déclaration de maladie
+    (reference_held: référence déjà acquise par reserve_stored_file avant le dépôt du contenu)
+    """
     db_declaration = get_sickness_declaration(db, declaration_id)
     if not db_declaration:
         return None
     
+    if db_declaration.pdf_sha256 != sha256:
+        if db_declaration.pdf_sha256:
+            orphan = release_stored_file(db, db_declaration.pdf_sha256)
+            if orphan:
+                delete_unreferenced_file(db, orphan)
+        if sha256 and not reference_held:
+            acquire_stored_file(db, sha256, file_path)
+    elif sha256 and reference_held:
+        release_stored_file(db, sha256)  # Contenu inchangé: la référence réservée est en trop
+    
     db_declaration.pdf_filename = filename
     db_declaration.pdf_path = file_path
+    db_declaration.pdf_sha256 = sha256
     db.commit()
     db.refresh(db_declaration)
     return db_declaration
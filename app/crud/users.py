@@ -1,7 +1,10 @@
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Optional, List, Tuple
 
 from app import models, schemas, auth
+from .pagination import keyset_page, keyset_page_async
 
 def get_user(db: Session, user_id: int) -> Optional[models.User]:
     """Récupérer un utilisateur par ID"""
@@ -15,6 +18,26 @@ def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]
     """Récupérer la liste des utilisateurs"""
     return db.query(models.User).offset(skip).limit(limit).all()
 
+def get_users_page(db: Session, cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[models.User], Optional[str]]:
+    """Récupérer une page d'utilisateurs après le curseur (created_at, id)"""
+    return keyset_page(db, select(models.User), models.User, cursor, limit)
+
+async def get_user_async(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    """Variante asynchrone de get_user"""
+    return await db.get(models.User, user_id)
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[models.User]:
+    """Variante asynchrone de get_user_by_email"""
+    return (await db.scalars(select(models.User).where(models.User.email == email).limit(1))).first()
+
+async def get_users_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.User]:
+    """Variante asynchrone de get_users"""
+    return (await db.scalars(select(models.User).offset(skip).limit(limit))).all()
+
+async def get_users_page_async(db: AsyncSession, cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[models.User], Optional[str]]:
+    """Variante asynchrone de get_users_page"""
+    return await keyset_page_async(db, select(models.User), models.User, cursor, limit)
+
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     """Créer un nouvel utilisateur"""
     hashed_password = auth.get_password_hash(user.password)
@@ -47,6 +70,7 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate) -> O
     
     db.commit()
     db.refresh(db_user)
+    auth.principal_cache.invalidate_user(user_id)
     return db_user
 
 def delete_user(db: Session, user_id: int) -> bool:
@@ -54,6 +78,9 @@ def delete_user(db: Session, user_id: int) -> bool:
     db_user = get_user(db, user_id)
     if not db_user:
         return False
+    # Soldes matérialisés (clé étrangère vers users, écrits même sans absence)
+    db.query(models.LeaveBalance).filter(models.LeaveBalance.user_id == user_id).delete()
     db.delete(db_user)
     db.commit()
+    auth.principal_cache.invalidate_user(user_id)
     return True 
\ No newline at end of file
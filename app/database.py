@@ -1,9 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from sqlalchemy.orm import sessionmaker
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import threading
+import time
 
 # Configuration de la base de données selon l'environnement
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
@@ -14,7 +15,7 @@ elif ENVIRONMENT == "production":
     # En production, prioriser Neon/PostgreSQL puis SQLite fichier
     DATABASE_URL = (
         os.getenv("DATABASE_URL") or
-        os.getenv("POSTGRES_URL") or 
+        os.getenv("POSTGRES_URL") or
         os.getenv("POSTGRES_PRISMA_URL") or
         os.getenv("NEON_DATABASE_URL") or
         "sqlite:////tmp/absences.db"  # Fallback vers /tmp (écriture autorisée sur Vercel)
@@ -22,21 +23,183 @@ elif ENVIRONMENT == "production":
 else:
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./absences.db")
 
-# Configuration pour SQLite
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False}  # Nécessaire pour SQLite
-    )
-else:
-    engine = create_engine(DATABASE_URL)
+# Pool de connexions PostgreSQL:
+# - "null": aucune connexion conservée entre deux sessions, le pooling est assuré par le pooler
+#   externe (pgbouncer, endpoint "-pooler" de Neon); adapté aux fonctions serverless (Vercel)
+# - "queue": pool local, connexions vérifiées avant usage et renouvelées; serveur uvicorn
+POOL_MODE = os.getenv("DB_POOL_MODE") or ("null" if os.getenv("VERCEL") else "queue")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Neon suspend le calcul après 5 minutes d'inactivité: ne pas réutiliser une connexion plus ancienne
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "280"))
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+def uses_external_pooler(database_url: str) -> bool:
+    """Connexion via pgbouncer: DB_PGBOUNCER, ou endpoint "-pooler" de Neon"""
+    flag = os.getenv("DB_PGBOUNCER")
+    if flag:
+        return flag.lower() in ("1", "true", "yes")
+    return "-pooler" in (make_url(database_url).host or "")
+
+def engine_options(database_url: str, pool_mode: str = POOL_MODE, pgbouncer: bool = None) -> dict:
+    """Arguments de create_engine (ou create_async_engine) selon la base et le mode de pool"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}  # Nécessaire pour SQLite
+
+    if pgbouncer is None:
+        pgbouncer = uses_external_pooler(database_url)
+    driver = url.get_driver_name()
+    connect_args = {"timeout" if driver == "asyncpg" else "connect_timeout": CONNECT_TIMEOUT}
+    if pgbouncer:
+        # En mode transaction, pgbouncer change de connexion serveur entre deux transactions:
+        # pas d'instructions préparées côté serveur (psycopg2 n'en utilise pas)
+        if driver == "psycopg":
+            connect_args["prepare_threshold"] = None
+        elif driver == "asyncpg":
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+
+    if pool_mode == "null":
+        return {"poolclass": NullPool, "connect_args": connect_args}
+    return {
+        "poolclass": AsyncAdaptedQueuePool if driver == "asyncpg" else QueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": True,
+        "connect_args": connect_args
+    }
+
+class PoolMetrics:
+    """Temps d'établissement des connexions et compteurs d'utilisation du pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections = 0
+        self.connect_ms_total = 0.0
+        self.connect_ms_max = 0.0
+        self.connect_ms_last = None
+        self.checkouts = 0
+        self.invalidated = 0
+
+    def attach(self, engine):
+        event.listen(engine, "do_connect", self._before_connect)
+        event.listen(engine, "connect", self._after_connect)
+        event.listen(engine, "checkout", self._checkout)
+        event.listen(engine, "invalidate", self._invalidate)
+
+    def _before_connect(self, dialect, connection_record, cargs, cparams):
+        self._local.started = time.perf_counter()
+
+    def _after_connect(self, dbapi_connection, connection_record):
+        started = getattr(self._local, "started", None)
+        if started is None:
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        self._local.started = None
+        with self._lock:
+            self.connections += 1
+            self.connect_ms_total += elapsed
+            self.connect_ms_max = max(self.connect_ms_max, elapsed)
+            self.connect_ms_last = elapsed
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidated += 1
+
+    def snapshot(self, engine) -> dict:
+        """Métriques cumulées depuis le démarrage de l'instance et état actuel du pool"""
+        pool = engine.pool
+        with self._lock:
+            metrics = {
+                "connections": self.connections,
+                "connect_ms_avg": round(self.connect_ms_total / self.connections, 2) if self.connections else None,
+                "connect_ms_max": round(self.connect_ms_max, 2),
+                "connect_ms_last": round(self.connect_ms_last, 2) if self.connect_ms_last is not None else None,
+                "checkouts": self.checkouts,
+                # Sessions servies sans nouvelle connexion
+                "reuse_ratio": round(1 - self.connections / self.checkouts, 3) if self.checkouts else None,
+                "invalidated": self.invalidated
+            }
+        metrics["pool"] = {"class": type(pool).__name__, "status": pool.status()}
+        if isinstance(pool, QueuePool):
+            metrics["pool"].update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow()
+            )
+        return metrics
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+
+pool_metrics = PoolMetrics()
+pool_metrics.attach(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def async_database_url(database_url: str) -> str:
+    """URL du moteur asynchrone: asyncpg pour PostgreSQL, aiosqlite pour SQLite"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    # asyncpg n'accepte pas les paramètres libpq des URL Neon (sslmode, channel_binding)
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode:
+        query["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+# Moteur asynchrone des routes de lecture, créé à la première utilisation (aiosqlite/asyncpg hors démarrage à froid)
+_async_engine = None
+_async_sessionmaker = None
+_async_lock = threading.Lock()
+async_pool_metrics = PoolMetrics()
+
+def get_async_sessionmaker():
+    """Fabrique de sessions asynchrones (AsyncSession) sur la même base que SessionLocal"""
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        with _async_lock:
+            if _async_sessionmaker is None:
+                from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+                url = async_database_url(DATABASE_URL)
+                _async_engine = create_async_engine(url, **engine_options(url))
+                async_pool_metrics.attach(_async_engine.sync_engine)
+                # Objets lus encore utilisables après la fin de la session (pas de chargement différé en asynchrone)
+                _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+def get_pool_metrics() -> dict:
+    """Configuration et métriques du pool de connexions du moteur principal (et du moteur asynchrone)"""
+    metrics = {
+        "backend": engine.dialect.name,
+        "pool_mode": "sqlite" if engine.dialect.name == "sqlite" else POOL_MODE,
+        "external_pooler": engine.dialect.name != "sqlite" and uses_external_pooler(DATABASE_URL),
+        **pool_metrics.snapshot(engine)
+    }
+    if _async_engine is not None:
+        metrics["async"] = async_pool_metrics.snapshot(_async_engine.sync_engine)
+    return metrics
+
 def get_db():
     """Dependency pour obtenir une session de base de données"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Dependency pour obtenir une session asynchrone (routes de lecture: les requêtes ne bloquent pas la boucle)"""
+    async with get_async_sessionmaker()() as db:
+        yield db
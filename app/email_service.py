@@ -1,19 +1,83 @@
 import smtplib
 import os
-import requests
+import time
+import threading
+import asyncio
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List
-from dotenv import load_dotenv
-from jinja2 import Template
+from typing import List, Callable
 
-load_dotenv()
+from app.attachments import FileAttachment
+from app.email_templates import email_templates
+from app.file_service import file_service
+from app.resend_transport import ResendTransport
+
+class SMTPConnectionPool:
+    """Pool de sessions SMTP authentifiées, vérifiées par NOOP avant réutilisation"""
+    
+    def __init__(self, connect: Callable[[], smtplib.SMTP], max_size: int = 2, max_idle: float = 60):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self._idle = []  # (connexion, instant de dernière utilisation)
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> smtplib.SMTP:
+        """Récupérer une session vivante du pool, ou en ouvrir une nouvelle"""
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                return self._connect()
+            server, last_used = item
+            if time.monotonic() - last_used <= self.max_idle and self._is_alive(server):
+                return server
+            self.discard(server)
+    
+    def release(self, server: smtplib.SMTP):
+        """Rendre une session au pool (fermée si le pool est plein)"""
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((server, time.monotonic()))
+                return
+        self.discard(server)
+    
+    def discard(self, server: smtplib.SMTP):
+        """Fermer une session sans erreur si elle est déjà coupée"""
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    def close_all(self):
+        """Fermer toutes les sessions inactives"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self.discard(server)
+    
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
 
 class EmailService:
     def __init__(self):
         self._init_smtp_config()
         self._init_resend_config()
         self.use_resend = bool(self.resend_api_key)
+        self._smtp_pool = SMTPConnectionPool(
+            self._connect_smtp,
+            max_size=int(os.getenv("SMTP_POOL_SIZE", "2")),
+            max_idle=float(os.getenv("SMTP_POOL_MAX_IDLE", "60"))
+        )
+        self._local = threading.local()  # Session épinglée pendant send_many / batch()
         
     def _init_smtp_config(self):
         """Initialise la configuration SMTP"""
@@ -22,11 +86,13 @@ class EmailService:
         self.smtp_username = os.getenv("SMTP_USERNAME")
         self.smtp_password = os.getenv("SMTP_PASSWORD")
         self.email_from = os.getenv("EMAIL_FROM")
+        self.smtp_timeout = float(os.getenv("SMTP_TIMEOUT", "30"))
         
     def _init_resend_config(self):
         """Initialise la configuration Resend"""
         self.resend_api_key = os.getenv("RESEND_API_KEY")
         self.resend_from_email = os.getenv("RESEND_FROM_EMAIL", "noreply@votre-domaine.com")
+        self.resend_transport = ResendTransport(self.resend_api_key) if self.resend_api_key else None
         
     def _format_subject(self, subject: str) -> str:
         """Formater le sujet avec le préfixe standard"""
@@ -43,6 +109,25 @@ class EmailService:
         else:
             return self._send_email_smtp(to_emails, formatted_subject, body, html_body)
     
+    def _resend_payload(self, to_emails: List[str], subject: str, body: str, html_body: str = None, attachment_path: str = None) -> dict:
+        """Corps JSON d'un email pour l'API Resend"""
+        data = {
+            "from": self.resend_from_email,
+            "to": to_emails,
+            "subject": subject,
+            "text": body,
+            "html": html_body if html_body else None
+        }
+        
+        # Ajouter la pièce jointe si fournie (encodée par morceaux au moment de l'envoi)
+        if attachment_path and os.path.exists(attachment_path):
+            attachment = FileAttachment(attachment_path)
+            data["attachments"] = [{
+                "content": attachment,
+                "filename": attachment.filename
+            }]
+        return data
+    
     def _send_email_resend(self, to_emails: List[str], subject: str, body: str, html_body: str = None):
         """Envoyer un email via Resend API"""
         if not self.resend_api_key:
@@ -50,28 +135,11 @@ class EmailService:
             return False
             
         try:
-            url = "https://api.resend.com/emails"
-            headers = {
-                "Authorization": f"Bearer {self.resend_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "from": self.resend_from_email,
-                "to": to_emails,
-                "subject": subject,
-                "text": body,
-                "html": html_body if html_body else None
-            }
-            
-            response = requests.post(url, headers=headers, json=data)
-            
-            if response.status_code == 200:
+            payload = self._resend_payload(to_emails, subject, body, html_body)
+            if self.resend_transport.run(self.resend_transport.send(payload)):
                 print(f"Email envoyé via Resend à {to_emails}")
                 return True
-            else:
-                print(f"Erreur Resend: {response.status_code} - {response.text}")
-                return False
+            return False
                 
         except Exception as e:
             print(f"Erreur lors de l'envoi de l'email via Resend: {e}")
@@ -111,329 +179,182 @@ class EmailService:
         
         return msg
     
-    def _send_smtp_message(self, msg):
-        """Envoie un message SMTP"""
-        with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+    def _connect_smtp(self) -> smtplib.SMTP:
+        """Ouvre une session SMTP authentifiée (TLS + login)"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
+        try:
             server.starttls()
             server.login(self.smtp_username, self.smtp_password)
-            server.send_message(msg)
+        except Exception:
+            server.close()
+            raise
+        return server
     
-    def send_absence_request_notification(self, admin_emails: List[str], user_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None):
-        """Notifier les admins d'une nouvelle demande d'absence"""
-        subject = f"Nouvelle demande d'absence - {user_name}"
-        body, html_body = self._create_absence_request_content(user_name, absence_type, start_date, end_date, reason)
-        return self.send_email(admin_emails, subject, body, html_body)
+    def _acquire_smtp(self) -> smtplib.SMTP:
+        """Session du lot en cours, sinon une session du pool"""
+        if getattr(self._local, "batch_depth", 0):
+            if self._local.server is None:
+                self._local.server = self._smtp_pool.acquire()
+            return self._local.server
+        return self._smtp_pool.acquire()
     
-    def _create_absence_request_content(self, user_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None):
-        """Crée le contenu pour une notification de demande d'absence"""
-        body = f"""
-Bonjour,
-
-Une nouvelle demande d'absence a été soumise :
-
-Employé : {user_name}
-Type : {absence_type}
-Début : {start_date}
-Fin : {end_date}
-Raison : {reason or 'Non spécifiée'}
-
-Veuillez vous connecter à l'application pour traiter cette demande.
-
-Cordialement,
-Système de gestion des absences
+    def _release_smtp(self, server: smtplib.SMTP, broken: bool = False):
+        """Rendre une session (la session du lot reste épinglée jusqu'à la fin du lot)"""
+        if getattr(self._local, "batch_depth", 0) and self._local.server is server:
+            if broken:
+                self._local.server = None
+                self._smtp_pool.discard(server)
+            return
+        if broken:
+            self._smtp_pool.discard(server)
+        else:
+            self._smtp_pool.release(server)
+    
+    def _send_smtp_message(self, msg):
+        """Envoie un message SMTP sur une session réutilisée (reconnexion si elle a été coupée)"""
+        for attempt in range(2):
+            server = self._acquire_smtp()
+            try:
+                server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self._release_smtp(server, broken=True)
+                if attempt:
+                    raise
+                continue
+            except smtplib.SMTPException:
+                # Erreur du message (destinataire refusé...): la session reste utilisable
+                self._release_smtp(server)
+                raise
+            except Exception:
+                self._release_smtp(server, broken=True)
+                raise
+            self._release_smtp(server)
+            return
+    
+    @contextmanager
+    def batch(self):
+        """Envoyer tous les emails du bloc sur une même session SMTP"""
+        depth = getattr(self._local, "batch_depth", 0)
+        if depth == 0:
+            self._local.server = None
+        self._local.batch_depth = depth + 1
+        try:
+            yield self
+        finally:
+            self._local.batch_depth = depth
+            if depth == 0 and self._local.server is not None:
+                server, self._local.server = self._local.server, None
+                self._smtp_pool.release(server)
+    
+    def send_many(self, messages: List[dict]) -> List[bool]:
         """
-        
-        html_body = f"""
-<html>
-<body>
-    <h2>Nouvelle demande d'absence</h2>
-    <p>Bonjour,</p>
-    <p>Une nouvelle demande d'absence a été soumise :</p>
-    <ul>
-        <li><strong>Employé :</strong> {user_name}</li>
-        <li><strong>Type :</strong> {absence_type}</li>
-        <li><strong>Début :</strong> {start_date}</li>
-        <li><strong>Fin :</strong> {end_date}</li>
-        <li><strong>Raison :</strong> {reason or 'Non spécifiée'}</li>
-    </ul>
-    <p>Veuillez vous connecter à l'application pour traiter cette demande.</p>
-    <p>Cordialement,<br>Système de gestion des absences</p>
-</body>
-</html>
+        Envoyer plusieurs emails distincts en une rafale:
+        une même session SMTP, ou l'endpoint batch de Resend
+        messages: dicts avec to_emails, subject, body, html_body et attachment_path optionnels
         """
+        if self.use_resend:
+            payloads = [self._resend_message_payload(message) for message in messages]
+            try:
+                return self.resend_transport.run(self.resend_transport.send_batch(payloads))
+            except Exception as e:
+                print(f"Erreur lors de l'envoi groupé via Resend: {e}")
+                return [False] * len(messages)
         
-        return body, html_body
+        results = []
+        with self.batch():
+            for message in messages:
+                if message.get("attachment_path"):
+                    results.append(self.send_email_with_attachment(**message))
+                else:
+                    results.append(self.send_email(**{k: v for k, v in message.items() if k != "attachment_path"}))
+        return results
+    
+    async def send_many_async(self, messages: List[dict]) -> List[bool]:
+        """Version asynchrone de send_many (client Resend de la boucle courante)"""
+        if self.use_resend:
+            payloads = [self._resend_message_payload(message) for message in messages]
+            return await self.resend_transport.send_batch(payloads)
+        # smtplib est bloquant: l'envoi part dans un thread
+        return await asyncio.to_thread(self.send_many, messages)
+    
+    def _resend_message_payload(self, message: dict) -> dict:
+        """Corps Resend d'un message de send_many"""
+        return self._resend_payload(
+            message["to_emails"],
+            self._format_subject(message["subject"]),
+            message["body"],
+            message.get("html_body"),
+            message.get("attachment_path")
+        )
+    
+    def send_absence_request_notification(self, admin_emails: List[str], user_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None):
+        """Notifier les admins d'une nouvelle demande d'absence"""
+        subject, body, html_body = email_templates.render(
+            "absence_request", user_name=user_name, absence_type=absence_type,
+            start_date=start_date, end_date=end_date, reason=reason
+        )
+        return self.send_email(admin_emails, subject, body, html_body)
     
     def send_absence_status_notification(self, user_email: str, user_name: str, absence_type: str, status: str, admin_comment: str = None):
         """Notifier l'utilisateur du changement de statut de sa demande"""
         status_text = "approuvée" if status == "approuve" else "refusée"
-        subject = f"Demande d'absence {status_text}"
-        body, html_body = self._create_absence_status_content(user_name, absence_type, status_text, admin_comment)
+        subject, body, html_body = email_templates.render(
+            "absence_status", user_name=user_name, absence_type=absence_type,
+            status_text=status_text, admin_comment=admin_comment
+        )
         return self.send_email([user_email], subject, body, html_body)
     
-    def _create_absence_status_content(self, user_name: str, absence_type: str, status_text: str, admin_comment: str = None):
-        """Crée le contenu pour une notification de statut d'absence"""
-        body = f"""
-Bonjour {user_name},
-
-Votre demande d'absence ({absence_type}) a été {status_text}.
-
-{f"Commentaire de l'administrateur : {admin_comment}" if admin_comment else ""}
-
-Cordialement,
-Système de gestion des absences
-        """
-        
-        html_body = f"""
-<html>
-<body>
-    <h2>Statut de votre demande d'absence</h2>
-    <p>Bonjour {user_name},</p>
-    <p>Votre demande d'absence ({absence_type}) a été <strong>{status_text}</strong>.</p>
-    {f"<p><strong>Commentaire de l'administrateur :</strong> {admin_comment}</p>" if admin_comment else ""}
-    <p>Cordialement,<br>Système de gestion des absences</p>
-</body>
-</html>
-        """
-        
-        return body, html_body
-
     def send_user_created_notification(self, user_email: str, user_name: str):
         """Notifier un utilisateur que son compte a été créé par un administrateur"""
-        subject = f"Compte créé"
-        body = f"""
-Bonjour {user_name},
-
-Votre compte a été créé par un administrateur dans l'application de gestion des absences.
-
-Vous pouvez dès à présent vous connecter pour consulter votre tableau de bord et effectuer vos demandes.
-
-Cordialement,
-Système de gestion des absences
-        """
-        html_body = f"""
-<html>
-<body>
-    <h2>Compte créé</h2>
-    <p>Bonjour {user_name},</p>
-    <p>Votre compte a été créé par un administrateur dans l'application de gestion des absences.</p>
-    <p>Vous pouvez dès à présent vous connecter pour consulter votre tableau de bord et effectuer vos demandes.</p>
-    <p>Cordialement,<br>Système de gestion des absences</p>
-    </body>
-</html>
-        """
+        subject, body, html_body = email_templates.render("user_created", user_name=user_name)
         return self.send_email([user_email], subject, body, html_body)
 
     def send_user_updated_notification(self, user_email: str, user_name: str):
         """Notifier un utilisateur que ses informations ont été modifiées par un administrateur"""
-        subject = f"Mise à jour de votre compte"
-        body = f"""
-Bonjour {user_name},
-
-Les informations de votre compte ont été mises à jour par un administrateur.
-
-Si vous n'êtes pas à l'origine de cette modification, veuillez contacter un administrateur.
-
-Cordialement,
-Système de gestion des absences
-        """
-        html_body = f"""
-<html>
-<body>
-    <h2>Mise à jour de votre compte</h2>
-    <p>Bonjour {user_name},</p>
-    <p>Les informations de votre compte ont été mises à jour par un administrateur.</p>
-    <p>Si vous n'êtes pas à l'origine de cette modification, veuillez contacter un administrateur.</p>
-    <p>Cordialement,<br>Système de gestion des absences</p>
-</body>
-</html>
-        """
+        subject, body, html_body = email_templates.render("user_updated", user_name=user_name)
         return self.send_email([user_email], subject, body, html_body)
     
     def send_absence_modification_notification(self, admin_emails: List[str], user_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None, request_id: int = None):
         """Notifier les admins de la modification d'une demande d'absence"""
-        subject = f"Demande d'absence modifiée - {user_name}"
-        body, html_body = self._create_absence_modification_content(user_name, absence_type, start_date, end_date, reason, request_id)
+        subject, body, html_body = email_templates.render(
+            "absence_modification", user_name=user_name, absence_type=absence_type,
+            start_date=start_date, end_date=end_date, reason=reason, request_id=request_id
+        )
         return self.send_email(admin_emails, subject, body, html_body)
     
-    def _create_absence_modification_content(self, user_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None, request_id: int = None):
-        """Crée le contenu pour une notification de modification d'absence"""
-        body = f"""
-Bonjour,
-
-Une demande d'absence a été modifiée :
-
-Employé : {user_name}
-ID de la demande : {request_id}
-Type : {absence_type}
-Début : {start_date}
-Fin : {end_date}
-Raison : {reason or 'Non spécifiée'}
-
-Veuillez vous connecter à l'application pour consulter les détails de cette modification.
-
-Cordialement,
-Système de gestion des absences
-        """
-        
-        html_body = f"""
-<html>
-<body>
-    <h2>Demande d'absence modifiée</h2>
-    <p>Bonjour,</p>
-    <p>Une demande d'absence a été modifiée :</p>
-    <ul>
-        <li><strong>Employé :</strong> {user_name}</li>
-        <li><strong>ID de la demande :</strong> {request_id}</li>
-        <li><strong>Type :</strong> {absence_type}</li>
-        <li><strong>Début :</strong> {start_date}</li>
-        <li><strong>Fin :</strong> {end_date}</li>
-        <li><strong>Raison :</strong> {reason or 'Non spécifiée'}</li>
-    </ul>
-    <p>Veuillez vous connecter à l'application pour consulter les détails de cette modification.</p>
-    <p>Cordialement,<br>Système de gestion des absences</p>
-</body>
-</html>
-        """
-        
-        return body, html_body
-    
     def send_absence_deletion_notification(self, admin_emails: List[str], user_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None, request_id: int = None):
         """Notifier les admins de la suppression d'une demande d'absence"""
-        subject = f"Demande d'absence supprimée - {user_name}"
-        body, html_body = self._create_absence_deletion_content(user_name, absence_type, start_date, end_date, reason, request_id)
+        subject, body, html_body = email_templates.render(
+            "absence_deletion", user_name=user_name, absence_type=absence_type,
+            start_date=start_date, end_date=end_date, reason=reason, request_id=request_id
+        )
         return self.send_email(admin_emails, subject, body, html_body)
     
-    def _create_absence_deletion_content(self, user_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None, request_id: int = None):
-        """Crée le contenu pour une notification de suppression d'absence"""
-        body = f"""
-Bonjour,
-
-Une demande d'absence a été supprimée :
-
-Employé : {user_name}
-ID de la demande : {request_id}
-Type : {absence_type}
-Début : {start_date}
-Fin : {end_date}
-Raison : {reason or 'Non spécifiée'}
-
-Cordialement,
-Système de gestion des absences
-        """
-        
-        html_body = f"""
-<html>
-<body>
-    <h2>Demande d'absence supprimée</h2>
-    <p>Bonjour,</p>
-    <p>Une demande d'absence a été supprimée :</p>
-    <ul>
-        <li><strong>Employé :</strong> {user_name}</li>
-        <li><strong>ID de la demande :</strong> {request_id}</li>
-        <li><strong>Type :</strong> {absence_type}</li>
-        <li><strong>Début :</strong> {start_date}</li>
-        <li><strong>Fin :</strong> {end_date}</li>
-        <li><strong>Raison :</strong> {reason or 'Non spécifiée'}</li>
-    </ul>
-    <p>Cordialement,<br>Système de gestion des absences</p>
-</body>
-</html>
-        """
-        
-        return body, html_body
-    
     def send_admin_absence_notification(self, user_email: str, user_name: str, admin_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None, admin_comment: str = None):
         """Notifier l'utilisateur d'une absence créée par un admin"""
-        subject = f"Absence créée par l'administrateur - {user_name}"
-        body, html_body = self._create_admin_absence_content(user_name, admin_name, absence_type, start_date, end_date, reason, admin_comment)
+        subject, body, html_body = email_templates.render(
+            "admin_absence", user_name=user_name, admin_name=admin_name, absence_type=absence_type,
+            start_date=start_date, end_date=end_date, reason=reason, admin_comment=admin_comment
+        )
         return self.send_email([user_email], subject, body, html_body)
     
-    def _create_admin_absence_content(self, user_name: str, admin_name: str, absence_type: str, start_date: str, end_date: str, reason: str = None, admin_comment: str = None):
-        """Crée le contenu pour une notification d'absence créée par un admin"""
-        body = f"""
-Bonjour {user_name},
-
-Une absence a été créée pour vous par l'administrateur {admin_name} :
-
-Type : {absence_type}
-Début : {start_date}
-Fin : {end_date}
-Raison : {reason or 'Non spécifiée'}
-{f"Commentaire de l'administrateur : {admin_comment}" if admin_comment else ""}
-
-Cordialement,
-Système de gestion des absences
-        """
-        
-        html_body = f"""
-<html>
-<body>
-    <h2>Absence créée par l'administrateur</h2>
-    <p>Bonjour {user_name},</p>
-    <p>Une absence a été créée pour vous par l'administrateur <strong>{admin_name}</strong> :</p>
-    <ul>
-        <li><strong>Type :</strong> {absence_type}</li>
-        <li><strong>Début :</strong> {start_date}</li>
-        <li><strong>Fin :</strong> {end_date}</li>
-        <li><strong>Raison :</strong> {reason or 'Non spécifiée'}</li>
-    </ul>
-    {f"<p><strong>Commentaire de l'administrateur :</strong> {admin_comment}</p>" if admin_comment else ""}
-    <p>Cordialement,<br>Système de gestion des absences</p>
-</body>
-</html>
-        """
-        
-        return body, html_body
-    
     def send_sickness_declaration_email(self, user_name: str, to_emails: list[str], start_date: str, end_date: str, description: str = None, pdf_path: str = None):
         """Envoyer un email de déclaration de maladie (à un ou plusieurs destinataires)"""
-        subject = f"Nouvelle déclaration de maladie - {user_name}"
-        body, html_body = self._create_sickness_declaration_content(user_name, start_date, end_date, description)
+        subject, body, html_body = email_templates.render(
+            "sickness_declaration", user_name=user_name,
+            start_date=start_date, end_date=end_date, description=description
+        )
         
         if pdf_path:
+            try:
+                # Référence de stockage -> fichier local (téléchargé depuis S3 si besoin)
+                pdf_path = file_service.local_path(pdf_path)
+            except FileNotFoundError:
+                pass
             return self.send_email_with_attachment(to_emails, subject, body, html_body, pdf_path)
         else:
             return self.send_email(to_emails, subject, body, html_body)
     
-    def _create_sickness_declaration_content(self, user_name: str, start_date: str, end_date: str, description: str = None):
-        """Crée le contenu pour une déclaration de maladie"""
-        body = f"""
-Bonjour,
-
-Une nouvelle déclaration de maladie a été soumise :
-
-Employé : {user_name}
-Début : {start_date}
-Fin : {end_date}
-Description : {description or 'Non spécifiée'}
-
-Veuillez vous connecter à l'application pour traiter cette déclaration.
-
-Cordialement,
-Système de gestion des absences
-        """
-        
-        html_body = f"""
-<html>
-<body>
-    <h2>Nouvelle déclaration de maladie</h2>
-    <p>Bonjour,</p>
-    <p>Une nouvelle déclaration de maladie a été soumise :</p>
-    <ul>
-        <li><strong>Employé :</strong> {user_name}</li>
-        <li><strong>Début :</strong> {start_date}</li>
-        <li><strong>Fin :</strong> {end_date}</li>
-        <li><strong>Description :</strong> {description or 'Non spécifiée'}</li>
-    </ul>
-    <p>Veuillez vous connecter à l'application pour traiter cette déclaration.</p>
-    <p>Cordialement,<br>Système de gestion des absences</p>
-</body>
-</html>
-        """
-        
-        return body, html_body
-    
     def send_email_with_attachment(self, to_emails: list[str], subject: str, body: str, html_body: str = None, attachment_path: str = None):
         """Envoyer un email avec pièce jointe"""
         formatted_subject = self._format_subject(subject)
@@ -449,38 +370,11 @@ Système de gestion des absences
             return False
             
         try:
-            url = "https://api.resend.com/emails"
-            headers = {
-                "Authorization": f"Bearer {self.resend_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "from": self.resend_from_email,
-                "to": to_emails,
-                "subject": subject,
-                "text": body,
-                "html": html_body if html_body else None
-            }
-            
-            # Ajouter la pièce jointe si fournie
-            if attachment_path and os.path.exists(attachment_path):
-                with open(attachment_path, 'rb') as f:
-                    import base64
-                    attachment_content = base64.b64encode(f.read()).decode('utf-8')
-                    data["attachments"] = [{
-                        "content": attachment_content,
-                        "filename": os.path.basename(attachment_path)
-                    }]
-            
-            response = requests.post(url, headers=headers, json=data)
-            
-            if response.status_code == 200:
+            payload = self._resend_payload(to_emails, subject, body, html_body, attachment_path)
+            if self.resend_transport.run(self.resend_transport.send(payload)):
                 print(f"Email avec pièce jointe envoyé via Resend à {to_emails}")
                 return True
-            else:
-                print(f"Erreur Resend: {response.status_code} - {response.text}")
-                return False
+            return False
                 
         except Exception as e:
             print(f"Erreur lors de l'envoi de l'email avec pièce jointe via Resend: {e}")
@@ -504,58 +398,32 @@ Système de gestion des absences
     
     def _create_smtp_message_with_attachment(self, to_emails: list[str], subject: str, body: str, html_body: str = None, attachment_path: str = None):
         """Crée un message SMTP avec pièce jointe"""
-        msg = MIMEMultipart('alternative')
+        # Sans pièce jointe lisible, le message se limite aux contenus texte et HTML
+        if not attachment_path or not os.path.exists(attachment_path):
+            return self._create_smtp_message(to_emails, subject, body, html_body)
+        
+        msg = MIMEMultipart('mixed')
         msg['Subject'] = subject
         msg['From'] = self.email_from
         msg['To'] = ', '.join(to_emails)
         
-        # Ajouter le contenu texte
-        text_part = MIMEText(body, 'plain', 'utf-8')
-        msg.attach(text_part)
-        
-        # Ajouter le contenu HTML si fourni
+        # Contenus texte et HTML en alternative, puis la pièce jointe encodée depuis le disque
+        content = MIMEMultipart('alternative')
+        content.attach(MIMEText(body, 'plain', 'utf-8'))
         if html_body:
-            html_part = MIMEText(html_body, 'html', 'utf-8')
-            msg.attach(html_part)
-        
-        # Ajouter la pièce jointe si fournie
-        if attachment_path and os.path.exists(attachment_path):
-            with open(attachment_path, 'rb') as f:
-                attachment = MIMEText(f.read(), 'base64', 'utf-8')
-                attachment.add_header('Content-Disposition', 'attachment', filename=os.path.basename(attachment_path))
-                msg.attach(attachment)
+            content.attach(MIMEText(html_body, 'html', 'utf-8'))
+        msg.attach(content)
+        msg.attach(FileAttachment(attachment_path).mime_part())
         
         return msg
     
     def send_sickness_declaration_viewed_notification(self, user_email: str, user_name: str, start_date: str, end_date: str, admin_name: str):
         """Notifier l'utilisateur que sa déclaration de maladie a été vue"""
-        subject = f"Déclaration de maladie consultée - {user_name}"
-        body, html_body = self._create_sickness_viewed_content(user_name, start_date, end_date, admin_name)
+        subject, body, html_body = email_templates.render(
+            "sickness_viewed", user_name=user_name,
+            start_date=start_date, end_date=end_date, admin_name=admin_name
+        )
         return self.send_email([user_email], subject, body, html_body)
     
-    def _create_sickness_viewed_content(self, user_name: str, start_date: str, end_date: str, admin_name: str):
-        """Crée le contenu pour une notification de consultation de déclaration de maladie"""
-        body = f"""
-Bonjour {user_name},
-
-Votre déclaration de maladie du {start_date} au {end_date} a été consultée par l'administrateur {admin_name}.
-
-Cordialement,
-Système de gestion des absences
-        """
-        
-        html_body = f"""
-<html>
-<body>
-    <h2>Déclaration de maladie consultée</h2>
-    <p>Bonjour {user_name},</p>
-    <p>Votre déclaration de maladie du <strong>{start_date}</strong> au <strong>{end_date}</strong> a été consultée par l'administrateur <strong>{admin_name}</strong>.</p>
-    <p>Cordialement,<br>Système de gestion des absences</p>
-</body>
-</html>
-        """
-        
-        return body, html_body
-
 # Instance globale
 email_service = EmailService()
\ No newline at end of file
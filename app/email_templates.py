@@ -0,0 +1,368 @@
+"""
+Modèles des emails de notification (Jinja2), compilés une seule fois, au premier email envoyé
+"""
+import threading
+from functools import lru_cache
+from typing import Dict, Tuple
+
+SIGNATURE_TEXT = """Cordialement,
+Système de gestion des absences"""
+
+SIGNATURE_HTML = "<p>Cordialement,<br>Système de gestion des absences</p>"
+
+# Nom de la notification -> (sujet, texte brut, HTML)
+TEMPLATES: Dict[str, Tuple[str, str, str]] = {
+    "absence_request": (
+        "Nouvelle demande d'absence - {{ user_name }}",
+        """
+Bonjour,
+
+Une nouvelle demande d'absence a été soumise :
+
+Employé : {{ user_name }}
+Type : {{ absence_type }}
+Début : {{ start_date }}
+Fin : {{ end_date }}
+Raison : {{ reason or 'Non spécifiée' }}
+
+Veuillez vous connecter à l'application pour traiter cette demande.
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Nouvelle demande d'absence</h2>
+    <p>Bonjour,</p>
+    <p>Une nouvelle demande d'absence a été soumise :</p>
+    <ul>
+        <li><strong>Employé :</strong> {{ user_name }}</li>
+        <li><strong>Type :</strong> {{ absence_type }}</li>
+        <li><strong>Début :</strong> {{ start_date }}</li>
+        <li><strong>Fin :</strong> {{ end_date }}</li>
+        <li><strong>Raison :</strong> {{ reason or 'Non spécifiée' }}</li>
+    </ul>
+    <p>Veuillez vous connecter à l'application pour traiter cette demande.</p>
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+    "absence_status": (
+        "Demande d'absence {{ status_text }}",
+        """
+Bonjour {{ user_name }},
+
+Votre demande d'absence ({{ absence_type }}) a été {{ status_text }}.
+{% if admin_comment %}
+
+Commentaire de l'administrateur : {{ admin_comment }}
+{% endif %}
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Statut de votre demande d'absence</h2>
+    <p>Bonjour {{ user_name }},</p>
+    <p>Votre demande d'absence ({{ absence_type }}) a été <strong>{{ status_text }}</strong>.</p>
+    {% if admin_comment %}
+    <p><strong>Commentaire de l'administrateur :</strong> {{ admin_comment }}</p>
+    {% endif %}
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+    "user_created": (
+        "Compte créé",
+        """
+Bonjour {{ user_name }},
+
+Votre compte a été créé par un administrateur dans l'application de gestion des absences.
+
+Vous pouvez dès à présent vous connecter pour consulter votre tableau de bord et effectuer vos demandes.
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Compte créé</h2>
+    <p>Bonjour {{ user_name }},</p>
+    <p>Votre compte a été créé par un administrateur dans l'application de gestion des absences.</p>
+    <p>Vous pouvez dès à présent vous connecter pour consulter votre tableau de bord et effectuer vos demandes.</p>
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+    "user_updated": (
+        "Mise à jour de votre compte",
+        """
+Bonjour {{ user_name }},
+
+Les informations de votre compte ont été mises à jour par un administrateur.
+
+Si vous n'êtes pas à l'origine de cette modification, veuillez contacter un administrateur.
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Mise à jour de votre compte</h2>
+    <p>Bonjour {{ user_name }},</p>
+    <p>Les informations de votre compte ont été mises à jour par un administrateur.</p>
+    <p>Si vous n'êtes pas à l'origine de cette modification, veuillez contacter un administrateur.</p>
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+    "absence_modification": (
+        "Demande d'absence modifiée - {{ user_name }}",
+        """
+Bonjour,
+
+Une demande d'absence a été modifiée :
+
+Employé : {{ user_name }}
+ID de la demande : {{ request_id }}
+Type : {{ absence_type }}
+Début : {{ start_date }}
+Fin : {{ end_date }}
+Raison : {{ reason or 'Non spécifiée' }}
+
+Veuillez vous connecter à l'application pour consulter les détails de cette modification.
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Demande d'absence modifiée</h2>
+    <p>Bonjour,</p>
+    <p>Une demande d'absence a été modifiée :</p>
+    <ul>
+        <li><strong>Employé :</strong> {{ user_name }}</li>
+        <li><strong>ID de la demande :</strong> {{ request_id }}</li>
+        <li><strong>Type :</strong> {{ absence_type }}</li>
+        <li><strong>Début :</strong> {{ start_date }}</li>
+        <li><strong>Fin :</strong> {{ end_date }}</li>
+        <li><strong>Raison :</strong> {{ reason or 'Non spécifiée' }}</li>
+    </ul>
+    <p>Veuillez vous connecter à l'application pour consulter les détails de cette modification.</p>
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+    "absence_deletion": (
+        "Demande d'absence supprimée - {{ user_name }}",
+        """
+Bonjour,
+
+Une demande d'absence a été supprimée :
+
+Employé : {{ user_name }}
+ID de la demande : {{ request_id }}
+Type : {{ absence_type }}
+Début : {{ start_date }}
+Fin : {{ end_date }}
+Raison : {{ reason or 'Non spécifiée' }}
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Demande d'absence supprimée</h2>
+    <p>Bonjour,</p>
+    <p>Une demande d'absence a été supprimée :</p>
+    <ul>
+        <li><strong>Employé :</strong> {{ user_name }}</li>
+        <li><strong>ID de la demande :</strong> {{ request_id }}</li>
+        <li><strong>Type :</strong> {{ absence_type }}</li>
+        <li><strong>Début :</strong> {{ start_date }}</li>
+        <li><strong>Fin :</strong> {{ end_date }}</li>
+        <li><strong>Raison :</strong> {{ reason or 'Non spécifiée' }}</li>
+    </ul>
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+    "admin_absence": (
+        "Absence créée par l'administrateur - {{ user_name }}",
+        """
+Bonjour {{ user_name }},
+
+Une absence a été créée pour vous par l'administrateur {{ admin_name }} :
+
+Type : {{ absence_type }}
+Début : {{ start_date }}
+Fin : {{ end_date }}
+Raison : {{ reason or 'Non spécifiée' }}
+{% if admin_comment %}
+Commentaire de l'administrateur : {{ admin_comment }}
+{% endif %}
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Absence créée par l'administrateur</h2>
+    <p>Bonjour {{ user_name }},</p>
+    <p>Une absence a été créée pour vous par l'administrateur <strong>{{ admin_name }}</strong> :</p>
+    <ul>
+        <li><strong>Type :</strong> {{ absence_type }}</li>
+        <li><strong>Début :</strong> {{ start_date }}</li>
+        <li><strong>Fin :</strong> {{ end_date }}</li>
+        <li><strong>Raison :</strong> {{ reason or 'Non spécifiée' }}</li>
+    </ul>
+    {% if admin_comment %}
+    <p><strong>Commentaire de l'administrateur :</strong> {{ admin_comment }}</p>
+    {% endif %}
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+    "sickness_declaration": (
+        "Nouvelle déclaration de maladie - {{ user_name }}",
+        """
+Bonjour,
+
+Une nouvelle déclaration de maladie a été soumise :
+
+Employé : {{ user_name }}
+Début : {{ start_date }}
+Fin : {{ end_date }}
+Description : {{ description or 'Non spécifiée' }}
+
+Veuillez vous connecter à l'application pour traiter cette déclaration.
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Nouvelle déclaration de maladie</h2>
+    <p>Bonjour,</p>
+    <p>Une nouvelle déclaration de maladie a été soumise :</p>
+    <ul>
+        <li><strong>Employé :</strong> {{ user_name }}</li>
+        <li><strong>Début :</strong> {{ start_date }}</li>
+        <li><strong>Fin :</strong> {{ end_date }}</li>
+        <li><strong>Description :</strong> {{ description or 'Non spécifiée' }}</li>
+    </ul>
+    <p>Veuillez vous connecter à l'application pour traiter cette déclaration.</p>
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+    "sickness_viewed": (
+        "Déclaration de maladie consultée - {{ user_name }}",
+        """
+Bonjour {{ user_name }},
+
+Votre déclaration de maladie du {{ start_date }} au {{ end_date }} a été consultée par l'administrateur {{ admin_name }}.
+
+{{ signature }}
+""",
+        """
+<html>
+<body>
+    <h2>Déclaration de maladie consultée</h2>
+    <p>Bonjour {{ user_name }},</p>
+    <p>Votre déclaration de maladie du <strong>{{ start_date }}</strong> au <strong>{{ end_date }}</strong> a été consultée par l'administrateur <strong>{{ admin_name }}</strong>.</p>
+    {{ signature }}
+</body>
+</html>
+""",
+    ),
+}
+
+class CompiledEmailTemplate:
+    """Sujet, texte brut et HTML compilés d'une notification (jinja2.Template)"""
+
+    def __init__(self, subject, subject_variables: Tuple[str, ...], text, html):
+        self.subject = subject
+        self.subject_variables = subject_variables  # Seules variables qui forment la clé du cache des sujets
+        self.text = text
+        self.html = html
+
+class EmailTemplateRegistry:
+    """
+    Registre des modèles d'email: compilation unique, cache LRU des sujets rendus.
+    Jinja2 n'est importé et les modèles compilés qu'au premier rendu, hors du démarrage à froid
+    """
+
+    def __init__(self, templates: Dict[str, Tuple[str, str, str]] = TEMPLATES, subject_cache_size: int = 1024):
+        self._sources = templates
+        self._compiled = None
+        self._lock = threading.Lock()
+        self._render_subject = lru_cache(maxsize=subject_cache_size)(self._render_subject_uncached)
+
+    @property
+    def _templates(self) -> Dict[str, CompiledEmailTemplate]:
+        if self._compiled is None:
+            with self._lock:
+                if self._compiled is None:
+                    self._compiled = self._compile_all()
+        return self._compiled
+
+    def _compile_all(self) -> Dict[str, CompiledEmailTemplate]:
+        """Compiler les trois parties de chaque notification"""
+        from jinja2 import Environment, StrictUndefined, meta
+        from markupsafe import Markup
+
+        # Texte brut sans échappement, HTML avec échappement des valeurs saisies par les utilisateurs
+        options = dict(undefined=StrictUndefined, trim_blocks=True, lstrip_blocks=True)
+        text_env = Environment(autoescape=False, **options)
+        html_env = Environment(autoescape=True, **options)
+        text_env.globals["signature"] = SIGNATURE_TEXT
+        html_env.globals["signature"] = Markup(SIGNATURE_HTML)
+        return {
+            name: CompiledEmailTemplate(
+                text_env.from_string(subject),
+                tuple(sorted(meta.find_undeclared_variables(text_env.parse(subject)))),
+                text_env.from_string(text),
+                html_env.from_string(html)
+            )
+            for name, (subject, text, html) in self._sources.items()
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sources
+
+    def get(self, name: str) -> CompiledEmailTemplate:
+        """Modèle compilé d'une notification"""
+        try:
+            return self._templates[name]
+        except KeyError:
+            raise KeyError(f"Modèle d'email inconnu: {name}") from None
+
+    def _render_subject_uncached(self, name: str, context: Tuple[Tuple[str, object], ...]) -> str:
+        return self.get(name).subject.render(dict(context))
+
+    def subject(self, name: str, **context) -> str:
+        """Sujet rendu (mis en cache: peu de combinaisons nom/valeurs distinctes)"""
+        variables = self.get(name).subject_variables
+        return self._render_subject(name, tuple((key, context.get(key)) for key in variables))
+
+    def render(self, name: str, **context) -> Tuple[str, str, str]:
+        """Rendre (sujet, texte brut, HTML) d'une notification"""
+        template = self.get(name)
+        return self.subject(name, **context), template.text.render(context), template.html.render(context)
+
+    def subject_cache_info(self):
+        """Statistiques du cache des sujets"""
+        return self._render_subject.cache_info()
+
+# Instance globale
+email_templates = EmailTemplateRegistry()
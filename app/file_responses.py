@@ -0,0 +1,144 @@
+"""
+Réponses fichier avec requêtes conditionnelles (ETag, Last-Modified) et plages (Range)
+"""
+import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import Request
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Plage demandée (début, fin inclus) d'un en-tête Range "bytes=...".
+    None: en-tête ignoré (syntaxe inconnue ou plages multiples), le fichier entier est servi.
+    ValueError: plage non satisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start, sep, end = spec.strip().partition("-")
+    if not sep or not (start or end):
+        return None
+    try:
+        first = int(start) if start else None
+        last = int(end) if end else None
+    except ValueError:
+        return None
+    if first is None:
+        # Suffixe: les N derniers octets
+        if last == 0 or size == 0:
+            raise ValueError("Plage non satisfiable")
+        return max(size - last, 0), size - 1
+    if first >= size or (last is not None and last < first):
+        raise ValueError("Plage non satisfiable")
+    return first, size - 1 if last is None else min(last, size - 1)
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    """Comparaison d'un en-tête If-None-Match / If-Range avec l'ETag courant"""
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    if weak:
+        return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+    return etag in candidates and not etag.startswith("W/")
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+class RangeFileResponse(FileResponse):
+    """FileResponse servant une plage d'octets, par sendfile lorsque le serveur le permet"""
+
+    def __init__(self, path: str, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.byte_range = byte_range
+        if byte_range is not None:
+            first, last = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {first}-{last}/{self.stat_result.st_size}"
+            self.headers["content-length"] = str(last - first + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        size = self.stat_result.st_size
+        first, last = self.byte_range or (0, size - 1)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only or size == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            # Envoi sans copie en espace utilisateur (os.sendfile côté serveur ASGI)
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": first,
+                    "count": last - first + 1,
+                    "more_body": False
+                })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(first)
+                remaining = last - first + 1
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break  # Fichier tronqué entre stat et lecture
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+def conditional_file_response(request: Request, path: str, filename: str, sha256: Optional[str] = None,
+                              media_type: str = "application/pdf") -> Response:
+    """
+    Servir un fichier inline avec ETag fort (empreinte SHA-256 stockée), Last-Modified,
+    réponses 304 et requêtes Range (visionneuses PDF des navigateurs)
+    """
+    stat_result = os.stat(path)
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise FileNotFoundError(path)
+    # Sans empreinte enregistrée (anciens fichiers): ETag faible dérivé de la date et de la taille
+    etag = f'"{sha256}"' if sha256 else f'W/"{int(stat_result.st_mtime)}-{stat_result.st_size}"'
+    validators = {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        # Documents personnels: cache du navigateur uniquement, revalidé à chaque affichage
+        "cache-control": "private, no-cache",
+        "accept-ranges": "bytes"
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if (if_none_match is not None and _etag_matches(if_none_match, etag, weak=True)) or (
+        if_none_match is None and if_modified_since and _not_modified_since(if_modified_since, stat_result.st_mtime)
+    ):
+        return Response(status_code=304, headers=validators)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range: la plage ne vaut que si le fichier du client est toujours le même (comparaison forte)
+    if range_header and (if_range is None or _etag_matches(if_range, etag, weak=False)
+                         or (not if_range.startswith(('"', 'W/')) and _not_modified_since(if_range, stat_result.st_mtime))):
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**validators, "content-range": f"bytes */{stat_result.st_size}"})
+
+    return RangeFileResponse(
+        path,
+        byte_range=byte_range,
+        headers=validators,
+        media_type=media_type,
+        filename=filename,
+        stat_result=stat_result,
+        method=request.method,
+        content_disposition_type="inline"
+    )
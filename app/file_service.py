@@ -1,12 +1,13 @@
 import os
 import uuid
+import hashlib
 from typing import Optional
 from fastapi import UploadFile, HTTPException
 import aiofiles
+import anyio
 from pathlib import Path
 
-from dotenv import load_dotenv
-load_dotenv()
+from app.storage import blob_key, get_storage_backend
 
 class FileService:
     def __init__(self):
@@ -15,17 +16,21 @@ class FileService:
         default_dir = "/tmp/sickness_declarations" if env == "production" else "uploads/sickness_declarations"
         self.upload_dir = Path(os.getenv("UPLOAD_DIR", default_dir))
         self.upload_dir.mkdir(parents=True, exist_ok=True)
+        # Fichiers stockés par empreinte SHA-256: un même certificat n'est stocké qu'une fois
+        self.storage = get_storage_backend(self.upload_dir)
         self.allowed_extensions = {".pdf"}
         self.max_file_size = 10 * 1024 * 1024  # 10MB
+        self.chunk_size = 64 * 1024  # Taille des morceaux lus depuis l'upload
     
     def _is_allowed_file(self, filename: str) -> bool:
         """Vérifier si l'extension du fichier est autorisée"""
         return Path(filename).suffix.lower() in self.allowed_extensions
     
-    async def save_pdf(self, file: UploadFile) -> tuple[str, str]:
+    async def receive_pdf(self, file: UploadFile) -> tuple[str, str, str]:
         """
-        Sauvegarder un fichier PDF uploadé
-        Returns: (filename, file_path)
+        Copier un fichier PDF uploadé par morceaux vers un fichier temporaire (mémoire bornée
+        quelle que soit la taille) en calculant son empreinte SHA-256
+        Returns: (filename, temp_path, sha256)
         """
         if not file.filename:
             raise HTTPException(status_code=400, detail="Nom de fichier manquant")
@@ -33,24 +38,52 @@ class FileService:
         if not self._is_allowed_file(file.filename):
             raise HTTPException(status_code=400, detail="Seuls les fichiers PDF sont autorisés")
         
-        # Vérifier la taille du fichier
-        content = await file.read()
-        if len(content) > self.max_file_size:
-            raise HTTPException(status_code=400, detail="Le fichier est trop volumineux (max 10MB)")
+        # Fichier temporaire dans upload_dir: le déplacement sous la clé finale reste atomique
+        temp_path = self.upload_dir / f".{uuid.uuid4()}.part"
         
-        # Générer un nom de fichier unique
-        file_extension = Path(file.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = self.upload_dir / unique_filename
-        
-        # Sauvegarder le fichier
+        digest = hashlib.sha256()
+        size = 0
         try:
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(content)
+            async with aiofiles.open(temp_path, 'wb') as f:
+                while chunk := await file.read(self.chunk_size):
+                    size += len(chunk)
+                    # Abandonner dès que la limite est dépassée, sans lire la suite
+                    if size > self.max_file_size:
+                        raise HTTPException(status_code=400, detail="Le fichier est trop volumineux (max 10MB)")
+                    digest.update(chunk)
+                    await f.write(chunk)
+        except HTTPException:
+            temp_path.unlink(missing_ok=True)
+            raise
         except Exception as e:
+            temp_path.unlink(missing_ok=True)
             raise HTTPException(status_code=500, detail=f"Erreur lors de la sauvegarde: {str(e)}")
         
-        return file.filename, str(file_path)
+        return file.filename, str(temp_path), digest.hexdigest()
+    
+    def reference(self, sha256: str) -> str:
+        """Référence de stockage d'un contenu, connue avant son dépôt"""
+        return self.storage.reference(blob_key(sha256))
+    
+    async def store_pdf(self, temp_path: str, sha256: str) -> str:
+        """Stocker un fichier reçu sous son empreinte (ignoré si le contenu existe déjà); renvoie la référence"""
+        try:
+            return await anyio.to_thread.run_sync(self.storage.put, blob_key(sha256), temp_path)
+        except Exception as e:
+            self.discard(temp_path)
+            raise HTTPException(status_code=500, detail=f"Erreur lors de la sauvegarde: {str(e)}")
+    
+    def discard(self, temp_path: str):
+        """Supprimer un fichier temporaire non stocké"""
+        Path(temp_path).unlink(missing_ok=True)
+    
+    async def save_pdf(self, file: UploadFile) -> tuple[str, str, str]:
+        """
+        Recevoir puis stocker un fichier PDF uploadé
+        Returns: (filename, file_path, sha256), file_path étant la référence de stockage
+        """
+        filename, temp_path, sha256 = await self.receive_pdf(file)
+        return filename, await self.store_pdf(temp_path, sha256), sha256
     
     def get_file_path(self, filename: str) -> Optional[str]:
         """Obtenir le chemin complet d'un fichier"""
@@ -59,13 +92,14 @@ class FileService:
             return str(file_path)
         return None
     
-    def delete_file(self, file_path: str) -> bool:
-        """Supprimer un fichier"""
+    def local_path(self, file_path: str) -> str:
+        """Chemin local lisible d'un fichier stocké (FileNotFoundError s'il n'existe pas)"""
+        return self.storage.local_path(file_path)
+    
+    def delete_file(self, file_path: str, connection=None) -> bool:
+        """Supprimer un fichier stocké (connection: transaction en cours, pour le stockage en base)"""
         try:
-            path = Path(file_path)
-            if path.exists():
-                path.unlink()
-                return True
+            return self.storage.delete(file_path, connection=connection)
         except Exception as e:
             print(f"Erreur lors de la suppression du fichier {file_path}: {e}")
         return False
@@ -4,63 +4,173 @@ Service de synchronisation avec Google Calendar
 import os
 import json
 import base64
-from datetime import datetime, date
-from typing import Optional, Dict, Any
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+# Import léger: le client (googleapiclient.discovery) et les credentials sont chargés au premier usage
 from googleapiclient.errors import HttpError
 
 from app import models
 
 logger = logging.getLogger(__name__)
 
+# Nombre maximal d'appels par requête batch de l'API Google Calendar
+BATCH_SIZE = 50
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+# Durée de validité minimale d'un jeton d'accès en cache pour être réutilisé
+TOKEN_MIN_TTL = timedelta(minutes=5)
+
+@lru_cache(maxsize=4)
+def _load_credentials(credentials_json: str):
+    """Credentials du compte de service (décodage et lecture de la clé faits une fois par processus)"""
+    from google.oauth2.service_account import Credentials
+    credentials_data = json.loads(base64.b64decode(credentials_json).decode('utf-8'))
+    return Credentials.from_service_account_info(credentials_data, scopes=SCOPES)
+
 class GoogleCalendarService:
-    """Service pour synchroniser les absences avec Google Calendar"""
+    """
+    Service pour synchroniser les absences avec Google Calendar.
+    Le client est construit au premier usage (pas au démarrage de l'application),
+    à partir du document de découverte fourni avec googleapiclient
+    """
     
     def __init__(self):
-        self.service = None
-        self.calendar_id = None
-        self._initialize_service()
+        self._service = None
+        self._calendar_id = None
+        self.credentials = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        # Nombre de requêtes batch envoyées en parallèle
+        self.batch_concurrency = int(os.getenv("GOOGLE_CALENDAR_BATCH_CONCURRENCY", "4"))
+        # Jeton d'accès partagé entre instances successives d'un même conteneur (/tmp)
+        self.token_cache_path = os.getenv("GOOGLE_CALENDAR_TOKEN_CACHE", "/tmp/google_calendar_token.json")
+        self._local = threading.local()
+    
+    @property
+    def service(self):
+        self._ensure_initialized()
+        return self._service
+    
+    @service.setter
+    def service(self, value):
+        self._service = value
+        self._initialized = True
+    
+    @property
+    def calendar_id(self) -> Optional[str]:
+        self._ensure_initialized()
+        return self._calendar_id
+    
+    @calendar_id.setter
+    def calendar_id(self, value: Optional[str]):
+        self._calendar_id = value
+    
+    def _ensure_initialized(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if not self._initialized:
+                self._initialize_service()
+                self._initialized = True
+    
+    def _build_service(self, credentials):
+        """Construire le client Calendar v3 (document de découverte local, sans appel réseau)"""
+        from googleapiclient.discovery import build
+        return build('calendar', 'v3', credentials=credentials, static_discovery=True, cache_discovery=False)
     
     def _initialize_service(self):
         """Initialise le service Google Calendar"""
         try:
             # Récupérer les credentials depuis les variables d'environnement
             credentials_json = os.getenv('GOOGLE_CALENDAR_CREDENTIALS')
-            self.calendar_id = os.getenv('GOOGLE_CALENDAR_ID')
+            self._calendar_id = os.getenv('GOOGLE_CALENDAR_ID')
             
-            if not credentials_json or not self.calendar_id:
+            if not credentials_json or not self._calendar_id:
                 logger.warning("Configuration Google Calendar manquante. Synchronisation désactivée.")
                 return
             
             # Décoder les credentials (encodés en base64)
             try:
-                credentials_data = json.loads(base64.b64decode(credentials_json).decode('utf-8'))
+                credentials = _load_credentials(credentials_json)
             except Exception as e:
                 logger.error(f"Erreur lors du décodage des credentials Google Calendar: {e}")
                 return
             
-            # Créer les credentials
-            credentials = Credentials.from_service_account_info(
-                credentials_data,
-                scopes=['https://www.googleapis.com/auth/calendar']
-            )
+            self._restore_token(credentials)
             
             # Construire le service
-            self.service = build('calendar', 'v3', credentials=credentials)
+            self._service = self._build_service(credentials)
+            self.credentials = credentials
             logger.info("Service Google Calendar initialisé avec succès")
             
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation du service Google Calendar: {e}")
-            self.service = None
+            self._service = None
+    
+    def _restore_token(self, credentials):
+        """Réutiliser le jeton d'accès en cache s'il est encore valide, sinon en obtenir un et le mettre en cache"""
+        try:
+            with open(self.token_cache_path) as f:
+                cached = json.load(f)
+            expiry = datetime.fromisoformat(cached['expiry'])
+            if cached.get('client_email') == credentials.service_account_email and expiry - datetime.utcnow() > TOKEN_MIN_TTL:
+                credentials.token = cached['token']
+                credentials.expiry = expiry
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        try:
+            import httplib2
+            from google_auth_httplib2 import Request
+            credentials.refresh(Request(httplib2.Http()))
+            temp_path = f"{self.token_cache_path}.{os.getpid()}.part"
+            with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+                json.dump({
+                    'client_email': credentials.service_account_email,
+                    'token': credentials.token,
+                    'expiry': credentials.expiry.isoformat()
+                }, f)
+            os.replace(temp_path, self.token_cache_path)
+        except Exception as e:
+            # Le client obtiendra le jeton lui-même au premier appel
+            logger.warning(f"Jeton Google Calendar non mis en cache: {e}")
+    
+    def is_enabled(self) -> bool:
+        """Synchronisation configurée (vérifiée sans construire le client tant qu'il n'a pas servi)"""
+        if self._initialized:
+            return self.is_configured()
+        return bool(os.getenv('GOOGLE_CALENDAR_CREDENTIALS') and os.getenv('GOOGLE_CALENDAR_ID'))
     
     def is_configured(self) -> bool:
-        """Vérifie si le service est configuré"""
+        """Vérifie si le service est configuré (construit le client au premier appel)"""
         return self.service is not None and self.calendar_id is not None
     
-    def create_event(self, absence_request: models.AbsenceRequest) -> Optional[str]:
+    def _insert_event(self, event_data: Dict[str, Any], event_id: Optional[str] = None) -> Optional[str]:
+        """
+        Insère un événement. Avec un event_id (clé d'idempotence), une création rejouée
+        dont la première tentative a abouti reçoit un 409 et renvoie le même ID sans doublon
+        """
+        if event_id:
+            event_data = {**event_data, 'id': event_id}
+        try:
+            event = self.service.events().insert(
+                calendarId=self.calendar_id,
+                body=event_data
+            ).execute()
+        except HttpError as e:
+            if event_id and e.resp.status == 409:
+                logger.info(f"Événement Google Calendar déjà créé: {event_id}")
+                return event_id
+            raise
+        return event.get('id')
+    
+    def create_event(self, absence_request: models.AbsenceRequest, event_id: Optional[str] = None) -> Optional[str]:
         """
         Crée un événement dans Google Calendar pour une demande d'absence
         Retourne l'ID de l'événement créé ou None en cas d'erreur
@@ -73,12 +183,7 @@ class GoogleCalendarService:
             # Créer l'événement
             event_data = self._build_event_data(absence_request)
             
-            event = self.service.events().insert(
-                calendarId=self.calendar_id,
-                body=event_data
-            ).execute()
-            
-            event_id = event.get('id')
+            event_id = self._insert_event(event_data, event_id)
             logger.info(f"Événement Google Calendar créé: {event_id}")
             return event_id
             
@@ -147,6 +252,97 @@ class GoogleCalendarService:
             logger.error(f"Erreur lors de la suppression de l'événement Google Calendar: {e}")
             return False
     
+    def _thread_http(self):
+        """Connexion HTTP authentifiée propre au thread (httplib2 n'est pas thread-safe)"""
+        if self.credentials is None:
+            return None  # Connexion du service
+        http = getattr(self._local, "http", None)
+        if http is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+            http = self._local.http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+        return http
+    
+    def _execute_batch(self, items: List[Tuple[str, Dict[str, Any], Optional[str], Optional[str]]]) -> Dict[str, Optional[str]]:
+        """Envoyer au plus BATCH_SIZE créations/mises à jour en une seule requête HTTP"""
+        results = {}
+        idempotency_keys = {key: idempotency_key for key, _, event_id, idempotency_key in items if not event_id}
+        
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response.get('id')
+            elif isinstance(exception, HttpError) and exception.resp.status == 409 and idempotency_keys.get(request_id):
+                results[request_id] = idempotency_keys[request_id]  # Déjà créé par une tentative précédente
+            else:
+                logger.error(f"Erreur lors de la synchronisation Google Calendar de {request_id}: {exception}")
+                results[request_id] = None
+        
+        batch = self.service.new_batch_http_request(callback=callback)
+        for key, event_data, event_id, idempotency_key in items:
+            if event_id:
+                request = self.service.events().update(calendarId=self.calendar_id, eventId=event_id, body=event_data)
+            else:
+                body = {**event_data, 'id': idempotency_key} if idempotency_key else event_data
+                request = self.service.events().insert(calendarId=self.calendar_id, body=body)
+            batch.add(request, request_id=key)
+        try:
+            batch.execute(http=self._thread_http())
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi d'un batch Google Calendar: {e}")
+            return {key: None for key, *_ in items}
+        return results
+    
+    def batch_upsert(self, items: List[Tuple[str, Dict[str, Any], Optional[str], Optional[str]]]) -> Dict[str, Optional[str]]:
+        """
+        Créer ou mettre à jour des événements par requêtes batch (BATCH_SIZE appels par requête),
+        avec au plus batch_concurrency requêtes en parallèle.
+        items: (clé, données de l'événement, ID de l'événement à mettre à jour ou None, ID idempotent de création)
+        Retourne pour chaque clé l'ID de l'événement, ou None en cas d'erreur
+        """
+        if not self.is_configured():
+            logger.warning("Service Google Calendar non configuré")
+            return {key: None for key, *_ in items}
+        
+        chunks = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.batch_concurrency, len(chunks)))) as executor:
+            for chunk_results in executor.map(self._execute_batch, chunks):
+                results.update(chunk_results)
+        return results
+    
+    @staticmethod
+    def payload_hash(event_data: Dict[str, Any]) -> str:
+        """Empreinte stable des données d'un événement (détecte les absences à renvoyer)"""
+        return hashlib.sha256(json.dumps(event_data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    
+    def list_event_changes(self, sync_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Événements modifiés ou supprimés (status "cancelled") depuis le syncToken, et le syncToken suivant.
+        Sans syncToken, ou s'il a expiré (410), liste complète du calendrier
+        """
+        if not self.is_configured():
+            logger.warning("Service Google Calendar non configuré")
+            return [], None
+        
+        events, page_token = [], None
+        while True:
+            params = {'calendarId': self.calendar_id, 'showDeleted': True, 'maxResults': 2500}
+            if sync_token:
+                params['syncToken'] = sync_token
+            if page_token:
+                params['pageToken'] = page_token
+            try:
+                response = self.service.events().list(**params).execute()
+            except HttpError as e:
+                if sync_token and e.resp.status == 410:
+                    logger.info("syncToken Google Calendar expiré: liste complète")
+                    return self.list_event_changes()
+                raise
+            events.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return events, response.get('nextSyncToken')
+    
     def _build_event_data(self, absence_request: models.AbsenceRequest) -> Dict[str, Any]:
         """Construit les données d'un événement Google Calendar"""
         
@@ -210,7 +406,7 @@ class GoogleCalendarService:
         
         return event_data
 
-    def create_sickness_event(self, sickness_declaration: models.SicknessDeclaration) -> Optional[str]:
+    def create_sickness_event(self, sickness_declaration: models.SicknessDeclaration, event_id: Optional[str] = None) -> Optional[str]:
         """
         Crée un événement dans Google Calendar pour une déclaration de maladie
         Retourne l'ID de l'événement créé ou None en cas d'erreur
@@ -223,12 +419,7 @@ class GoogleCalendarService:
             # Créer l'événement pour la déclaration de maladie
             event_data = self._build_sickness_event_data(sickness_declaration)
             
-            event = self.service.events().insert(
-                calendarId=self.calendar_id,
-                body=event_data
-            ).execute()
-            
-            event_id = event.get('id')
+            event_id = self._insert_event(event_data, event_id)
             logger.info(f"Événement Google Calendar créé pour déclaration maladie: {event_id}")
             return event_id
             
@@ -239,6 +430,32 @@ class GoogleCalendarService:
             logger.error(f"Erreur lors de la création de l'événement maladie Google Calendar: {e}")
             return None
 
+    def update_sickness_event(self, event_id: str, sickness_declaration: models.SicknessDeclaration) -> bool:
+        """
+        Met à jour l'événement d'une déclaration de maladie (ex. statut d'envoi de l'email)
+        Retourne True si la mise à jour a réussi, False sinon
+        """
+        if not self.is_configured():
+            logger.warning("Service Google Calendar non configuré")
+            return False
+        
+        try:
+            self.service.events().update(
+                calendarId=self.calendar_id,
+                eventId=event_id,
+                body=self._build_sickness_event_data(sickness_declaration)
+            ).execute()
+            
+            logger.info(f"Événement Google Calendar maladie mis à jour: {event_id}")
+            return True
+            
+        except HttpError as e:
+            logger.error(f"Erreur HTTP lors de la mise à jour de l'événement maladie Google Calendar: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise à jour de l'événement maladie Google Calendar: {e}")
+            return False
+
     def _build_sickness_event_data(self, sickness_declaration: models.SicknessDeclaration) -> Dict[str, Any]:
         """Construit les données d'un événement Google Calendar pour une déclaration de maladie"""
         
@@ -1,42 +1,13 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
 import os
-from dotenv import load_dotenv
 
-from app.database import engine, get_db
-from app.models import Base
-from app import models, schemas, crud, auth as app_auth
-from app.routes import auth, users, absence_requests, dashboard, calendar, sickness_declarations, google_calendar
+from app.routes import auth, users, absence_requests, dashboard, calendar, sickness_declarations, google_calendar, notifications
 
-# Charger les variables d'environnement
-load_dotenv()
-
-# Créer les tables et garantir un admin par défaut en production
-Base.metadata.create_all(bind=engine)
-try:
-    if os.getenv("ENVIRONMENT", "development") == "production":
-        db = next(get_db())
-        # Vérifier/Créer l'admin par défaut
-        admin = db.query(models.User).filter(models.User.email == "hello.obvious@gmail.com").first()
-        if not admin:
-            admin = models.User(
-                email="hello.obvious@gmail.com",
-                hashed_password=app_auth.get_password_hash("admin123"),
-                first_name="Admin",
-                last_name="System",
-                role=models.UserRole.ADMIN,
-                is_active=True,
-                annual_leave_days=25,
-            )
-            db.add(admin)
-            db.commit()
-        db.close()
-except Exception:
-    # Ne pas empêcher le démarrage si l'init échoue (ex: migration en cours)
-    pass
+# Le schéma (python init_db.py, migrations Alembic) et l'administrateur par défaut (python create_admin.py)
+# sont créés au déploiement, pas au démarrage de chaque instance
 
 app = FastAPI(title="Gestion des Absences", version="1.0.0")
 
@@ -94,6 +65,7 @@ app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
 app.include_router(calendar.router, prefix="/calendar", tags=["calendar"])
 app.include_router(sickness_declarations.router, prefix="/sickness-declarations", tags=["sickness-declarations"])
 app.include_router(google_calendar.router, prefix="/google-calendar", tags=["google-calendar"])
+app.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
 
 if __name__ == "__main__":
     import uvicorn
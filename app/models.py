@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Date, Text, ForeignKey, Enum
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Date, Text, ForeignKey, Enum, Index, LargeBinary
 from sqlalchemy.orm import DeclarativeBase, relationship
 from datetime import datetime, timezone
 import enum
@@ -19,6 +19,16 @@ class AbsenceStatus(enum.Enum):
     APPROUVE = "approuve"
     REFUSE = "refuse"
 
+class NotificationStatus(enum.Enum):
+    EN_ATTENTE = "en_attente"
+    ENVOYE = "envoye"
+    ECHEC = "echec"  # Abandonnée après le nombre maximal de tentatives
+
+class CalendarSyncStatus(enum.Enum):
+    EN_ATTENTE = "en_attente"
+    SYNCHRONISE = "synchronise"
+    ECHEC = "echec"  # Abandonnée après le nombre maximal de tentatives
+
 class User(Base):
     __tablename__ = "users"
 
@@ -38,6 +48,11 @@ class User(Base):
     approved_requests = relationship("AbsenceRequest", foreign_keys="AbsenceRequest.approved_by_id", back_populates="approved_by")
     sickness_declarations = relationship("SicknessDeclaration", back_populates="user")
 
+    # Index pour la pagination par curseur (created_at, id)
+    __table_args__ = (
+        Index("ix_users_created_id", "created_at", "id"),
+    )
+
 class AbsenceRequest(Base):
     __tablename__ = "absence_requests"
 
@@ -51,6 +66,8 @@ class AbsenceRequest(Base):
     approved_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     admin_comment = Column(Text, nullable=True)
     google_calendar_event_id = Column(String, nullable=True)  # ID de l'événement Google Calendar
+    calendar_payload_hash = Column(String(64), nullable=True)  # Empreinte des données envoyées à Google Calendar
+    calendar_synced_at = Column(DateTime, nullable=True)        # Dernière synchronisation de l'événement
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
 
@@ -58,6 +75,15 @@ class AbsenceRequest(Base):
     user = relationship("User", foreign_keys=[user_id], back_populates="absence_requests")
     approved_by = relationship("User", foreign_keys=[approved_by_id], back_populates="approved_requests")
 
+    # Index pour les requêtes de calendrier et de soldes (chevauchement de périodes)
+    __table_args__ = (
+        Index("ix_absence_requests_user_status_type_start", "user_id", "status", "type", "start_date"),
+        Index("ix_absence_requests_start_end", "start_date", "end_date"),
+        # Pagination par curseur (created_at, id), globale et par utilisateur
+        Index("ix_absence_requests_created_id", "created_at", "id"),
+        Index("ix_absence_requests_user_created_id", "user_id", "created_at", "id"),
+    )
+
 class SicknessDeclaration(Base):
     __tablename__ = "sickness_declarations"
 
@@ -68,11 +94,120 @@ class SicknessDeclaration(Base):
     description = Column(Text, nullable=True)
     pdf_filename = Column(String, nullable=True)  # Nom du fichier PDF uploadé
     pdf_path = Column(String, nullable=True)      # Chemin vers le fichier sur le serveur
+    pdf_sha256 = Column(String(64), nullable=True)  # Empreinte SHA-256 calculée pendant l'upload
     email_sent = Column(Boolean, default=False, nullable=False)  # Si l'email a été envoyé
     viewed_by_admin = Column(Boolean, default=False, nullable=False)  # Si vu par l'admin
     google_calendar_event_id = Column(String, nullable=True)  # ID de l'événement Google Calendar
+    calendar_payload_hash = Column(String(64), nullable=True)  # Empreinte des données envoyées à Google Calendar
+    calendar_synced_at = Column(DateTime, nullable=True)        # Dernière synchronisation de l'événement
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
 
     # Relations
-    user = relationship("User", back_populates="sickness_declarations")
\ No newline at end of file
+    user = relationship("User", back_populates="sickness_declarations")
+
+    # Index pour les requêtes de calendrier et de soldes (chevauchement de périodes)
+    __table_args__ = (
+        Index("ix_sickness_declarations_user_start", "user_id", "start_date"),
+        Index("ix_sickness_declarations_start_end", "start_date", "end_date"),
+        # Pagination par curseur (created_at, id), globale et par utilisateur
+        Index("ix_sickness_declarations_created_id", "created_at", "id"),
+        Index("ix_sickness_declarations_user_created_id", "user_id", "created_at", "id"),
+    )
+
+class LeaveBalance(Base):
+    """Soldes matérialisés par utilisateur et période, mis à jour à chaque écriture"""
+    __tablename__ = "leave_balances"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period_year = Column(Integer, primary_key=True)  # Période du 1er juin au 31 mai / année civile pour la maladie
+    used_leave_days = Column(Integer, default=0, nullable=False)  # Congés approuvés de la période
+    sick_days = Column(Integer, default=0, nullable=False)        # Jours de maladie de l'année civile
+    pending_requests = Column(Integer, default=0, nullable=False)  # Demandes en attente débutant dans la période
+    approved_requests = Column(Integer, default=0, nullable=False) # Demandes approuvées débutant dans la période
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
+
+class NotificationOutbox(Base):
+    """Notifications email à envoyer, écrites dans la même transaction que la modification métier"""
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    notification = Column(String, nullable=False)  # Méthode send_<notification> de EmailService
+    payload = Column(Text, nullable=False)          # Arguments de la méthode (JSON)
+    sickness_declaration_id = Column(Integer, nullable=True)  # Déclaration à marquer comme envoyée après livraison
+    status = Column(Enum(NotificationStatus), default=NotificationStatus.EN_ATTENTE, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    # Index pour la sélection des notifications à envoyer
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+class CalendarSyncJob(Base):
+    """Synchronisation Google Calendar à effectuer, au plus une en attente par absence ou déclaration"""
+    __tablename__ = "calendar_sync_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    target_type = Column(String, nullable=False)  # "absence_request" ou "sickness_declaration"
+    target_id = Column(Integer, nullable=False)   # Pas de clé étrangère: la cible peut être supprimée avant la synchronisation
+    action = Column(String, nullable=False)       # "upsert" (créer ou mettre à jour l'événement) ou "delete"
+    event_id = Column(String, nullable=True)      # Événement à supprimer (la cible n'existe plus)
+    idempotency_key = Column(String, nullable=False)  # ID client de l'événement: une création rejouée ne crée pas de doublon
+    revision = Column(Integer, default=0, nullable=False)  # Incrémentée à chaque modification regroupée dans ce job
+    status = Column(Enum(CalendarSyncStatus), default=CalendarSyncStatus.EN_ATTENTE, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    synced_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Sélection des jobs à exécuter et recherche du job en attente d'une cible (regroupement)
+        Index("ix_calendar_sync_jobs_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_calendar_sync_jobs_target_status", "target_type", "target_id", "status"),
+    )
+
+class CalendarSyncRun(Base):
+    """Synchronisation complète (/google-calendar/sync ou /resync), reprise là où elle s'est arrêtée"""
+    __tablename__ = "calendar_sync_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mode = Column(String, nullable=False)  # "sync" (événements manquants), "resync" (événements modifiés) ou "pull"
+    completed = Column(Boolean, default=False, nullable=False)
+    # Points de reprise: dernier ID traité par type de cible (parcours par ID croissant)
+    absence_cursor = Column(Integer, default=0, nullable=False)
+    sickness_cursor = Column(Integer, default=0, nullable=False)
+    absences_synced = Column(Integer, default=0, nullable=False)
+    absences_failed = Column(Integer, default=0, nullable=False)
+    sickness_synced = Column(Integer, default=0, nullable=False)
+    sickness_failed = Column(Integer, default=0, nullable=False)
+    absences_unchanged = Column(Integer, default=0, nullable=False)  # Ignorées en resync: déjà à jour dans Google
+    sickness_unchanged = Column(Integer, default=0, nullable=False)
+    sync_token = Column(String, nullable=True)  # Passe "pull": syncToken Google pour la passe suivante
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        Index("ix_calendar_sync_runs_mode_completed", "mode", "completed"),
+    )
+
+class StoredFile(Base):
+    """Contenu stocké par empreinte SHA-256, partagé entre déclarations et compté par référence"""
+    __tablename__ = "stored_files"
+
+    sha256 = Column(String(64), primary_key=True)
+    storage_ref = Column(String, nullable=False)  # Référence dans le backend de stockage (chemin local ou s3://)
+    ref_count = Column(Integer, default=0, nullable=False)  # Nombre de déclarations qui utilisent ce contenu
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+class StoredFileChunk(Base):
+    """Morceau d'un contenu stocké en base (STORAGE_BACKEND=database)"""
+    __tablename__ = "stored_file_chunks"
+
+    sha256 = Column(String(64), primary_key=True)
+    seq = Column(Integer, primary_key=True)  # Position du morceau dans le fichier
+    data = Column(LargeBinary, nullable=False)
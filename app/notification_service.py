@@ -0,0 +1,71 @@
+"""
+Livraison des notifications email de l'outbox (notification_outbox)
+"""
+import os
+import json
+import logging
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import crud
+from app.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+class NotificationService:
+    """Envoie les notifications de l'outbox avec nouvelles tentatives et backoff"""
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("NOTIFICATION_BATCH_SIZE", "50"))
+        # "background": envoi après la réponse (pool de threads), "cron": uniquement via /notifications/drain
+        self.dispatch_mode = os.getenv("NOTIFICATION_DISPATCH", "background")
+
+    def deliver(self, db: Session, entry) -> bool:
+        """Envoyer une notification réservée et enregistrer le résultat"""
+        send = getattr(email_service, f"send_{entry.notification}", None)
+        try:
+            if send is None:
+                raise ValueError(f"Notification inconnue: {entry.notification}")
+            sent = send(**json.loads(entry.payload))
+            error = None if sent else "Envoi refusé par le fournisseur email"
+        except Exception as e:
+            sent, error = False, str(e)
+
+        if sent:
+            crud.mark_notification_sent(db, entry)
+        else:
+            logger.warning(f"Échec de la notification {entry.id} ({entry.notification}): {error}")
+            crud.mark_notification_failed(db, entry, error)
+        return sent
+
+    def drain(self, db: Session, limit: int = None) -> dict:
+        """Envoyer les notifications en attente dont la tentative est échue"""
+        sent = failed = 0
+        # Tout le lot passe par une même session SMTP
+        with email_service.batch():
+            for entry in crud.get_due_notifications(db, limit=limit or self.batch_size):
+                if not crud.claim_notification(db, entry):
+                    continue  # Déjà prise par un autre worker
+                if self.deliver(db, entry):
+                    sent += 1
+                else:
+                    failed += 1
+        return {"sent": sent, "failed": failed}
+
+    def _drain_with_bind(self, bind):
+        """Vider l'outbox dans une session dédiée (hors requête HTTP)"""
+        db = sessionmaker(autocommit=False, autoflush=False, bind=bind)()
+        try:
+            self.drain(db)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi des notifications: {e}")
+        finally:
+            db.close()
+
+    def schedule(self, background_tasks: BackgroundTasks, db: Session):
+        """Planifier l'envoi après la réponse HTTP (exécuté dans le pool de threads)"""
+        if self.dispatch_mode == "background":
+            background_tasks.add_task(self._drain_with_bind, db.get_bind())
+
+# Instance globale
+notification_service = NotificationService()
@@ -0,0 +1,126 @@
+"""
+Transport asynchrone vers l'API Resend (client httpx partagé, connexions persistantes)
+"""
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from typing import List, Optional
+
+import httpx
+
+from app.attachments import has_file_attachment, iter_json, json_stream_length
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal d'emails par appel à /emails/batch
+RESEND_BATCH_LIMIT = 100
+
+def _http2_available() -> bool:
+    """HTTP/2 nécessite le paquet optionnel h2 (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class ResendTransport:
+    """Client Resend réutilisant un httpx.AsyncClient par boucle d'événements"""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv("RESEND_API_URL", "https://api.resend.com")).rstrip("/")
+        self.timeout = httpx.Timeout(
+            float(os.getenv("RESEND_TIMEOUT", "10")),
+            connect=float(os.getenv("RESEND_CONNECT_TIMEOUT", "5"))
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("RESEND_MAX_CONNECTIONS", "10")),
+            max_keepalive_connections=int(os.getenv("RESEND_MAX_KEEPALIVE", "5")),
+            keepalive_expiry=30
+        )
+        self.http2 = _http2_available()
+        # Un client httpx est lié à la boucle qui a ouvert ses connexions
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def _client(self) -> httpx.AsyncClient:
+        """Client partagé de la boucle d'événements courante"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2
+            )
+            self._clients[loop] = client
+        return client
+
+    async def send(self, payload: dict) -> bool:
+        """Envoyer un email (POST /emails)"""
+        if has_file_attachment(payload):
+            response = await self._client().post(
+                "/emails",
+                content=self._stream_json(payload),
+                headers={"Content-Type": "application/json", "Content-Length": str(json_stream_length(payload))}
+            )
+        else:
+            response = await self._client().post("/emails", json=payload)
+        if response.status_code == 200:
+            return True
+        logger.error(f"Erreur Resend: {response.status_code} - {response.text}")
+        return False
+
+    @staticmethod
+    async def _stream_json(payload: dict):
+        """Corps JSON envoyé par morceaux: la pièce jointe n'est jamais entièrement en mémoire"""
+        for chunk in iter_json(payload):
+            yield chunk
+
+    async def send_batch(self, payloads: List[dict]) -> List[bool]:
+        """
+        Envoyer des emails distincts en lots (POST /emails/batch, 100 par appel).
+        Les emails avec pièce jointe, refusés par l'endpoint batch, partent en parallèle via /emails.
+        """
+        results = [False] * len(payloads)
+        simple = [i for i, payload in enumerate(payloads) if not payload.get("attachments")]
+        with_attachments = [i for i, payload in enumerate(payloads) if payload.get("attachments")]
+
+        async def send_chunk(indexes: List[int]):
+            response = await self._client().post("/emails/batch", json=[payloads[i] for i in indexes])
+            if response.status_code != 200:
+                logger.error(f"Erreur Resend (batch): {response.status_code} - {response.text}")
+            for i in indexes:
+                results[i] = response.status_code == 200
+
+        async def send_single(i: int):
+            results[i] = await self.send(payloads[i])
+
+        await asyncio.gather(
+            *(send_chunk(simple[start:start + RESEND_BATCH_LIMIT]) for start in range(0, len(simple), RESEND_BATCH_LIMIT)),
+            *(send_single(i) for i in with_attachments)
+        )
+        return results
+
+    def run(self, coroutine):
+        """Exécuter une coroutine depuis du code synchrone, sur la boucle dédiée du transport"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._background_loop()).result()
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """Boucle d'événements de fond qui conserve les connexions entre les appels synchrones"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="resend-transport", daemon=True).start()
+            return self._loop
+
+    async def aclose(self):
+        """Fermer le client de la boucle courante"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
@@ -1,39 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app import models, schemas, crud, auth
-from app.email_service import email_service
-from app.google_calendar_service import google_calendar_service
+from app.notification_service import notification_service
+from app.calendar_sync_service import calendar_sync_service
+from app.crud.calendar_sync import DELETE
 
 router = APIRouter()
 
-@router.get("/", response_model=list[schemas.AbsenceRequest])
+@router.get("/", response_model=Union[list[schemas.AbsenceRequest], schemas.Page[schemas.AbsenceRequest]])
 async def read_absence_requests(
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Curseur de pagination (vide pour la première page)"),
+    current_user: auth.Principal = Depends(auth.get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if current_user.role == models.UserRole.ADMIN:
-        requests = crud.get_absence_requests(db, skip=skip, limit=limit)
-    else:
-        requests = crud.get_absence_requests(db, skip=skip, limit=limit, user_id=current_user.id)
+    user_id = None if current_user.role == models.UserRole.ADMIN else current_user.id
+    if cursor is not None:
+        return await _absence_requests_page(db, cursor, limit, user_id)
+    requests = await crud.get_absence_requests_async(db, skip=skip, limit=limit, user_id=user_id)
     return requests
 
-@router.get("/all", response_model=list[schemas.AbsenceRequest])
+@router.get("/all", response_model=Union[list[schemas.AbsenceRequest], schemas.Page[schemas.AbsenceRequest]])
 async def read_all_absence_requests(
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Curseur de pagination (vide pour la première page)"),
+    current_user: auth.Principal = Depends(auth.get_current_admin_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    requests = crud.get_absence_requests(db, skip=skip, limit=limit)
+    if cursor is not None:
+        return await _absence_requests_page(db, cursor, limit)
+    requests = await crud.get_absence_requests_async(db, skip=skip, limit=limit)
     return requests
 
+async def _absence_requests_page(db: AsyncSession, cursor: str, limit: int, user_id: Optional[int] = None) -> dict:
+    """Page de demandes d'absence (pagination par curseur)"""
+    try:
+        items, next_cursor = await crud.get_absence_requests_page_async(db, cursor=cursor, limit=limit, user_id=user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
 @router.get("/pending-count")
 async def get_pending_requests_count(
-    current_user: models.User = Depends(auth.get_current_admin_user),
+    current_user: auth.Principal = Depends(auth.get_current_admin_principal),
     db: Session = Depends(get_db)
 ):
     """Récupère le nombre de demandes d'absence en attente et de déclarations de maladie non vues pour les administrateurs"""
@@ -57,6 +72,7 @@ async def get_pending_requests_count(
 @router.post("/", response_model=schemas.AbsenceRequest)
 async def create_absence_request(
     request: schemas.AbsenceRequestCreate,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -64,24 +80,15 @@ async def create_absence_request(
     if current_user.role == models.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Les administrateurs ne peuvent pas créer de demandes d'absence")
     
-    db_request = crud.create_absence_request(db=db, request=request, user_id=current_user.id)
-    
-    # Créer l'événement dans Google Calendar
-    if google_calendar_service.is_configured():
-        event_id = google_calendar_service.create_event(db_request)
-        if event_id:
-            # Mettre à jour la demande avec l'ID de l'événement Google Calendar
-            db_request.google_calendar_event_id = event_id
-            db.commit()
-    
-    # Notifier les admins par email
+    # Notifier les admins par email (outbox enregistrée avec la demande)
     admin_users = db.query(models.User).filter(models.User.role == models.UserRole.ADMIN).all()
     admin_emails = [admin.email for admin in admin_users]
     # Toujours inclure l'adresse hello.obvious@gmail.com
     admin_emails = list({*admin_emails, "hello.obvious@gmail.com"})
     
     user_name = f"{current_user.first_name} {current_user.last_name}"
-    email_service.send_absence_request_notification(
+    crud.enqueue_notification(
+        db, "absence_request_notification",
         admin_emails=list({*admin_emails}),
         user_name=user_name,
         absence_type=request.type.value,
@@ -90,6 +97,15 @@ async def create_absence_request(
         reason=request.reason
     )
     
+    db_request = crud.add_absence_request(db=db, request=request, user_id=current_user.id)
+    
+    # Créer l'événement Google Calendar après la réponse (job validé par le même commit que l'absence)
+    calendar_sync_service.request(db, db_request)
+    db.commit()
+    db.refresh(db_request)
+    
+    notification_service.schedule(background_tasks, db)
+    calendar_sync_service.schedule(background_tasks, db)
     return db_request
 
 # Routes admin spécifiques (doivent être déclarées AVANT les routes génériques)
@@ -97,6 +113,7 @@ async def create_absence_request(
 async def admin_update_absence(
     request_id: int,
     request_update: schemas.AdminAbsenceUpdate,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -112,6 +129,8 @@ async def admin_update_absence(
         end_date=request_update.end_date,
         reason=request_update.reason
     )
+    # Mettre à jour l'événement Google Calendar après la réponse (un seul appel pour les deux modifications)
+    calendar_sync_service.request(db, db_request)
     updated = crud.update_absence_request(db=db, request_id=request_id, request_update=standard_update)
     
     # Appliquer statut/commentaire si fournis
@@ -122,21 +141,13 @@ async def admin_update_absence(
         )
         updated = crud.update_absence_request_status(db=db, request_id=request_id, admin_update=admin_update, admin_id=current_user.id)
     
-    # Mettre à jour l'événement Google Calendar
-    if google_calendar_service.is_configured() and updated.google_calendar_event_id:
-        google_calendar_service.update_event(updated.google_calendar_event_id, updated)
-    elif google_calendar_service.is_configured() and not updated.google_calendar_event_id:
-        # Créer l'événement s'il n'existe pas encore
-        event_id = google_calendar_service.create_event(updated)
-        if event_id:
-            updated.google_calendar_event_id = event_id
-            db.commit()
-    
+    calendar_sync_service.schedule(background_tasks, db)
     return updated
 
 @router.delete("/admin/{request_id}")
 async def admin_delete_absence(
     request_id: int,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -145,16 +156,17 @@ async def admin_delete_absence(
     if db_request is None:
         raise HTTPException(status_code=404, detail="Demande non trouvée")
     
-    # Supprimer l'événement Google Calendar s'il existe
-    if google_calendar_service.is_configured() and db_request.google_calendar_event_id:
-        google_calendar_service.delete_event(db_request.google_calendar_event_id)
+    # Supprimer l'événement Google Calendar après la réponse
+    calendar_sync_service.request(db, db_request, DELETE)
     
     crud.delete_absence_request(db=db, request_id=request_id)
+    calendar_sync_service.schedule(background_tasks, db)
     return {"message": "Absence supprimée"}
 
 @router.post("/admin", response_model=schemas.AbsenceRequest)
 async def create_admin_absence(
     request: schemas.AdminAbsenceCreate,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -164,20 +176,11 @@ async def create_admin_absence(
     if not target_user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
-    db_request = crud.create_admin_absence(db=db, request=request, admin_id=current_user.id)
-    
-    # Créer l'événement dans Google Calendar
-    if google_calendar_service.is_configured():
-        event_id = google_calendar_service.create_event(db_request)
-        if event_id:
-            # Mettre à jour la demande avec l'ID de l'événement Google Calendar
-            db_request.google_calendar_event_id = event_id
-            db.commit()
-    
-    # Notifier l'utilisateur par email
+    # Notifier l'utilisateur par email (outbox enregistrée avec l'absence)
     user_name = f"{target_user.first_name} {target_user.last_name}"
     admin_name = f"{current_user.first_name} {current_user.last_name}"
-    email_service.send_admin_absence_notification(
+    crud.enqueue_notification(
+        db, "admin_absence_notification",
         user_email=target_user.email,
         user_name=user_name,
         admin_name=admin_name,
@@ -188,6 +191,15 @@ async def create_admin_absence(
         admin_comment=request.admin_comment
     )
     
+    db_request = crud.add_admin_absence(db=db, request=request, admin_id=current_user.id)
+    
+    # Créer l'événement Google Calendar après la réponse (job validé par le même commit que l'absence)
+    calendar_sync_service.request(db, db_request)
+    db.commit()
+    db.refresh(db_request)
+    
+    notification_service.schedule(background_tasks, db)
+    calendar_sync_service.schedule(background_tasks, db)
     return db_request
 
 # Routes avec paramètres spécifiques
@@ -195,6 +207,7 @@ async def create_admin_absence(
 async def update_absence_request_status(
     request_id: int,
     admin_update: schemas.AbsenceRequestAdmin,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -202,21 +215,10 @@ async def update_absence_request_status(
     if db_request is None:
         raise HTTPException(status_code=404, detail="Demande non trouvée")
     
-    updated_request = crud.update_absence_request_status(db=db, request_id=request_id, admin_update=admin_update, admin_id=current_user.id)
-    
-    # Mettre à jour l'événement Google Calendar
-    if google_calendar_service.is_configured() and updated_request.google_calendar_event_id:
-        google_calendar_service.update_event(updated_request.google_calendar_event_id, updated_request)
-    elif google_calendar_service.is_configured() and not updated_request.google_calendar_event_id:
-        # Créer l'événement s'il n'existe pas encore
-        event_id = google_calendar_service.create_event(updated_request)
-        if event_id:
-            updated_request.google_calendar_event_id = event_id
-            db.commit()
-    
-    # Notifier l'utilisateur par email
+    # Notifier l'utilisateur par email (outbox enregistrée avec le changement de statut)
     user_name = f"{db_request.user.first_name} {db_request.user.last_name}"
-    email_service.send_absence_status_notification(
+    crud.enqueue_notification(
+        db, "absence_status_notification",
         user_email=db_request.user.email,
         user_name=user_name,
         absence_type=db_request.type.value,
@@ -224,6 +226,13 @@ async def update_absence_request_status(
         admin_comment=admin_update.admin_comment
     )
     
+    # Mettre à jour l'événement Google Calendar après la réponse
+    calendar_sync_service.request(db, db_request)
+    
+    updated_request = crud.update_absence_request_status(db=db, request_id=request_id, admin_update=admin_update, admin_id=current_user.id)
+    
+    notification_service.schedule(background_tasks, db)
+    calendar_sync_service.schedule(background_tasks, db)
     return updated_request
 
 # Routes génériques (doivent être déclarées APRÈS les routes spécifiques)
@@ -247,6 +256,7 @@ async def read_absence_request(
 async def update_absence_request(
     request_id: int,
     request_update: schemas.AbsenceRequestUpdate,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -265,38 +275,36 @@ async def update_absence_request(
     if db_request.status != models.AbsenceStatus.EN_ATTENTE:
         raise HTTPException(status_code=400, detail="Impossible de modifier une demande déjà traitée")
     
-    updated_request = crud.update_absence_request(db=db, request_id=request_id, request_update=request_update)
-    
-    # Mettre à jour l'événement Google Calendar
-    if google_calendar_service.is_configured() and updated_request.google_calendar_event_id:
-        google_calendar_service.update_event(updated_request.google_calendar_event_id, updated_request)
-    elif google_calendar_service.is_configured() and not updated_request.google_calendar_event_id:
-        # Créer l'événement s'il n'existe pas encore
-        event_id = google_calendar_service.create_event(updated_request)
-        if event_id:
-            updated_request.google_calendar_event_id = event_id
-            db.commit()
-    
-    # Notifier les admins de la modification
+    # Notifier les admins de la modification (outbox enregistrée avec la modification)
     admin_users = db.query(models.User).filter(models.User.role == models.UserRole.ADMIN).all()
     admin_emails = [admin.email for admin in admin_users]
     
+    changes = request_update.model_dump(exclude_unset=True)
     user_name = f"{current_user.first_name} {current_user.last_name}"
-    email_service.send_absence_modification_notification(
+    crud.enqueue_notification(
+        db, "absence_modification_notification",
         admin_emails=admin_emails,
         user_name=user_name,
-        absence_type=updated_request.type.value,
-        start_date=str(updated_request.start_date),
-        end_date=str(updated_request.end_date),
-        reason=updated_request.reason,
+        absence_type=(changes.get("type") or db_request.type).value,
+        start_date=str(changes.get("start_date", db_request.start_date)),
+        end_date=str(changes.get("end_date", db_request.end_date)),
+        reason=changes.get("reason", db_request.reason),
         request_id=request_id
     )
     
+    # Mettre à jour l'événement Google Calendar après la réponse
+    calendar_sync_service.request(db, db_request)
+    
+    updated_request = crud.update_absence_request(db=db, request_id=request_id, request_update=request_update)
+    
+    notification_service.schedule(background_tasks, db)
+    calendar_sync_service.schedule(background_tasks, db)
     return updated_request
 
 @router.delete("/{request_id}")
 async def delete_absence_request(
     request_id: int,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -312,16 +320,16 @@ async def delete_absence_request(
     if db_request.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Accès non autorisé")
     
-    # Supprimer l'événement Google Calendar s'il existe
-    if google_calendar_service.is_configured() and db_request.google_calendar_event_id:
-        google_calendar_service.delete_event(db_request.google_calendar_event_id)
+    # Supprimer l'événement Google Calendar après la réponse
+    calendar_sync_service.request(db, db_request, DELETE)
     
-    # Notifier les admins de la suppression avant de supprimer la demande
+    # Notifier les admins de la suppression (outbox enregistrée avec la suppression)
     admin_users = db.query(models.User).filter(models.User.role == models.UserRole.ADMIN).all()
     admin_emails = [admin.email for admin in admin_users]
     
     user_name = f"{current_user.first_name} {current_user.last_name}"
-    email_service.send_absence_deletion_notification(
+    crud.enqueue_notification(
+        db, "absence_deletion_notification",
         admin_emails=admin_emails,
         user_name=user_name,
         absence_type=db_request.type.value,
@@ -332,5 +340,7 @@ async def delete_absence_request(
     )
     
     crud.delete_absence_request(db=db, request_id=request_id)
+    notification_service.schedule(background_tasks, db)
+    calendar_sync_service.schedule(background_tasks, db)
     return {"message": "Demande supprimée"}
 
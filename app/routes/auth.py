@@ -21,7 +21,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             detail="Email ou mot de passe incorrect",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = auth.create_access_token(data={"sub": user.email})
+    access_token = auth.create_access_token(data=auth.principal_claims(user))
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login")
@@ -33,7 +33,7 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou mot de passe incorrect"
         )
-    access_token = auth.create_access_token(data={"sub": user.email})
+    access_token = auth.create_access_token(data=auth.principal_claims(user))
     return {
         "access_token": access_token,
         "token_type": "bearer",
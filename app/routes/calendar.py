@@ -1,22 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, extract
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, date
 from typing import List, Optional
 from calendar import monthrange
 import calendar
 
-from app.database import get_db
-from app import models, schemas, auth
+from app.database import get_async_db
+from app import models, schemas, crud, auth
 
 router = APIRouter()
 
+def _absence_title(row) -> str:
+    """Libellé d'une demande d'absence (type et statut)"""
+    type_label = "Vacances" if row.type == models.AbsenceType.VACANCES else "Maladie"
+    status_label = ""
+    if row.status == models.AbsenceStatus.EN_ATTENTE:
+        status_label = " (En attente)"
+    elif row.status == models.AbsenceStatus.REFUSE:
+        status_label = " (Refusé)"
+    return f"{type_label}{status_label}"
+
+def _sickness_title(row) -> str:
+    """Libellé d'une déclaration de maladie (avec statut d'envoi de l'email)"""
+    email_status = " ✉️" if row.email_sent else " ❌"
+    return f"Arrêt maladie{email_status}"
+
 @router.get("/admin", response_model=List[schemas.CalendarEvent])
 async def get_admin_calendar(
     year: int = Query(..., description="Année à afficher"),
     month: int = Query(..., description="Mois à afficher (1-12)"),
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth.Principal = Depends(auth.get_current_admin_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Récupère les événements du calendrier pour l'admin (vue mensuelle)
@@ -27,102 +41,31 @@ async def get_admin_calendar(
     _, last_day = monthrange(year, month)
     end_date = date(year, month, last_day)
     
-    # Récupérer toutes les demandes d'absence du mois
-    absence_requests = db.query(models.AbsenceRequest).join(
-        models.User, models.AbsenceRequest.user_id == models.User.id
-    ).filter(
-        and_(
-            or_(
-                # Demandes qui commencent dans le mois
-                and_(
-                    models.AbsenceRequest.start_date >= start_date,
-                    models.AbsenceRequest.start_date <= end_date
-                ),
-                # Demandes qui finissent dans le mois
-                and_(
-                    models.AbsenceRequest.end_date >= start_date,
-                    models.AbsenceRequest.end_date <= end_date
-                ),
-                # Demandes qui couvrent tout le mois
-                and_(
-                    models.AbsenceRequest.start_date <= start_date,
-                    models.AbsenceRequest.end_date >= end_date
-                )
-            ),
-            models.User.is_active == True
-        )
-    ).all()
-    
-    # Récupérer aussi les déclarations de maladie du mois
-    sickness_declarations = db.query(models.SicknessDeclaration).join(
-        models.User, models.SicknessDeclaration.user_id == models.User.id
-    ).filter(
-        and_(
-            or_(
-                # Déclarations qui commencent dans le mois
-                and_(
-                    models.SicknessDeclaration.start_date >= start_date,
-                    models.SicknessDeclaration.start_date <= end_date
-                ),
-                # Déclarations qui finissent dans le mois
-                and_(
-                    models.SicknessDeclaration.end_date >= start_date,
-                    models.SicknessDeclaration.end_date <= end_date
-                ),
-                # Déclarations qui couvrent tout le mois
-                and_(
-                    models.SicknessDeclaration.start_date <= start_date,
-                    models.SicknessDeclaration.end_date >= end_date
-                )
-            ),
-            models.User.is_active == True
-        )
-    ).all()
+    # Une seule requête pour les absences et déclarations du mois (utilisateurs actifs)
+    rows = await crud.get_calendar_event_rows_async(db, start_date, end_date, active_users_only=True)
     
     # Convertir en événements calendrier
     calendar_events = []
-    
-    # Traiter les demandes d'absence
-    for request in absence_requests:
-        # Créer le titre avec nom de l'utilisateur et type
-        type_label = "Vacances" if request.type == models.AbsenceType.VACANCES else "Maladie"
-        status_label = ""
-        if request.status == models.AbsenceStatus.EN_ATTENTE:
-            status_label = " (En attente)"
-        elif request.status == models.AbsenceStatus.REFUSE:
-            status_label = " (Refusé)"
-            
-        title = f"{request.user.first_name} {request.user.last_name} - {type_label}{status_label}"
-        
-        calendar_events.append(schemas.CalendarEvent(
-            id=request.id,
-            title=title,
-            start=max(request.start_date, start_date),  # Ajuster au début du mois si nécessaire
-            end=min(request.end_date, end_date),        # Ajuster à la fin du mois si nécessaire
-            type=request.type,
-            status=request.status,
-            user_name=f"{request.user.first_name} {request.user.last_name}",
-            reason=request.reason,
-            event_source="absence_request"
-        ))
-    
-    # Traiter les déclarations de maladie
-    for declaration in sickness_declarations:
-        # Créer le titre avec nom de l'utilisateur
-        email_status = " ✉️" if declaration.email_sent else " ❌"
-        title = f"{declaration.user.first_name} {declaration.user.last_name} - Arrêt maladie{email_status}"
+    for row in rows:
+        user_name = f"{row.first_name} {row.last_name}"
+        if row.event_source == crud.SICKNESS_DECLARATION:
+            # Les déclarations de maladie sont toujours de type MALADIE et approuvées
+            title = f"{user_name} - {_sickness_title(row)}"
+            reason = row.pdf_filename or row.reason
+        else:
+            title = f"{user_name} - {_absence_title(row)}"
+            reason = row.reason
         
-        # Les déclarations de maladie sont toujours de type MALADIE et approuvées
         calendar_events.append(schemas.CalendarEvent(
-            id=declaration.id,
+            id=row.id,
             title=title,
-            start=max(declaration.start_date, start_date),
-            end=min(declaration.end_date, end_date),
-            type=models.AbsenceType.MALADIE,
-            status=models.AbsenceStatus.APPROUVE,  # Les déclarations sont automatiquement approuvées
-            user_name=f"{declaration.user.first_name} {declaration.user.last_name}",
-            reason=(declaration.pdf_filename or declaration.description),
-            event_source="sickness_declaration"
+            start=max(row.start_date, start_date),  # Ajuster au début du mois si nécessaire
+            end=min(row.end_date, end_date),        # Ajuster à la fin du mois si nécessaire
+            type=row.type,
+            status=row.status,
+            user_name=user_name,
+            reason=reason,
+            event_source=row.event_source
         ))
     
     return calendar_events
@@ -130,8 +73,8 @@ async def get_admin_calendar(
 @router.get("/user", response_model=List[schemas.CalendarEvent])
 async def get_user_calendar(
     year: int = Query(..., description="Année à afficher"),
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(auth.get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Récupère les événements du calendrier pour un utilisateur (vue annuelle)
@@ -141,95 +84,28 @@ async def get_user_calendar(
     start_date = date(year, 1, 1)
     end_date = date(year, 12, 31)
     
-    # Récupérer les demandes d'absence de l'utilisateur pour l'année
-    absence_requests = db.query(models.AbsenceRequest).filter(
-        and_(
-            models.AbsenceRequest.user_id == current_user.id,
-            or_(
-                # Demandes qui commencent dans l'année
-                and_(
-                    models.AbsenceRequest.start_date >= start_date,
-                    models.AbsenceRequest.start_date <= end_date
-                ),
-                # Demandes qui finissent dans l'année
-                and_(
-                    models.AbsenceRequest.end_date >= start_date,
-                    models.AbsenceRequest.end_date <= end_date
-                ),
-                # Demandes qui couvrent toute l'année
-                and_(
-                    models.AbsenceRequest.start_date <= start_date,
-                    models.AbsenceRequest.end_date >= end_date
-                )
-            )
-        )
-    ).all()
-    
-    # Récupérer aussi les déclarations de maladie de l'utilisateur
-    sickness_declarations = db.query(models.SicknessDeclaration).filter(
-        and_(
-            models.SicknessDeclaration.user_id == current_user.id,
-            or_(
-                # Déclarations qui commencent dans l'année
-                and_(
-                    models.SicknessDeclaration.start_date >= start_date,
-                    models.SicknessDeclaration.start_date <= end_date
-                ),
-                # Déclarations qui finissent dans l'année
-                and_(
-                    models.SicknessDeclaration.end_date >= start_date,
-                    models.SicknessDeclaration.end_date <= end_date
-                ),
-                # Déclarations qui couvrent toute l'année
-                and_(
-                    models.SicknessDeclaration.start_date <= start_date,
-                    models.SicknessDeclaration.end_date >= end_date
-                )
-            )
-        )
-    ).all()
+    # Une seule requête pour les absences et déclarations de l'utilisateur
+    rows = await crud.get_calendar_event_rows_async(db, start_date, end_date, user_id=current_user.id)
+    user_name = f"{current_user.first_name} {current_user.last_name}"
     
     # Convertir en événements calendrier
     calendar_events = []
-    
-    # Traiter les demandes d'absence
-    for request in absence_requests:
-        type_label = "Vacances" if request.type == models.AbsenceType.VACANCES else "Maladie"
-        status_label = ""
-        if request.status == models.AbsenceStatus.EN_ATTENTE:
-            status_label = " (En attente)"
-        elif request.status == models.AbsenceStatus.REFUSE:
-            status_label = " (Refusé)"
-            
-        title = f"{type_label}{status_label}"
-        
-        calendar_events.append(schemas.CalendarEvent(
-            id=request.id,
-            title=title,
-            start=max(request.start_date, start_date),
-            end=min(request.end_date, end_date),
-            type=request.type,
-            status=request.status,
-            user_name=f"{current_user.first_name} {current_user.last_name}",
-            reason=request.reason,
-            event_source="absence_request"
-        ))
-    
-    # Traiter les déclarations de maladie
-    for declaration in sickness_declarations:
-        email_status = " ✉️" if declaration.email_sent else " ❌"
-        title = f"Arrêt maladie{email_status}"
+    for row in rows:
+        if row.event_source == crud.SICKNESS_DECLARATION:
+            title = _sickness_title(row)
+        else:
+            title = _absence_title(row)
         
         calendar_events.append(schemas.CalendarEvent(
-            id=declaration.id,
+            id=row.id,
             title=title,
-            start=max(declaration.start_date, start_date),
-            end=min(declaration.end_date, end_date),
-            type=models.AbsenceType.MALADIE,
-            status=models.AbsenceStatus.APPROUVE,
-            user_name=f"{current_user.first_name} {current_user.last_name}",
-            reason=declaration.description,
-            event_source="sickness_declaration"
+            start=max(row.start_date, start_date),
+            end=min(row.end_date, end_date),
+            type=row.type,
+            status=row.status,
+            user_name=user_name,
+            reason=row.reason,
+            event_source=row.event_source
         ))
     
     return calendar_events
@@ -237,8 +113,8 @@ async def get_user_calendar(
 @router.get("/summary")
 async def get_calendar_summary(
     year: int = Query(..., description="Année pour le résumé"),
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(auth.get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Récupère un résumé des congés pour l'année donnée
@@ -247,15 +123,7 @@ async def get_calendar_summary(
     start_date = date(year, 1, 1)
     end_date = date(year, 12, 31)
     
-    approved_requests = db.query(models.AbsenceRequest).filter(
-        and_(
-            models.AbsenceRequest.user_id == current_user.id,
-            models.AbsenceRequest.status == models.AbsenceStatus.APPROUVE,
-            models.AbsenceRequest.type == models.AbsenceType.VACANCES,
-            models.AbsenceRequest.start_date <= end_date,
-            models.AbsenceRequest.end_date >= start_date
-        )
-    ).all()
+    approved_requests = await crud.get_approved_vacation_periods_async(db, current_user.id, start_date, end_date)
     
     # Calculer les jours utilisés
     used_days = 0
@@ -281,27 +149,19 @@ async def get_calendar_summary(
 async def get_calendar_summary_for_user(
     user_id: int,
     year: int = Query(..., description="Année pour le résumé"),
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: auth.Principal = Depends(auth.get_current_admin_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Résumé des congés pour un utilisateur spécifique (admin)."""
     # Calculer les jours utilisés dans l'année pour l'utilisateur ciblé
     start_date = date(year, 1, 1)
     end_date = date(year, 12, 31)
 
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await crud.get_user_async(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
-    approved_requests = db.query(models.AbsenceRequest).filter(
-        and_(
-            models.AbsenceRequest.user_id == user_id,
-            models.AbsenceRequest.status == models.AbsenceStatus.APPROUVE,
-            models.AbsenceRequest.type == models.AbsenceType.VACANCES,
-            models.AbsenceRequest.start_date <= end_date,
-            models.AbsenceRequest.end_date >= start_date
-        )
-    ).all()
+    approved_requests = await crud.get_approved_vacation_periods_async(db, user_id, start_date, end_date)
 
     used_days = 0
     for request in approved_requests:
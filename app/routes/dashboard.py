@@ -1,15 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from app.database import get_db
+from app.database import get_db, get_async_db, get_pool_metrics
 from app import models, schemas, crud, auth
 
 router = APIRouter()
 
 @router.get("/", response_model=schemas.DashboardData)
 async def get_dashboard(
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: auth.Principal = Depends(auth.get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Les admins n'ont pas de dashboard de congés
     if current_user.role == models.UserRole.ADMIN:
@@ -23,11 +25,28 @@ async def get_dashboard(
         )
     
     try:
-        dashboard_data = crud.get_dashboard_data(db=db, user_id=current_user.id)
+        dashboard_data = await crud.get_dashboard_data_async(db=db, user_id=current_user.id)
         return dashboard_data
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.get("/admin/balances", response_model=List[schemas.LeaveBalance])
+async def get_admin_balances(
+    year: Optional[int] = Query(None, description="Année de la période de congés (défaut: année courante)"),
+    user_ids: Optional[List[int]] = Query(None, description="Utilisateurs ciblés (défaut: tous les utilisateurs actifs)"),
+    current_user: auth.Principal = Depends(auth.get_current_admin_principal),
+    db: Session = Depends(get_db)
+):
+    """Soldes de congés de tous les utilisateurs en un seul appel (admin)"""
+    return crud.compute_balances(db, user_ids=user_ids, year=year)
+
+@router.get("/admin/database")
+async def get_database_pool_metrics(
+    current_user: auth.Principal = Depends(auth.get_current_admin_principal)
+):
+    """Mode de pool, temps d'établissement des connexions et état du pool de l'instance (admin)"""
+    return get_pool_metrics()
+
 @router.post("/admin/init")
 async def initialize_admin(
     current_user: models.User = Depends(auth.get_current_admin_user),
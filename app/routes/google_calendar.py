@@ -2,8 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app import models, auth
+from app import models, crud, auth
 from app.google_calendar_service import google_calendar_service
+from app.calendar_sync_service import calendar_sync_service
+from app.routes.notifications import verify_cron_secret
 
 router = APIRouter()
 
@@ -19,12 +21,50 @@ async def get_google_calendar_status(
         "message": "Google Calendar configuré et prêt" if is_configured else "Google Calendar non configuré"
     }
 
+@router.get("/drain", dependencies=[Depends(verify_cron_secret)])
+def drain_calendar_sync(
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """Exécuter les synchronisations en attente (appelé périodiquement par le cron en serverless)"""
+    results = calendar_sync_service.drain(db, limit=limit)
+    return {**results, "jobs": crud.get_calendar_sync_counts(db)}
+
+@router.get("/queue")
+async def get_calendar_sync_queue_status(
+    current_user: models.User = Depends(auth.get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Nombre de synchronisations Google Calendar par statut (admin)"""
+    return crud.get_calendar_sync_counts(db)
+
+def _run_response(run, done_key: str, message: str) -> dict:
+    """Résultats cumulés d'une synchronisation complète (éventuellement reprise en plusieurs appels)"""
+    return {
+        "success": True,
+        "message": message if run.completed else f"{message} partiellement: relancer la requête pour reprendre",
+        "run_id": run.id,
+        "completed": run.completed,
+        "results": {
+            "absence_requests": {
+                done_key: run.absences_synced,
+                "unchanged": run.absences_unchanged,
+                "failed": run.absences_failed
+            },
+            "sickness_declarations": {
+                done_key: run.sickness_synced,
+                "unchanged": run.sickness_unchanged,
+                "failed": run.sickness_failed
+            }
+        }
+    }
+
 @router.post("/sync")
-async def sync_all_absences(
+def sync_all_absences(
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Synchroniser manuellement toutes les absences avec Google Calendar"""
+    """Synchroniser les absences sans événement Google Calendar (requêtes batch, reprise après interruption)"""
     if not google_calendar_service.is_configured():
         raise HTTPException(
             status_code=400, 
@@ -32,76 +72,22 @@ async def sync_all_absences(
         )
     
     try:
-        # Synchroniser les demandes d'absence
-        absence_requests = db.query(models.AbsenceRequest).filter(
-            models.AbsenceRequest.google_calendar_event_id.is_(None)
-        ).all()
-        
-        synced_absences = 0
-        failed_absences = 0
-        
-        for request in absence_requests:
-            try:
-                event_id = google_calendar_service.create_event(request)
-                if event_id:
-                    request.google_calendar_event_id = event_id
-                    synced_absences += 1
-                else:
-                    failed_absences += 1
-            except Exception as e:
-                failed_absences += 1
-                print(f"Erreur synchronisation absence {request.id}: {e}")
-        
-        # Synchroniser les déclarations de maladie
-        sickness_declarations = db.query(models.SicknessDeclaration).filter(
-            models.SicknessDeclaration.google_calendar_event_id.is_(None)
-        ).all()
-        
-        synced_sickness = 0
-        failed_sickness = 0
-        
-        for declaration in sickness_declarations:
-            try:
-                event_id = google_calendar_service.create_sickness_event(declaration)
-                if event_id:
-                    declaration.google_calendar_event_id = event_id
-                    synced_sickness += 1
-                else:
-                    failed_sickness += 1
-            except Exception as e:
-                failed_sickness += 1
-                print(f"Erreur synchronisation déclaration {declaration.id}: {e}")
-        
-        # Sauvegarder les changements
-        db.commit()
-        
-        return {
-            "success": True,
-            "message": "Synchronisation terminée",
-            "results": {
-                "absence_requests": {
-                    "total": len(absence_requests),
-                    "synced": synced_absences,
-                    "failed": failed_absences
-                },
-                "sickness_declarations": {
-                    "total": len(sickness_declarations),
-                    "synced": synced_sickness,
-                    "failed": failed_sickness
-                }
-            }
-        }
-        
+        run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.SYNC)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Erreur lors de la synchronisation: {str(e)}")
+    return _run_response(run, "synced", "Synchronisation terminée")
 
 @router.post("/resync")
-async def resync_all_absences(
+def resync_all_absences(
+    pull: bool = False,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Re-synchroniser toutes les absences (met à jour les événements existants)"""
+    """
+    Re-synchroniser les absences modifiées depuis leur dernier envoi (requêtes batch).
+    Avec pull=true, les modifications faites directement dans Google Calendar sont d'abord relues
+    """
     if not google_calendar_service.is_configured():
         raise HTTPException(
             status_code=400, 
@@ -109,76 +95,30 @@ async def resync_all_absences(
         )
     
     try:
-        # Re-synchroniser les demandes d'absence
-        absence_requests = db.query(models.AbsenceRequest).all()
-        
-        updated_absences = 0
-        failed_absences = 0
-        
-        for request in absence_requests:
-            try:
-                if request.google_calendar_event_id:
-                    # Mettre à jour l'événement existant
-                    success = google_calendar_service.update_event(request.google_calendar_event_id, request)
-                    if success:
-                        updated_absences += 1
-                    else:
-                        failed_absences += 1
-                else:
-                    # Créer un nouvel événement
-                    event_id = google_calendar_service.create_event(request)
-                    if event_id:
-                        request.google_calendar_event_id = event_id
-                        updated_absences += 1
-                    else:
-                        failed_absences += 1
-            except Exception as e:
-                failed_absences += 1
-                print(f"Erreur re-synchronisation absence {request.id}: {e}")
-        
-        # Re-synchroniser les déclarations de maladie
-        sickness_declarations = db.query(models.SicknessDeclaration).all()
-        
-        updated_sickness = 0
-        failed_sickness = 0
-        
-        for declaration in sickness_declarations:
-            try:
-                if declaration.google_calendar_event_id:
-                    # Les déclarations de maladie ne sont pas modifiables, on les recrée si besoin
-                    continue
-                else:
-                    # Créer un nouvel événement
-                    event_id = google_calendar_service.create_sickness_event(declaration)
-                    if event_id:
-                        declaration.google_calendar_event_id = event_id
-                        updated_sickness += 1
-                    else:
-                        failed_sickness += 1
-            except Exception as e:
-                failed_sickness += 1
-                print(f"Erreur re-synchronisation déclaration {declaration.id}: {e}")
-        
-        # Sauvegarder les changements
-        db.commit()
-        
-        return {
-            "success": True,
-            "message": "Re-synchronisation terminée",
-            "results": {
-                "absence_requests": {
-                    "total": len(absence_requests),
-                    "updated": updated_absences,
-                    "failed": failed_absences
-                },
-                "sickness_declarations": {
-                    "total": len(sickness_declarations),
-                    "updated": updated_sickness,
-                    "failed": failed_sickness
-                }
-            }
-        }
-        
+        remote_changes = calendar_sync_service.pull_remote_changes(db) if pull else None
+        run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.RESYNC)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la re-synchronisation: {str(e)}")
+    response = _run_response(run, "updated", "Re-synchronisation terminée")
+    if remote_changes is not None:
+        response["remote_changes"] = remote_changes
+    return response
+
+@router.post("/pull")
+def pull_remote_changes(
+    current_user: models.User = Depends(auth.get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Relire les événements modifiés ou supprimés dans Google Calendar depuis la passe précédente"""
+    if not google_calendar_service.is_configured():
+        raise HTTPException(
+            status_code=400, 
+            detail="Google Calendar n'est pas configuré"
+        )
+    
+    try:
+        return calendar_sync_service.pull_remote_changes(db)
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la re-synchronisation: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la lecture des modifications: {str(e)}")
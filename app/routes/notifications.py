@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Header
+from sqlalchemy.orm import Session
+from typing import Optional
+import os
+
+from app.database import get_db
+from app import models, crud, auth
+from app.notification_service import notification_service
+
+router = APIRouter()
+
+def verify_cron_secret(authorization: Optional[str] = Header(None)):
+    """Vérifier l'en-tête envoyé par Vercel Cron (Authorization: Bearer $CRON_SECRET)"""
+    cron_secret = os.getenv("CRON_SECRET")
+    if not cron_secret or authorization != f"Bearer {cron_secret}":
+        raise HTTPException(status_code=401, detail="Accès non autorisé")
+
+@router.get("/drain", dependencies=[Depends(verify_cron_secret)])
+def drain_notifications(
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """Envoyer les notifications en attente (appelé périodiquement par le cron en serverless)"""
+    results = notification_service.drain(db, limit=limit)
+    return {**results, "outbox": crud.get_notification_counts(db)}
+
+@router.get("/outbox")
+async def get_outbox_status(
+    current_user: models.User = Depends(auth.get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Nombre de notifications par statut (admin)"""
+    return crud.get_notification_counts(db)
@@ -1,17 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Request, Query
 from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app import models, schemas, crud, auth
-from app.email_service import email_service
 from app.file_service import file_service
-from app.google_calendar_service import google_calendar_service
+from app.file_responses import conditional_file_response
+from app.notification_service import notification_service
+from app.calendar_sync_service import calendar_sync_service
 
 router = APIRouter()
 
+def _enqueue_declaration_email(db: Session, declaration: models.SicknessDeclaration, user: models.User, pdf_path: str):
+    """Ajouter à l'outbox l'email transmettant la déclaration à l'utilisateur et aux admins (sans commit)"""
+    admin_users = db.query(models.User).filter(models.User.role == models.UserRole.ADMIN).all()
+    admin_emails = [admin.email for admin in admin_users] or ["hello.obvious@gmail.com"]
+    crud.enqueue_notification(
+        db, "sickness_declaration_email",
+        sickness_declaration_id=declaration.id,
+        user_name=f"{user.first_name} {user.last_name}",
+        to_emails=list({user.email, *admin_emails}),
+        start_date=str(declaration.start_date),
+        end_date=str(declaration.end_date),
+        description=declaration.description,
+        pdf_path=pdf_path
+    )
+
+async def _attach_pdf(db: Session, declaration: models.SicknessDeclaration, pdf_file: UploadFile, user: models.User):
+    """
+    Stocker le PDF d'une déclaration créée et enregistrer l'email qui le transmet à l'utilisateur
+    et aux admins. En cas d'erreur la déclaration est supprimée et la référence au contenu libérée
+    """
+    # Capturés avant tout commit, qui expire la déclaration: l'annulation ne la relit pas
+    declaration_id, before = declaration.id, crud.sickness_snapshot(declaration)
+    temp_path = None
+    reserved = None
+    try:
+        original_filename, temp_path, file_sha256 = await file_service.receive_pdf(pdf_file)
+        file_path = file_service.reference(file_sha256)
+        # Référence validée avant le dépôt: une suppression concurrente du même contenu ne peut plus le retirer
+        crud.reserve_stored_file(db, file_sha256, file_path)
+        reserved = file_sha256
+        await file_service.store_pdf(temp_path, file_sha256)
+        temp_path = None
+
+        # Créer l'événement Google Calendar après la réponse
+        calendar_sync_service.request(db, declaration)
+
+        # Email enregistré en dernier: validé par le même commit que le fichier de la déclaration,
+        # qui est marquée comme envoyée à la livraison
+        _enqueue_declaration_email(db, declaration, user, file_path)
+        crud.update_sickness_declaration_file(db, declaration.id, original_filename, file_path, file_sha256, reference_held=True)
+    except Exception as e:
+        # Si l'upload échoue, abandonner les écritures non validées puis supprimer la déclaration
+        # et la référence réservée en une transaction
+        db.rollback()
+        if temp_path:
+            file_service.discard(temp_path)
+        crud.discard_sickness_declaration(db, declaration_id, before, reserved)
+        raise HTTPException(status_code=400, detail=f"Erreur lors de l'upload du fichier: {str(e)}")
+
 @router.post("/admin", response_model=schemas.SicknessDeclaration)
 async def create_sickness_declaration_admin(
+    background_tasks: BackgroundTasks,
     user_id: int = Form(...),
     start_date: str = Form(...),
     end_date: str = Form(...),
@@ -41,59 +93,34 @@ async def create_sickness_declaration_admin(
         description=description
     )
     db_declaration = crud.create_sickness_declaration(db=db, declaration=declaration_data, user_id=user_id)
+    await _attach_pdf(db, db_declaration, pdf_file, target_user)
 
-    try:
-        original_filename, file_path = await file_service.save_pdf(pdf_file)
-        crud.update_sickness_declaration_file(db, db_declaration.id, original_filename, file_path)
-
-        # Envoi email au user (et en copie aux admins)
-        admin_users = db.query(models.User).filter(models.User.role == models.UserRole.ADMIN).all()
-        admin_emails = [admin.email for admin in admin_users] or ["hello.obvious@gmail.com"]
-        recipients = list({target_user.email, *admin_emails})
-
-        email_sent = email_service.send_sickness_declaration_email(
-            user_name=f"{target_user.first_name} {target_user.last_name}",
-            to_emails=recipients,
-            start_date=str(start_date_obj),
-            end_date=str(end_date_obj),
-            description=description,
-            pdf_path=file_path
-        )
-        if email_sent:
-            crud.mark_sickness_declaration_email_sent(db, db_declaration.id)
-        
-        # Créer l'événement dans Google Calendar
-        if google_calendar_service.is_configured():
-            event_id = google_calendar_service.create_sickness_event(db_declaration)
-            if event_id:
-                # Mettre à jour la déclaration avec l'ID de l'événement Google Calendar
-                db_declaration.google_calendar_event_id = event_id
-                db.commit()
-        
-        db.refresh(db_declaration)
-    except Exception as e:
-        db.delete(db_declaration)
-        db.commit()
-        raise HTTPException(status_code=400, detail=f"Erreur lors de l'upload du fichier: {str(e)}")
-
+    notification_service.schedule(background_tasks, db)
+    calendar_sync_service.schedule(background_tasks, db)
     return db_declaration
 
-@router.get("/", response_model=list[schemas.SicknessDeclaration])
+@router.get("/", response_model=Union[list[schemas.SicknessDeclaration], schemas.Page[schemas.SicknessDeclaration]])
 async def read_sickness_declarations(
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Curseur de pagination (vide pour la première page)"),
+    current_user: auth.Principal = Depends(auth.get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Récupérer les déclarations de maladie (utilisateur: ses propres déclarations, admin: toutes)"""
-    if current_user.role == models.UserRole.ADMIN:
-        declarations = crud.get_sickness_declarations(db, skip=skip, limit=limit)
-    else:
-        declarations = crud.get_sickness_declarations(db, skip=skip, limit=limit, user_id=current_user.id)
+    user_id = None if current_user.role == models.UserRole.ADMIN else current_user.id
+    if cursor is not None:
+        try:
+            items, next_cursor = await crud.get_sickness_declarations_page_async(db, cursor=cursor, limit=limit, user_id=user_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"items": items, "next_cursor": next_cursor}
+    declarations = await crud.get_sickness_declarations_async(db, skip=skip, limit=limit, user_id=user_id)
     return declarations
 
 @router.post("/", response_model=schemas.SicknessDeclaration)
 async def create_sickness_declaration(
+    background_tasks: BackgroundTasks,
     start_date: str = Form(...),
     end_date: str = Form(...),
     description: Optional[str] = Form(None),
@@ -126,55 +153,21 @@ async def create_sickness_declaration(
     
     db_declaration = crud.create_sickness_declaration(db=db, declaration=declaration_data, user_id=current_user.id)
     
-    # Sauvegarder le fichier PDF
-    try:
-        original_filename, file_path = await file_service.save_pdf(pdf_file)
-        crud.update_sickness_declaration_file(db, db_declaration.id, original_filename, file_path)
-        
-        # Envoyer l'email avec le PDF
-        user_name = f"{current_user.first_name} {current_user.last_name}"
-        # Envoyer l'email à l'admin et à l'utilisateur
-        admin_users = db.query(models.User).filter(models.User.role == models.UserRole.ADMIN).all()
-        admin_emails = [admin.email for admin in admin_users] or ["hello.obvious@gmail.com"]
-        recipients = list({*(admin_emails), current_user.email})
-        email_sent = email_service.send_sickness_declaration_email(
-            user_name=user_name,
-            to_emails=recipients,
-            start_date=str(start_date_obj),
-            end_date=str(end_date_obj),
-            description=description,
-            pdf_path=file_path
-        )
-        
-        if email_sent:
-            crud.mark_sickness_declaration_email_sent(db, db_declaration.id)
-        
-        # Créer l'événement dans Google Calendar
-        if google_calendar_service.is_configured():
-            event_id = google_calendar_service.create_sickness_event(db_declaration)
-            if event_id:
-                # Mettre à jour la déclaration avec l'ID de l'événement Google Calendar
-                db_declaration.google_calendar_event_id = event_id
-                db.commit()
-        
-        # Rafraîchir pour obtenir les données mises à jour
-        db.refresh(db_declaration)
-        
-    except Exception as e:
-        # Si l'upload échoue, supprimer la déclaration créée
-        db.delete(db_declaration)
-        db.commit()
-        raise HTTPException(status_code=400, detail=f"Erreur lors de l'upload du fichier: {str(e)}")
+    # Sauvegarder le fichier PDF et envoyer l'email à l'admin et à l'utilisateur
+    await _attach_pdf(db, db_declaration, pdf_file, current_user)
     
+    notification_service.schedule(background_tasks, db)
+    calendar_sync_service.schedule(background_tasks, db)
     return db_declaration
 
 @router.get("/{declaration_id}/pdf")
 async def download_sickness_pdf(
     declaration_id: int,
+    request: Request,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Servir le PDF d'une déclaration en affichage inline"""
+    """Servir le PDF d'une déclaration en affichage inline (Range, ETag, 304)"""
     declaration = crud.get_sickness_declaration(db, declaration_id)
     if not declaration:
         raise HTTPException(status_code=404, detail="Déclaration non trouvée")
@@ -183,21 +176,18 @@ async def download_sickness_pdf(
     if not declaration.pdf_path:
         raise HTTPException(status_code=404, detail="Aucun document PDF pour cette déclaration")
     
-    import os
-    if not os.path.exists(declaration.pdf_path):
+    try:
+        return conditional_file_response(
+            request, file_service.local_path(declaration.pdf_path),
+            declaration.pdf_filename or "document.pdf", declaration.pdf_sha256
+        )
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Fichier PDF non trouvé sur le serveur")
-    
-    with open(declaration.pdf_path, 'rb') as f:
-        data = f.read()
-    headers = {
-        "Content-Type": "application/pdf",
-        "Content-Disposition": f"inline; filename=\"{declaration.pdf_filename or 'document.pdf'}\""
-    }
-    return Response(content=data, headers=headers)
 
 @router.get("/{declaration_id}", response_model=schemas.SicknessDeclaration)
 async def read_sickness_declaration(
     declaration_id: int,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -212,19 +202,20 @@ async def read_sickness_declaration(
     
     # Si c'est un admin qui consulte, marquer comme vue et envoyer un email
     if current_user.role == models.UserRole.ADMIN and not db_declaration.viewed_by_admin:
-        crud.mark_sickness_declaration_viewed(db, declaration_id)
-        
-        # Envoyer un email à l'utilisateur pour l'informer
+        # Envoyer un email à l'utilisateur pour l'informer (outbox enregistrée avec le marquage)
         user_name = f"{db_declaration.user.first_name} {db_declaration.user.last_name}"
         admin_name = f"{current_user.first_name} {current_user.last_name}"
         
-        email_service.send_sickness_declaration_viewed_notification(
+        crud.enqueue_notification(
+            db, "sickness_declaration_viewed_notification",
             user_email=db_declaration.user.email,
             user_name=user_name,
             start_date=str(db_declaration.start_date),
             end_date=str(db_declaration.end_date),
             admin_name=admin_name
         )
+        crud.mark_sickness_declaration_viewed(db, declaration_id)
+        notification_service.schedule(background_tasks, db)
         
         db.refresh(db_declaration)
     
@@ -232,7 +223,7 @@ async def read_sickness_declaration(
 
 @router.get("/admin/unviewed-count")
 async def get_unviewed_declarations_count(
-    current_user: models.User = Depends(auth.get_current_admin_user),
+    current_user: auth.Principal = Depends(auth.get_current_admin_principal),
     db: Session = Depends(get_db)
 ):
     """Obtenir le nombre de déclarations non vues par l'admin"""
@@ -244,6 +235,7 @@ async def get_unviewed_declarations_count(
 @router.post("/{declaration_id}/mark-viewed")
 async def mark_declaration_as_viewed(
     declaration_id: int,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -252,14 +244,12 @@ async def mark_declaration_as_viewed(
     if not declaration:
         raise HTTPException(status_code=404, detail="Déclaration non trouvée")
     
-    # Marquer comme vue
-    crud.mark_sickness_declaration_viewed(db, declaration_id)
-    
-    # Envoyer un email à l'utilisateur pour l'informer
+    # Envoyer un email à l'utilisateur pour l'informer (outbox enregistrée avec le marquage)
     user_name = f"{declaration.user.first_name} {declaration.user.last_name}"
     admin_name = f"{current_user.first_name} {current_user.last_name}"
     
-    email_service.send_sickness_declaration_viewed_notification(
+    crud.enqueue_notification(
+        db, "sickness_declaration_viewed_notification",
         user_email=declaration.user.email,
         user_name=user_name,
         start_date=str(declaration.start_date),
@@ -267,11 +257,16 @@ async def mark_declaration_as_viewed(
         admin_name=admin_name
     )
     
+    # Marquer comme vue
+    crud.mark_sickness_declaration_viewed(db, declaration_id)
+    notification_service.schedule(background_tasks, db)
+    
     return {"message": "Déclaration marquée comme vue et email envoyé"}
 
 @router.post("/{declaration_id}/resend-email")
 async def resend_declaration_email(
     declaration_id: int,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -284,27 +279,14 @@ async def resend_declaration_email(
         raise HTTPException(status_code=400, detail="Aucun document PDF associé à cette déclaration")
     
     # Vérifier que le fichier existe
-    import os
-    if not os.path.exists(declaration.pdf_path):
+    try:
+        file_service.local_path(declaration.pdf_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Fichier PDF non trouvé sur le serveur")
     
-    try:
-        # Renvoyer l'email
-        email_sent = email_service.send_sickness_declaration_email(
-            user_name=f"{declaration.user.first_name} {declaration.user.last_name}",
-            start_date=declaration.start_date,
-            end_date=declaration.end_date,
-            description=declaration.description,
-            pdf_path=declaration.pdf_path,
-            pdf_filename=declaration.pdf_filename
-        )
-        
-        if email_sent:
-            # Marquer l'email comme envoyé
-            crud.mark_sickness_declaration_email_sent(db, declaration_id)
-            return {"message": "Email renvoyé avec succès"}
-        else:
-            raise HTTPException(status_code=500, detail="Erreur lors de l'envoi de l'email")
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de l'envoi: {str(e)}")
\ No newline at end of file
+    # Renvoyer l'email via l'outbox, après la réponse: la déclaration est marquée comme envoyée à la livraison
+    _enqueue_declaration_email(db, declaration, declaration.user, declaration.pdf_path)
+    db.commit()
+    notification_service.schedule(background_tasks, db)
+    
+    return {"message": "Email en cours de renvoi"}
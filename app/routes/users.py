@@ -1,41 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app import models, schemas, crud, auth
-from app.email_service import email_service
+from app.notification_service import notification_service
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.User)
 async def create_user(
     user: schemas.UserCreate,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     db_user = crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email déjà enregistré")
+    # Notifier l'utilisateur de la création de son compte (l'échec d'envoi ne bloque pas la création)
+    crud.enqueue_notification(
+        db, "user_created_notification",
+        user_email=user.email,
+        user_name=f"{user.first_name} {user.last_name}"
+    )
     created = crud.create_user(db=db, user=user)
-    # Notifier l'utilisateur de la création de son compte
-    try:
-        email_service.send_user_created_notification(
-            user_email=created.email,
-            user_name=f"{created.first_name} {created.last_name}"
-        )
-    except Exception:
-        # On ne bloque pas la création de compte si l'email échoue
-        pass
+    notification_service.schedule(background_tasks, db)
     return created
 
-@router.get("/", response_model=list[schemas.User])
+@router.get("/", response_model=Union[list[schemas.User], schemas.Page[schemas.User]])
 async def read_users(
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Curseur de pagination (vide pour la première page)"),
+    current_user: auth.Principal = Depends(auth.get_current_admin_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    users = crud.get_users(db, skip=skip, limit=limit)
+    if cursor is not None:
+        try:
+            items, next_cursor = await crud.get_users_page_async(db, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"items": items, "next_cursor": next_cursor}
+    users = await crud.get_users_async(db, skip=skip, limit=limit)
     return users
 
 @router.get("/{user_id}", response_model=schemas.User)
@@ -53,6 +61,7 @@ async def read_user(
 async def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -67,14 +76,13 @@ async def update_user(
             detail="Un administrateur ne peut pas modifier son propre compte"
         )
     
+    crud.enqueue_notification(
+        db, "user_updated_notification",
+        user_email=user_update.email or db_user.email,
+        user_name=f"{user_update.first_name or db_user.first_name} {user_update.last_name or db_user.last_name}"
+    )
     updated_user = crud.update_user(db=db, user_id=user_id, user_update=user_update)
-    try:
-        email_service.send_user_updated_notification(
-            user_email=updated_user.email,
-            user_name=f"{updated_user.first_name} {updated_user.last_name}"
-        )
-    except Exception:
-        pass
+    notification_service.schedule(background_tasks, db)
     return updated_user
 
 @router.get("/me", response_model=schemas.User)
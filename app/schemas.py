@@ -1,6 +1,6 @@
 from pydantic import BaseModel, field_validator
 from datetime import datetime, date
-from typing import Optional
+from typing import Optional, Generic, TypeVar
 import re
 from app.models import UserRole, AbsenceType, AbsenceStatus
 
@@ -126,6 +126,15 @@ class DashboardData(BaseModel):
     approved_requests: int
     sick_days: int
 
+# Schéma pour le solde de congés d'un utilisateur (calcul groupé admin)
+class LeaveBalance(BaseModel):
+    user_id: int
+    year: int
+    total_leave_days: int
+    used_leave_days: int
+    remaining_leave_days: int
+    sick_days: int
+
 # Schéma pour le résumé des absences d'un utilisateur
 class UserAbsenceSummary(BaseModel):
     user: User
@@ -150,6 +159,7 @@ class SicknessDeclaration(SicknessDeclarationBase):
     user_id: int
     pdf_filename: Optional[str] = None
     pdf_path: Optional[str] = None
+    pdf_sha256: Optional[str] = None
     email_sent: bool
     viewed_by_admin: bool
     created_at: datetime
@@ -158,4 +168,11 @@ class SicknessDeclaration(SicknessDeclarationBase):
     # Relations
     user: User
 
-    model_config = {"from_attributes": True}
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+# Enveloppe de pagination par curseur (created_at, id)
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: Optional[str] = None  # None: dernière page
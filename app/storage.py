@@ -0,0 +1,339 @@
+"""
+Stockage des fichiers par empreinte SHA-256 (un même contenu n'est stocké qu'une fois):
+système de fichiers local, service compatible S3 (AWS S3, MinIO, R2...) ou base de données
+"""
+import os
+import hmac
+import uuid
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+from urllib.parse import quote, urlparse
+
+import httpx
+from sqlalchemy import select, insert, delete as sql_delete
+from sqlalchemy.exc import IntegrityError
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+STREAM_CHUNK_SIZE = 64 * 1024
+# Taille des morceaux stockés en base et taille maximale du cache disque local
+DB_CHUNK_SIZE = 256 * 1024
+CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+def blob_key(sha256: str, extension: str = ".pdf") -> str:
+    """Clé d'un contenu: répartie en sous-répertoires par les deux premiers caractères"""
+    return f"{sha256[:2]}/{sha256}{extension}"
+
+def _iter_file(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+def _local_file(reference: str) -> str:
+    if not os.path.isfile(reference):
+        raise FileNotFoundError(reference)
+    return reference
+
+def _delete_local_file(reference: str) -> bool:
+    try:
+        os.unlink(reference)
+        return True
+    except FileNotFoundError:
+        return False
+
+class DiskCache:
+    """Cache disque en lecture (ex. /tmp), borné en taille: les fichiers les moins récemment lus sont évincés"""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.root / key
+        try:
+            os.utime(path)  # Contenus immuables: seule la date de dernier accès compte
+        except FileNotFoundError:
+            return None
+        return str(path)
+
+    def fill(self, key: str, chunks: Iterable[bytes]) -> str:
+        """Écrire un contenu morceau par morceau puis le publier atomiquement dans le cache"""
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+        try:
+            with open(temp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        self._evict(keep=path)
+        return str(path)
+
+    def discard(self, key: str):
+        (self.root / key).unlink(missing_ok=True)
+
+    def _evict(self, keep: Path):
+        files = [(entry.stat(), entry) for entry in self.root.rglob("*") if entry.is_file() and not entry.name.startswith(".")]
+        total = sum(stat.st_size for stat, _ in files)
+        for stat, entry in sorted(files, key=lambda item: item[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            if entry != keep:
+                entry.unlink(missing_ok=True)
+                total -= stat.st_size
+
+class StorageBackend:
+    """
+    Interface des backends de stockage. Une référence (renvoyée par put et enregistrée
+    dans pdf_path) identifie un contenu stocké de façon unique.
+    """
+
+    def reference(self, key: str) -> str:
+        """Référence du contenu stocké sous une clé (connue avant son dépôt)"""
+        raise NotImplementedError
+
+    def put(self, key: str, source_path: str) -> str:
+        """Déplacer un fichier temporaire sous sa clé (ignoré si le contenu existe déjà); renvoie la référence"""
+        raise NotImplementedError
+
+    def local_path(self, reference: str) -> str:
+        """Chemin local lisible du contenu (FileNotFoundError s'il n'existe pas)"""
+        raise NotImplementedError
+
+    def delete(self, reference: str, connection=None) -> bool:
+        """Supprimer un contenu (connection: transaction en cours, utilisée par le stockage en base)"""
+        raise NotImplementedError
+
+class LocalStorageBackend(StorageBackend):
+    """Contenus stockés sous un répertoire local; la référence est le chemin du fichier"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def reference(self, key: str) -> str:
+        return str(self.root / key)
+
+    def put(self, key: str, source_path: str) -> str:
+        destination = self.root / key
+        if destination.exists():
+            # Contenu déjà stocké: le doublon est abandonné (la référence acquise avant le dépôt
+            # empêche une suppression concurrente de le retirer)
+            os.unlink(source_path)
+        else:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(source_path, destination)
+        return str(destination)
+
+    def local_path(self, reference: str) -> str:
+        # Les anciens fichiers (nommés par uuid) sont aussi des chemins locaux
+        return _local_file(reference)
+
+    def delete(self, reference: str, connection=None) -> bool:
+        return _delete_local_file(reference)
+
+class S3StorageBackend(StorageBackend):
+    """
+    Contenus stockés dans un bucket compatible S3 (adressage par chemin, signature AWS v4).
+    Les lectures passent par un cache local (pièces jointes, téléchargements).
+    """
+
+    def __init__(self, bucket: str, endpoint_url: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", cache_dir: Path = None, cache_max_bytes: int = CACHE_MAX_BYTES, timeout: float = 30):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = urlparse(self.endpoint_url).netloc
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.cache = DiskCache(cache_dir or Path("/tmp/storage_cache"), cache_max_bytes)
+        self.client = httpx.Client(timeout=timeout)
+
+    def reference(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    def _key(self, reference: str) -> str:
+        prefix = f"s3://{self.bucket}/"
+        if not reference.startswith(prefix):
+            raise FileNotFoundError(reference)
+        return reference[len(prefix):]
+
+    def _signed_headers(self, method: str, path: str, payload_sha256: str, extra: dict = None) -> dict:
+        """En-têtes signés (AWS Signature Version 4)"""
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        scope = f"{now:%Y%m%d}/{self.region}/s3/aws4_request"
+        headers = {"host": self.host, "x-amz-content-sha256": payload_sha256, "x-amz-date": amz_date, **(extra or {})}
+        names = sorted(name.lower() for name in headers)
+        lowered = {name.lower(): str(value).strip() for name, value in headers.items()}
+        canonical_request = "\n".join([
+            method, path, "",
+            "".join(f"{name}:{lowered[name]}\n" for name in names),
+            ";".join(names),
+            payload_sha256
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+        ])
+        signing_key = f"AWS4{self.secret_key}".encode()
+        for part in scope.split("/"):
+            signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={';'.join(names)}, Signature={signature}"
+        )
+        del headers["host"]  # Ajouté par httpx
+        return headers
+
+    def _request(self, method: str, key: str, payload_sha256: str = EMPTY_SHA256, extra: dict = None, **kwargs) -> httpx.Response:
+        path = quote(f"/{self.bucket}/{key}", safe="/~")
+        headers = self._signed_headers(method, path, payload_sha256, extra)
+        return self.client.request(method, f"{self.endpoint_url}{path}", headers=headers, **kwargs)
+
+    def put(self, key: str, source_path: str) -> str:
+        try:
+            if self._request("HEAD", key).status_code != 200:
+                # La clé est l'empreinte du contenu: elle sert aussi de x-amz-content-sha256
+                payload_sha256 = Path(key).stem
+                response = self._request(
+                    "PUT", key, payload_sha256,
+                    extra={"content-length": str(os.path.getsize(source_path)), "content-type": "application/pdf"},
+                    content=_iter_file(source_path)
+                )
+                response.raise_for_status()
+        finally:
+            os.unlink(source_path)
+        return self.reference(key)
+
+    def local_path(self, reference: str) -> str:
+        if not reference.startswith("s3://"):
+            return _local_file(reference)  # Fichier envoyé avant le passage à S3
+        key = self._key(reference)
+        cached = self.cache.get(key)
+        if cached:
+            return cached
+        path = quote(f"/{self.bucket}/{key}", safe="/~")
+        headers = self._signed_headers("GET", path, EMPTY_SHA256)
+        with self.client.stream("GET", f"{self.endpoint_url}{path}", headers=headers) as response:
+            if response.status_code == 404:
+                raise FileNotFoundError(reference)
+            response.raise_for_status()
+            return self.cache.fill(key, response.iter_bytes(STREAM_CHUNK_SIZE))
+
+    def delete(self, reference: str, connection=None) -> bool:
+        if not reference.startswith("s3://"):
+            return _delete_local_file(reference)
+        key = self._key(reference)
+        self.cache.discard(key)
+        return self._request("DELETE", key).status_code in (200, 204)
+
+class DatabaseStorageBackend(StorageBackend):
+    """
+    Contenus stockés en base, découpés en morceaux (table stored_file_chunks): durable sur
+    les déploiements serverless dont le disque (/tmp) disparaît au recyclage de l'instance.
+    Les lectures passent par un cache disque local qui évite de relire la base pour les fichiers récents.
+    """
+
+    def __init__(self, engine, cache_dir: Path, cache_max_bytes: int = CACHE_MAX_BYTES, chunk_size: int = DB_CHUNK_SIZE):
+        self.engine = engine
+        self.cache = DiskCache(cache_dir, cache_max_bytes)
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _table():
+        from app.models import StoredFileChunk
+        return StoredFileChunk.__table__
+
+    def _key(self, reference: str) -> str:
+        if not reference.startswith("db://"):
+            raise FileNotFoundError(reference)
+        return reference[len("db://"):]
+
+    def reference(self, key: str) -> str:
+        return f"db://{key}"
+
+    def put(self, key: str, source_path: str) -> str:
+        table = self._table()
+        sha256 = Path(key).stem
+        try:
+            with self.engine.begin() as conn:
+                exists = conn.execute(
+                    select(table.c.seq).where(table.c.sha256 == sha256, table.c.seq == 0)
+                ).first()
+                if exists is None:
+                    # Un morceau par INSERT: la mémoire reste bornée par la taille d'un morceau
+                    with open(source_path, "rb") as f:
+                        seq = 0
+                        while True:
+                            chunk = f.read(self.chunk_size)
+                            if chunk or seq == 0:  # Un fichier vide garde un morceau (vide)
+                                conn.execute(insert(table).values(sha256=sha256, seq=seq, data=chunk))
+                            if len(chunk) < self.chunk_size:
+                                break
+                            seq += 1
+        except IntegrityError:
+            pass  # Même contenu enregistré au même moment par un autre upload
+        finally:
+            os.unlink(source_path)
+        return self.reference(key)
+
+    def _iter_chunks(self, sha256: str) -> Iterator[bytes]:
+        table = self._table()
+        with self.engine.connect() as conn:
+            # Curseur côté serveur (PostgreSQL): les morceaux sont lus un à un
+            result = conn.execution_options(stream_results=True, yield_per=1).execute(
+                select(table.c.data).where(table.c.sha256 == sha256).order_by(table.c.seq)
+            )
+            for (data,) in result:
+                yield data
+
+    def local_path(self, reference: str) -> str:
+        if not reference.startswith("db://"):
+            return _local_file(reference)  # Fichier envoyé avant le passage au stockage en base
+        key = self._key(reference)
+        cached = self.cache.get(key)
+        if cached:
+            return cached
+        table = self._table()
+        with self.engine.connect() as conn:
+            if conn.execute(select(table.c.seq).where(table.c.sha256 == Path(key).stem, table.c.seq == 0)).first() is None:
+                raise FileNotFoundError(reference)
+        return self.cache.fill(key, self._iter_chunks(Path(key).stem))
+
+    def delete(self, reference: str, connection=None) -> bool:
+        if not reference.startswith("db://"):
+            return _delete_local_file(reference)
+        key = self._key(reference)
+        self.cache.discard(key)
+        table = self._table()
+        statement = sql_delete(table).where(table.c.sha256 == Path(key).stem)
+        if connection is not None:
+            # Validé avec la transaction en cours (SQLite: une seconde connexion attendrait son verrou)
+            return connection.execute(statement).rowcount > 0
+        with self.engine.begin() as conn:
+            result = conn.execute(statement)
+        return result.rowcount > 0
+
+def get_storage_backend(upload_dir: Path) -> StorageBackend:
+    """Backend configuré par STORAGE_BACKEND ("local" par défaut, "s3" ou "database")"""
+    backend = os.getenv("STORAGE_BACKEND", "local")
+    cache_max_bytes = int(os.getenv("STORAGE_CACHE_MAX_BYTES", str(CACHE_MAX_BYTES)))
+    if backend == "s3":
+        return S3StorageBackend(
+            bucket=os.environ["S3_BUCKET"],
+            endpoint_url=os.getenv("S3_ENDPOINT_URL", "https://s3.amazonaws.com"),
+            access_key=os.environ["S3_ACCESS_KEY_ID"],
+            secret_key=os.environ["S3_SECRET_ACCESS_KEY"],
+            region=os.getenv("S3_REGION", "us-east-1"),
+            cache_dir=upload_dir / ".cache",
+            cache_max_bytes=cache_max_bytes
+        )
+    if backend == "database":
+        from app.database import engine
+        return DatabaseStorageBackend(engine, cache_dir=upload_dir / ".cache", cache_max_bytes=cache_max_bytes)
+    return LocalStorageBackend(upload_dir)
@@ -0,0 +1,90 @@
+"""
+Calendrier de travail: comptage des jours ouvrés en temps constant
+"""
+import os
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+# _WEEKDAYS_IN_REMAINDER[jour_de_départ][n] = jours ouvrés parmi les n jours
+# consécutifs commençant au jour de semaine `jour_de_départ` (0 = lundi)
+_WEEKDAYS_IN_REMAINDER = tuple(
+    tuple(sum(1 for offset in range(n) if (start + offset) % 7 < 5) for n in range(7))
+    for start in range(7)
+)
+
+def _easter_sunday(year: int) -> date:
+    """Date du dimanche de Pâques (algorithme grégorien anonyme)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def french_public_holidays(year: int) -> list[date]:
+    """Jours fériés légaux en France métropolitaine pour une année"""
+    easter = _easter_sunday(year)
+    return sorted([
+        date(year, 1, 1),                 # Jour de l'an
+        easter + timedelta(days=1),       # Lundi de Pâques
+        date(year, 5, 1),                 # Fête du travail
+        date(year, 5, 8),                 # Victoire 1945
+        easter + timedelta(days=39),      # Ascension
+        easter + timedelta(days=50),      # Lundi de Pentecôte
+        date(year, 7, 14),                # Fête nationale
+        date(year, 8, 15),                # Assomption
+        date(year, 11, 1),                # Toussaint
+        date(year, 11, 11),               # Armistice
+        date(year, 12, 25),               # Noël
+    ])
+
+HOLIDAY_CALENDARS = {
+    "fr": french_public_holidays,
+}
+
+class WorkingCalendar:
+    """Calendrier de travail (lundi-vendredi) avec jours fériés optionnels"""
+
+    def __init__(self, holidays: Iterable[date] = ()):
+        # Seuls les fériés tombant en semaine réduisent le nombre de jours ouvrés
+        self.holidays = sorted({d for d in holidays if d.weekday() < 5})
+
+    @classmethod
+    def from_country(cls, country: Optional[str], first_year: int = 2000, last_year: int = 2100) -> "WorkingCalendar":
+        """Construire le calendrier avec la table des fériés précalculée d'un pays"""
+        if not country:
+            return cls()
+        generator = HOLIDAY_CALENDARS.get(country.lower())
+        if generator is None:
+            raise ValueError(f"Calendrier de jours fériés inconnu: {country}")
+        return cls(d for year in range(first_year, last_year + 1) for d in generator(year))
+
+    def count_weekdays(self, start_date: date, end_date: date) -> int:
+        """Nombre de jours du lundi au vendredi entre deux dates (incluses)"""
+        if start_date > end_date:
+            return 0
+        full_weeks, remainder = divmod((end_date - start_date).days + 1, 7)
+        return full_weeks * 5 + _WEEKDAYS_IN_REMAINDER[start_date.weekday()][remainder]
+
+    def count_holidays(self, start_date: date, end_date: date) -> int:
+        """Nombre de jours fériés ouvrés entre deux dates (incluses)"""
+        if start_date > end_date or not self.holidays:
+            return 0
+        return bisect_right(self.holidays, end_date) - bisect_left(self.holidays, start_date)
+
+    def holidays_between(self, start_date: date, end_date: date) -> list[date]:
+        """Jours fériés ouvrés entre deux dates (incluses)"""
+        return self.holidays[bisect_left(self.holidays, start_date):bisect_right(self.holidays, end_date)]
+
+    def business_days(self, start_date: date, end_date: date) -> int:
+        """Nombre de jours ouvrés entre deux dates (incluses), fériés déduits"""
+        return self.count_weekdays(start_date, end_date) - self.count_holidays(start_date, end_date)
+
+# Instance globale (HOLIDAY_CALENDAR=fr pour déduire les jours fériés français)
+working_calendar = WorkingCalendar.from_country(os.getenv("HOLIDAY_CALENDAR"))
@@ -6,16 +6,12 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from sqlalchemy.orm import Session
-from app.database import engine, get_db
-from app.models import Base, User, UserRole
+from app.database import get_db
+from app.models import User, UserRole
 from app.auth import get_password_hash
 
 def create_admin_user():
-    """Créer un utilisateur administrateur par défaut"""
-    # Créer les tables
-    Base.metadata.create_all(bind=engine)
-    
+    """Créer un utilisateur administrateur par défaut (schéma créé au préalable par init_db.py)"""
     # Obtenir une session de base de données
     db = next(get_db())
     
@@ -108,6 +108,18 @@ PROJECT_NAME="soft-absences"
     npx vercel link --yes --project "$PROJECT_NAME" --scope "$TEAM_ID"
     print_message "Pull des variables (production)"
     npx vercel pull --yes --environment=production
+    # Schéma et migrations: l'application ne les applique pas au démarrage
+    print_message "Initialisation de la base de production (init_db.py)"
+    if [ -f .vercel/.env.production.local ]; then
+        set -a
+        . .vercel/.env.production.local
+        set +a
+    fi
+    if [ -n "${DATABASE_URL}${POSTGRES_URL}${POSTGRES_PRISMA_URL}${NEON_DATABASE_URL}" ]; then
+        ENVIRONMENT=production python init_db.py
+    else
+        print_warning "Aucune base configurée: repli SQLite par instance, initialisé au démarrage"
+    fi
     print_message "Déploiement production"
     npx vercel deploy --prod --yes
     print_success "Déployé sur $PROJECT_NAME"
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Script d'initialisation de la base de données, à exécuter une fois par déploiement
+(l'application ne crée plus le schéma ni l'administrateur au démarrage):
+- base vide: création du schéma puis marquage de la dernière migration Alembic
+- base existante: application des migrations Alembic
+- création de l'administrateur par défaut s'il n'existe pas
+Exécuté par deploy.sh avant le déploiement Vercel. La base SQLite de repli (/tmp, production sans
+DATABASE_URL) est propre à chaque instance: elle est initialisée par init_ephemeral_db au chargement de l'application
+"""
+import os
+import sys
+
+# Ajouter le répertoire racine au path pour les imports
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(ROOT)
+
+from sqlalchemy import inspect
+
+from app.database import DATABASE_URL, ENVIRONMENT, engine
+from app.models import Base
+from create_admin import create_admin_user
+
+def alembic_config():
+    """Configuration Alembic pointant sur la base de l'environnement courant"""
+    from alembic.config import Config
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+    return config
+
+def init_db():
+    """Créer ou mettre à jour le schéma, puis garantir un administrateur"""
+    from alembic import command
+    config = alembic_config()
+    if not inspect(engine).has_table("users"):
+        print("🆕 Base vide: création du schéma...")
+        Base.metadata.create_all(bind=engine)
+        command.stamp(config, "head")
+    else:
+        print("🔄 Application des migrations...")
+        command.upgrade(config, "head")
+    print("✅ Schéma à jour")
+
+    create_admin_user()
+
+def init_ephemeral_db():
+    """
+    Base SQLite de repli en production (sqlite:////tmp/absences.db): chaque nouvelle instance démarre
+    sans fichier et aucune étape de déploiement ne peut l'initialiser. Schéma et administrateur
+    créés si la table users manque (pas de migrations: la base ne survit pas à l'instance)
+    """
+    if ENVIRONMENT != "production" or engine.dialect.name != "sqlite" or inspect(engine).has_table("users"):
+        return
+    Base.metadata.create_all(bind=engine)
+    create_admin_user()
+
+if __name__ == "__main__":
+    init_db()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Script pour recalculer les soldes de congés matérialisés (table leave_balances)
+À exécuter après la migration, puis ponctuellement pour détecter une dérive
+"""
+import os
+import sys
+
+# Ajouter le répertoire racine au path pour les imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.crud.ledger import rebuild_ledger
+
+def rebuild_leave_balances():
+    """Recalcule tous les soldes et affiche les écarts détectés"""
+    print("🔄 Recalcul des soldes de congés...")
+    
+    db = SessionLocal()
+    try:
+        drift = rebuild_ledger(db)
+        
+        if not drift:
+            print("✅ Aucun écart détecté")
+            return True
+        
+        print(f"⚠️  {len(drift)} écart(s) corrigé(s) :")
+        for entry in drift:
+            print(
+                f"  - utilisateur #{entry['user_id']} période {entry['period_year']} "
+                f"{entry['field']}: {entry['stored']} → {entry['expected']}"
+            )
+        return False
+        
+    except Exception as e:
+        print(f"❌ Erreur lors du recalcul des soldes: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    success = rebuild_leave_balances()
+    sys.exit(0 if success else 1)
@@ -39,9 +39,9 @@ ENVIRONMENT=development
     else:
         print("✅ Fichier .env trouvé")
     
-    # Créer un admin par défaut
-    print("Vérification/création de l'administrateur...")
-    subprocess.run([sys.executable, "create_admin.py"])
+    # Créer ou mettre à jour le schéma, puis l'admin par défaut
+    print("Initialisation de la base de données...")
+    subprocess.run([sys.executable, "init_db.py"])
     
     # Lancer le serveur
     print("Démarrage du serveur de développement...")
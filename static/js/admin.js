@@ -54,28 +54,26 @@ async function loadUsers() {
     try {
     const users = await apiCall('/users');
         
-        let html = '<table class="table"><thead><tr><th>Email</th><th>Nom</th><th>Rôle</th><th>Statut</th><th>Congés</th><th>Actions</th></tr></thead><tbody>';
+        let html = '<table class="table"><thead><tr><th>Email</th><th>Nom</th><th>Rôle</th><th>Statut</th><th title="Jours ouvrés pris sur la période de congés du 1er juin au 31 mai">Congés (jours ouvrés, juin–mai)</th><th>Actions</th></tr></thead><tbody>';
         
-        // Récupérer les données de congés pour tous les utilisateurs non-admin
-        const currentYear = new Date().getFullYear();
+        // Récupérer les soldes de congés de tous les utilisateurs en un seul appel.
+        // Mêmes règles que le tableau de bord utilisateur: jours ouvrés sur la
+        // période de congés du 1er juin au 31 mai (et non plus jours calendaires
+        // sur l'année civile comme l'ancien /calendar/summary/user).
+        const today = new Date();
+        const leavePeriodYear = today.getMonth() >= 5 ? today.getFullYear() : today.getFullYear() - 1;
         const userVacationData = {};
         
-        for (const user of users) {
-            if (user.role !== 'admin') {
-                try {
-                    const summary = await apiCall(`/calendar/summary/user/${user.id}?year=${currentYear}`);
-                    userVacationData[user.id] = {
-                        used: summary.used_leave_days || 0,
-                        total: summary.total_leave_days || user.annual_leave_days || 25
-                    };
-                } catch (error) {
-                    // En cas d'erreur, utiliser les valeurs par défaut
-                    userVacationData[user.id] = {
-                        used: 0,
-                        total: user.annual_leave_days || 25
-                    };
-                }
+        try {
+            const balances = await apiCall(`/dashboard/admin/balances?year=${leavePeriodYear}`);
+            for (const balance of balances) {
+                userVacationData[balance.user_id] = {
+                    used: balance.used_leave_days,
+                    total: balance.total_leave_days
+                };
             }
+        } catch (error) {
+            // En cas d'erreur, les valeurs par défaut sont affichées
         }
         
         users.forEach(user => {
@@ -104,9 +102,9 @@ async function loadUsers() {
             } else {
                 const vacationData = userVacationData[user.id];
                 if (vacationData) {
-                    leaveDisplay = `${vacationData.used}/${vacationData.total} jours`;
+                    leaveDisplay = `${vacationData.used}/${vacationData.total} jours ouvrés`;
                 } else {
-                    leaveDisplay = `0/${user.annual_leave_days || 25} jours`;
+                    leaveDisplay = `0/${user.annual_leave_days || 25} jours ouvrés`;
                 }
             }
             
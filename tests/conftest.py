@@ -1,29 +1,114 @@
 import pytest
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 import os
 
 # Configurer l'environnement de test
 os.environ["ENVIRONMENT"] = "test"
 
 from app.main import app
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models import Base
+from app import auth
 
 # Base de données de test en mémoire
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Même base pour les routes asynchrones; sans pool: chaque TestClient a sa propre boucle d'événements
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Nombre maximal de requêtes SQL par requête HTTP (surcharge: @pytest.mark.query_budget(n))
+MAX_STATEMENTS_PER_REQUEST = int(os.getenv("TEST_MAX_STATEMENTS_PER_REQUEST", "15"))
+
+# Requêtes SQL émises par chaque requête HTTP du test en cours
+request_statements = []
+
+@event.listens_for(engine, "before_cursor_execute")
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count_request_statement(conn, cursor, statement, parameters, context, executemany):
+    statements = conn.info.get("request_statements")
+    if statements is not None:
+        statements.append(statement)
+
+@event.listens_for(engine, "checkin")
+@event.listens_for(async_engine.sync_engine, "checkin")
+def _detach_request_statements(dbapi_connection, connection_record):
+    connection_record.info.pop("request_statements", None)
 
 def override_get_db():
+    statements = []
+    request_statements.append(statements)
     try:
         db = TestingSessionLocal()
+        # Rattacher le compteur à chaque connexion utilisée par la session de la requête
+        event.listen(db, "after_begin", lambda session, transaction, connection: connection.info.__setitem__("request_statements", statements))
         yield db
     finally:
         db.close()
 
+async def override_get_async_db():
+    statements = []
+    request_statements.append(statements)
+    async with TestingAsyncSessionLocal() as db:
+        event.listen(db.sync_session, "after_begin", lambda session, transaction, connection: connection.info.__setitem__("request_statements", statements))
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+@contextmanager
+def count_queries(bind=engine):
+    """Collecter les requêtes SQL exécutées sur le moteur de test"""
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+# Mesures de temps (sensibles à la charge de la machine): exécutées seulement si RUN_BENCHMARKS=1
+RUN_BENCHMARKS = os.getenv("RUN_BENCHMARKS", "0").lower() in ("1", "true", "yes")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "query_budget(n): nombre maximal de requêtes SQL par requête HTTP")
+    config.addinivalue_line("markers", "benchmark: mesure de temps, exécutée seulement si RUN_BENCHMARKS=1")
+
+def pytest_collection_modifyitems(config, items):
+    if RUN_BENCHMARKS:
+        return
+    skip = pytest.mark.skip(reason="benchmark: définir RUN_BENCHMARKS=1 pour l'exécuter")
+    for item in items:
+        if item.get_closest_marker("benchmark"):
+            item.add_marker(skip)
+
+@pytest.fixture(autouse=True)
+def statement_budget(request):
+    """Échouer si une requête HTTP du test dépasse le budget de requêtes SQL (détection des N+1)"""
+    marker = request.node.get_closest_marker("query_budget")
+    budget = marker.args[0] if marker else MAX_STATEMENTS_PER_REQUEST
+    request_statements.clear()
+    yield request_statements
+    worst = max(request_statements, key=len, default=[])
+    if len(worst) > budget:
+        pytest.fail(
+            f"{len(worst)} requêtes SQL pour une seule requête HTTP (budget: {budget}):\n" + "\n".join(worst),
+            pytrace=False
+        )
+
+@pytest.fixture
+def query_counter():
+    """Compteur de requêtes SQL (context manager)"""
+    return count_queries
 
 @pytest.fixture
 def db():
@@ -41,6 +126,8 @@ def client():
     """Créer un client de test"""
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    # Les tokens d'un test précédent ne doivent pas désigner les utilisateurs de cette base
+    auth.principal_cache.clear()
     with TestClient(app) as c:
         yield c
 
@@ -41,6 +41,45 @@ class TestAbsenceRequests:
         data = response.json()
         assert isinstance(data, list)
     
+    def test_cursor_pagination(self, client, admin_token, user_token):
+        """Test pagination par curseur: pages stables même si de nouvelles demandes arrivent"""
+        headers = {"Authorization": f"Bearer {user_token}"}
+        
+        def create(day):
+            response = client.post("/absence-requests/", json={
+                "type": "vacances",
+                "start_date": f"2030-03-{day:02d}",
+                "end_date": f"2030-03-{day:02d}"
+            }, headers=headers)
+            return response.json()["id"]
+        
+        created = [create(day) for day in range(1, 6)]
+        
+        # Premier page: curseur vide
+        response = client.get("/absence-requests/", params={"cursor": "", "limit": 2}, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        seen = [item["id"] for item in page["items"]]
+        assert len(seen) == 2 and page["next_cursor"]
+        
+        # Une nouvelle demande ne décale pas les pages suivantes
+        create(20)
+        while page["next_cursor"]:
+            page = client.get(
+                "/absence-requests/",
+                params={"cursor": page["next_cursor"], "limit": 2},
+                headers=headers
+            ).json()
+            seen += [item["id"] for item in page["items"]]
+        assert seen == sorted(created, reverse=True)
+        
+        # Les clients skip/limit reçoivent toujours une liste
+        response = client.get("/absence-requests/all", params={"skip": 1, "limit": 2}, headers={"Authorization": f"Bearer {admin_token}"})
+        assert isinstance(response.json(), list) and len(response.json()) == 2
+        
+        response = client.get("/absence-requests/all", params={"cursor": "pas-un-curseur"}, headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 400
+    
     def test_update_request_status_as_admin(self, client, admin_token, user_token):
         """Test mise à jour du statut d'une demande par un admin"""
         # Créer d'abord une demande
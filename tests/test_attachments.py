@@ -0,0 +1,73 @@
+import os
+import json
+import base64
+import email
+import tracemalloc
+import pytest
+
+from app.attachments import FileAttachment, iter_json, json_stream_length
+from app.email_service import EmailService
+
+@pytest.fixture
+def certificate(tmp_path):
+    """Certificat médical de 10 Mo"""
+    path = tmp_path / "certificat.pdf"
+    path.write_bytes(b"%PDF-1.4\n" + os.urandom(10 * 1024 * 1024))
+    return path
+
+def test_base64_chunks_match_full_encoding(tmp_path):
+    """L'encodage par morceaux donne le même résultat que l'encodage en une fois"""
+    path = tmp_path / "petit.pdf"
+    data = os.urandom(57 * 3 + 10)
+    path.write_bytes(data)
+    attachment = FileAttachment(str(path), chunk_size=57)
+
+    encoded = b"".join(attachment.iter_base64())
+    assert encoded == base64.b64encode(data)
+    assert attachment.encoded_size == len(encoded)
+
+def test_chunk_size_must_align_on_base64_lines(tmp_path):
+    with pytest.raises(ValueError):
+        FileAttachment(str(tmp_path / "x.pdf"), chunk_size=1000)
+
+def test_json_stream_is_valid_json(tmp_path):
+    """Le JSON généré par morceaux est complet et sa taille annoncée exacte"""
+    path = tmp_path / "arret.pdf"
+    data = os.urandom(200 * 1024)
+    path.write_bytes(data)
+    payload = {"to": ["rh@test.com"], "subject": "Arrêt", "attachments": [{"content": FileAttachment(str(path)), "filename": "arret.pdf"}]}
+
+    document = b"".join(iter_json(payload))
+    assert len(document) == json_stream_length(payload)
+    decoded = json.loads(document)
+    assert decoded["subject"] == "Arrêt"
+    assert base64.b64decode(decoded["attachments"][0]["content"]) == data
+
+def test_json_stream_peak_memory_stays_near_chunk_size(certificate):
+    """Un certificat de 10 Mo est encodé sans jamais être chargé entièrement en mémoire"""
+    payload = {"to": ["rh@test.com"], "attachments": [{"content": FileAttachment(str(certificate)), "filename": "certificat.pdf"}]}
+
+    tracemalloc.start()
+    total = sum(len(chunk) for chunk in iter_json(payload))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert total == json_stream_length(payload)
+    # Morceau lu, morceau encodé et morceau précédent encore référencé: quelques centaines de Ko au plus
+    assert peak < 6 * FileAttachment(str(certificate)).chunk_size
+    assert peak < certificate.stat().st_size // 20
+
+def test_smtp_message_attaches_pdf(certificate, monkeypatch):
+    """Le message SMTP contient le texte, le HTML et le PDF en application/pdf"""
+    monkeypatch.delenv("RESEND_API_KEY", raising=False)
+    service = EmailService()
+    msg = service._create_smtp_message_with_attachment(["rh@test.com"], "Arrêt", "Corps", "<p>Corps</p>", str(certificate))
+
+    parsed = email.message_from_bytes(msg.as_bytes())
+    assert parsed.get_content_type() == "multipart/mixed"
+    content, attachment = parsed.get_payload()
+    assert content.get_content_type() == "multipart/alternative"
+    assert attachment.get_content_type() == "application/pdf"
+    assert attachment.get_filename() == "certificat.pdf"
+    assert attachment.get_payload(decode=True) == certificate.read_bytes()
+    assert max(len(line) for line in attachment.get_payload().splitlines()) <= 76
@@ -0,0 +1,73 @@
+"""
+Cache des utilisateurs authentifiés: pas de requête SQL d'authentification tant que le token est en cache
+"""
+from app import auth
+from tests.conftest import async_engine
+
+def _headers(token):
+    return {"Authorization": f"Bearer {token}"}
+
+def test_repeated_request_skips_user_lookup(client, admin_token, query_counter):
+    """Le badge des demandes en attente, interrogé en boucle, ne relit pas l'utilisateur"""
+    with query_counter(async_engine.sync_engine) as statements:
+        response = client.get("/absence-requests/pending-count", headers=_headers(admin_token))
+    assert response.status_code == 200
+    assert any("FROM users" in statement for statement in statements)
+
+    with query_counter(async_engine.sync_engine) as statements:
+        response = client.get("/absence-requests/pending-count", headers=_headers(admin_token))
+    assert response.status_code == 200
+    assert statements == []
+    assert auth.principal_cache.hits >= 1
+
+def test_deactivation_invalidates_cache(client, admin_token, user_token):
+    assert client.get("/dashboard/", headers=_headers(user_token)).status_code == 200
+    user_id = client.get("/users/me", headers=_headers(user_token)).json()["id"]
+
+    response = client.put(f"/users/{user_id}", json={"is_active": False}, headers=_headers(admin_token))
+    assert response.status_code == 200
+
+    response = client.get("/dashboard/", headers=_headers(user_token))
+    assert response.status_code == 400
+
+def test_deletion_invalidates_cache(client, admin_token, user_token):
+    assert client.get("/dashboard/", headers=_headers(user_token)).status_code == 200
+    user_id = client.get("/users/me", headers=_headers(user_token)).json()["id"]
+
+    assert client.delete(f"/users/{user_id}", headers=_headers(admin_token)).status_code == 200
+
+    response = client.get("/dashboard/", headers=_headers(user_token))
+    assert response.status_code == 401
+
+def test_token_claims_authorize_without_database(client, admin_token, user_token, query_counter, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    auth.principal_cache.clear()
+
+    with query_counter(async_engine.sync_engine) as statements:
+        response = client.get("/dashboard/admin/database", headers=_headers(admin_token))
+    assert response.status_code == 200
+    assert statements == []
+
+    # Le rôle vient du token: un utilisateur reste refusé
+    response = client.get("/dashboard/admin/database", headers=_headers(user_token))
+    assert response.status_code == 403
+
+def test_cache_eviction_and_invalidation():
+    cache = auth.PrincipalCache(ttl=30, max_entries=1)
+    principal = auth.Principal(1, "user@test.com", auth.models.UserRole.USER, True)
+    cache.put("token-a", principal, None, cache.generation)
+    assert cache.get("token-a") is principal
+
+    # Plus ancienne entrée évincée au-delà de la taille maximale
+    cache.put("token-b", principal, None, cache.generation)
+    assert cache.get("token-a") is None
+
+    # Lecture commencée avant une invalidation: résultat non mis en cache
+    generation = cache.generation
+    cache.invalidate_user(1)
+    cache.put("token-c", principal, None, generation)
+    assert cache.get("token-c") is None
+
+    # Token déjà expiré: rien à mettre en cache
+    cache.put("token-d", principal, 0, cache.generation)
+    assert cache.get("token-d") is None
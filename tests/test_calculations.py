@@ -181,4 +181,304 @@ def test_get_user_absence_summary(db: Session):
     assert summary.sick_days == 2
     assert summary.pending_requests == 1
     assert summary.approved_requests == 2
-    assert len(summary.recent_absences) == 3 
\ No newline at end of file
+    assert len(summary.recent_absences) == 3 
+def test_working_calendar_matches_day_by_day_count():
+    """Le comptage en temps constant correspond au parcours jour par jour"""
+    from datetime import timedelta
+    from app.working_calendar import WorkingCalendar
+
+    calendar = WorkingCalendar()
+    origin = date(2024, 1, 1)
+    for start_offset in range(7):
+        for length in range(0, 45):
+            start = origin + timedelta(days=start_offset)
+            end = start + timedelta(days=length)
+            expected = sum(1 for i in range(length + 1) if (start + timedelta(days=i)).weekday() < 5)
+            assert calendar.count_weekdays(start, end) == expected
+
+    # Plage pluriannuelle: 2020-2029 contient 2609 jours du lundi au vendredi
+    assert calendar.business_days(date(2020, 1, 1), date(2029, 12, 31)) == 2609
+
+def test_working_calendar_deducts_public_holidays():
+    """Les jours fériés tombant en semaine sont déduits"""
+    from app.working_calendar import WorkingCalendar, french_public_holidays
+
+    holidays_2024 = french_public_holidays(2024)
+    assert date(2024, 4, 1) in holidays_2024   # Lundi de Pâques
+    assert date(2024, 5, 9) in holidays_2024   # Ascension
+    assert date(2024, 5, 20) in holidays_2024  # Lundi de Pentecôte
+
+    calendar = WorkingCalendar.from_country("fr")
+    # Semaine du 1er janvier 2024: 5 jours en semaine dont 1 férié
+    assert calendar.business_days(date(2024, 1, 1), date(2024, 1, 7)) == 4
+    # Mai 2024: 23 jours en semaine, 1er, 8, 9 et 20 mai fériés
+    assert calendar.business_days(date(2024, 5, 1), date(2024, 5, 31)) == 19
+    # Le 14 juillet 2024 est un dimanche: rien à déduire
+    assert calendar.count_holidays(date(2024, 7, 14), date(2024, 7, 14)) == 0
+
+    with pytest.raises(ValueError):
+        WorkingCalendar.from_country("xx")
+
+def test_compute_balances_matches_per_user_calculations(db: Session):
+    """Le calcul groupé correspond au calcul utilisateur par utilisateur"""
+    from app.crud import compute_balances
+    from app.crud.calculations import calculate_sick_days
+    from app.models import SicknessDeclaration
+
+    users = []
+    for index, leave_days in enumerate([25, 3]):
+        user = User(
+            email=f"user{index}@example.com",
+            hashed_password="x",
+            first_name="Test",
+            last_name=f"User{index}",
+            role=UserRole.USER,
+            annual_leave_days=leave_days
+        )
+        db.add(user)
+        users.append(user)
+    db.commit()
+
+    first, second = users
+    db.add_all([
+        AbsenceRequest(user_id=first.id, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE,
+                       start_date=date(2024, 6, 3), end_date=date(2024, 6, 14)),
+        AbsenceRequest(user_id=first.id, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE,
+                       start_date=date(2025, 2, 3), end_date=date(2025, 2, 4)),
+        AbsenceRequest(user_id=first.id, type=AbsenceType.VACANCES, status=AbsenceStatus.EN_ATTENTE,
+                       start_date=date(2024, 9, 2), end_date=date(2024, 9, 6)),
+        AbsenceRequest(user_id=first.id, type=AbsenceType.MALADIE, status=AbsenceStatus.APPROUVE,
+                       start_date=date(2024, 3, 4), end_date=date(2024, 3, 5)),
+        AbsenceRequest(user_id=second.id, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE,
+                       start_date=date(2024, 7, 1), end_date=date(2024, 7, 5)),
+        SicknessDeclaration(user_id=second.id, start_date=date(2024, 11, 4), end_date=date(2024, 11, 8)),
+        SicknessDeclaration(user_id=second.id, start_date=date(2025, 1, 6), end_date=date(2025, 1, 7)),
+    ])
+    db.commit()
+
+    balances = {balance.user_id: balance for balance in compute_balances(db, [first.id, second.id], 2024)}
+
+    for user in users:
+        balance = balances[user.id]
+        used = calculate_used_leave_days(db, user.id, 2024)
+        assert balance.used_leave_days == used
+        assert balance.sick_days == calculate_sick_days(db, user.id, 2024)
+        assert balance.remaining_leave_days == max(0, user.annual_leave_days - used)
+
+    assert balances[first.id].used_leave_days == 12
+    assert balances[first.id].sick_days == 2
+    assert balances[second.id].remaining_leave_days == 0
+    assert balances[second.id].sick_days == 5
+
+def test_admin_balances_endpoint(client, admin_token, user_token):
+    """L'endpoint admin renvoie le solde de chaque utilisateur actif"""
+    response = client.get("/dashboard/admin/balances", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    balances = response.json()
+    assert len(balances) == 1
+    assert balances[0]["total_leave_days"] == 25
+    assert balances[0]["remaining_leave_days"] == 25
+
+    response = client.get("/dashboard/admin/balances", headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 403
+
+def test_leave_ledger_tracks_crud_writes(db: Session):
+    """Le solde matérialisé suit les écritures CRUD et correspond au recalcul complet"""
+    from app import crud, schemas
+    from app.crud.ledger import compute_user_ledger
+    from app.models import LeaveBalance
+
+    user = User(email="ledger@example.com", hashed_password="x", first_name="Led", last_name="Ger",
+                role=UserRole.USER, annual_leave_days=25)
+    admin = User(email="boss@example.com", hashed_password="x", first_name="Boss", last_name="Admin",
+                 role=UserRole.ADMIN, annual_leave_days=25)
+    db.add_all([user, admin])
+    db.commit()
+
+    def stored():
+        return {
+            row.period_year: (row.used_leave_days, row.sick_days, row.pending_requests, row.approved_requests)
+            for row in db.query(LeaveBalance).filter(LeaveBalance.user_id == user.id)
+        }
+
+    def expected():
+        return {
+            period: (values["used_leave_days"], values["sick_days"], values["pending_requests"], values["approved_requests"])
+            for period, values in compute_user_ledger(db, user.id).items()
+        }
+
+    request = crud.create_absence_request(db, schemas.AbsenceRequestCreate(
+        type=AbsenceType.VACANCES, start_date=date(2024, 6, 3), end_date=date(2024, 6, 7)), user.id)
+    assert stored() == {2024: (0, 0, 1, 0)}
+
+    crud.update_absence_request_status(db, request.id, schemas.AbsenceRequestAdmin(status=AbsenceStatus.APPROUVE), admin.id)
+    assert stored() == {2024: (5, 0, 0, 1)}
+
+    crud.update_absence_request(db, request.id, schemas.AbsenceRequestUpdate(end_date=date(2024, 6, 10)))
+    assert stored() == {2024: (6, 0, 0, 1)}
+
+    # Changement de période: les deux lignes sont ajustées
+    crud.update_absence_request(db, request.id, schemas.AbsenceRequestUpdate(
+        start_date=date(2025, 7, 1), end_date=date(2025, 7, 2)))
+    assert stored()[2024] == (0, 0, 0, 0)
+    assert stored()[2025] == (2, 0, 0, 1)
+
+    declaration = crud.create_sickness_declaration(db, schemas.SicknessDeclarationCreate(
+        start_date=date(2025, 3, 3), end_date=date(2025, 3, 5)), user.id)
+    assert stored()[2025] == (2, 3, 0, 1)
+
+    assert {period: values for period, values in stored().items() if any(values)} == expected()
+
+    crud.delete_sickness_declaration(db, declaration.id)
+    crud.delete_absence_request(db, request.id)
+    assert all(values == (0, 0, 0, 0) for values in stored().values())
+
+def test_concurrent_first_writes_keep_both_contributions(db: Session, monkeypatch):
+    """Une première écriture qui voit le solde non matérialisé alors qu'une autre l'a déjà inséré n'écrase rien"""
+    from app import crud, schemas
+    from app.crud import ledger
+    from app.models import LeaveBalance
+
+    user = User(email="race@example.com", hashed_password="x", first_name="Ra", last_name="Ce",
+                role=UserRole.USER, annual_leave_days=25)
+    db.add(user)
+    db.commit()
+
+    crud.create_absence_request(db, schemas.AbsenceRequestCreate(
+        type=AbsenceType.VACANCES, start_date=date(2024, 6, 3), end_date=date(2024, 6, 7)), user.id)
+    # Seconde écriture concurrente: sa vérification a eu lieu avant l'insertion du solde par la première
+    monkeypatch.setattr(ledger, "_is_materialized", lambda db, user_id: False)
+    crud.create_absence_request(db, schemas.AbsenceRequestCreate(
+        type=AbsenceType.VACANCES, start_date=date(2024, 7, 1), end_date=date(2024, 7, 2)), user.id)
+
+    [row] = db.query(LeaveBalance).filter(LeaveBalance.user_id == user.id).all()
+    assert (row.period_year, row.pending_requests) == (2024, 2)
+    assert crud.rebuild_ledger(db, [user.id]) == []
+
+def test_delete_user_removes_ledger_rows(db: Session):
+    """La suppression d'un utilisateur supprime ses soldes matérialisés (clé étrangère vers users)"""
+    from app import crud
+    from app.models import LeaveBalance
+
+    user = User(email="gone@example.com", hashed_password="x", first_name="Par", last_name="Ti",
+                role=UserRole.USER, annual_leave_days=25)
+    db.add(user)
+    db.commit()
+    # Solde recalculé sans aucune absence: une ligne marque l'utilisateur comme matérialisé
+    assert crud.rebuild_ledger(db, [user.id]) == []
+    assert db.query(LeaveBalance).filter(LeaveBalance.user_id == user.id).count() == 1
+
+    assert crud.delete_user(db, user.id) is True
+    assert db.query(LeaveBalance).filter(LeaveBalance.user_id == user.id).count() == 0
+
+def test_rebuild_ledger_reports_drift(db: Session):
+    """Le recalcul signale et corrige les écarts du solde matérialisé"""
+    from app.crud import rebuild_ledger, get_dashboard_data
+    from app.models import LeaveBalance
+
+    user = User(email="drift@example.com", hashed_password="x", first_name="Dri", last_name="Ft",
+                role=UserRole.USER, annual_leave_days=25)
+    db.add(user)
+    db.commit()
+
+    current_year = datetime.now().year
+    # Insertion directe (hors CRUD): le premier affichage matérialise le solde
+    db.add(AbsenceRequest(user_id=user.id, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE,
+                          start_date=date(current_year, 6, 3), end_date=date(current_year, 6, 4)))
+    db.commit()
+    assert get_dashboard_data(db, user.id).used_leave_days == 2
+    assert rebuild_ledger(db) == []
+
+    # Une écriture qui contourne le CRUD crée une dérive
+    db.add(AbsenceRequest(user_id=user.id, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE,
+                          start_date=date(current_year, 7, 1), end_date=date(current_year, 7, 1)))
+    db.commit()
+    assert get_dashboard_data(db, user.id).used_leave_days == 2
+
+    drift = rebuild_ledger(db)
+    assert {"user_id": user.id, "period_year": current_year, "field": "used_leave_days", "stored": 2, "expected": 3} in drift
+    assert get_dashboard_data(db, user.id).used_leave_days == 3
+    assert db.query(LeaveBalance).filter(LeaveBalance.user_id == user.id).count() == 1
+
+def test_aggregate_dashboard_matches_python_calculation(db: Session, query_counter):
+    """Benchmark: une seule requête agrégée au lieu de cinq allers-retours"""
+    import time
+    from app import crud
+    from app.crud.aggregates import aggregate_dashboard_data
+    from app.crud.calculations import calculate_sick_days
+    from app.models import SicknessDeclaration
+
+    user = User(email="agg@example.com", hashed_password="x", first_name="Agg", last_name="Regate",
+                role=UserRole.USER, annual_leave_days=25)
+    db.add(user)
+    db.commit()
+
+    year = 2024
+    rows = []
+    for month in range(1, 13):
+        rows.append(AbsenceRequest(user_id=user.id, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE,
+                                   start_date=date(year, month, 3), end_date=date(year, month, 12)))
+        rows.append(AbsenceRequest(user_id=user.id, type=AbsenceType.MALADIE, status=AbsenceStatus.APPROUVE,
+                                   start_date=date(year, month, 20), end_date=date(year, month, 22)))
+        rows.append(AbsenceRequest(user_id=user.id, type=AbsenceType.VACANCES, status=AbsenceStatus.EN_ATTENTE,
+                                   start_date=date(year, month, 24), end_date=date(year, month, 25)))
+        rows.append(SicknessDeclaration(user_id=user.id, start_date=date(year, month, 14), end_date=date(year, month, 17)))
+    # Hors périodes: ne doit pas compter
+    rows.append(AbsenceRequest(user_id=user.id, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE,
+                               start_date=date(year, 5, 27), end_date=date(year, 6, 4)))
+    db.add_all(rows)
+    db.commit()
+    user_id = user.id
+
+    def legacy_dashboard():
+        # Ancienne implémentation: get_user + listes en Python + 2 comptages
+        found = crud.get_user(db, user_id)
+        used = calculate_used_leave_days(db, user_id, year)
+        sick = calculate_sick_days(db, user_id, year)
+        pending = db.query(AbsenceRequest).filter(AbsenceRequest.user_id == user_id,
+                                                  AbsenceRequest.status == AbsenceStatus.EN_ATTENTE).count()
+        approved = db.query(AbsenceRequest).filter(AbsenceRequest.user_id == user_id,
+                                                   AbsenceRequest.status == AbsenceStatus.APPROUVE).count()
+        return found.annual_leave_days, used, sick, pending, approved
+
+    with query_counter() as legacy_statements:
+        started = time.perf_counter()
+        total, used, sick, pending, approved = legacy_dashboard()
+        legacy_elapsed = time.perf_counter() - started
+
+    with query_counter() as aggregate_statements:
+        started = time.perf_counter()
+        data = aggregate_dashboard_data(db, user_id, year)
+        aggregate_elapsed = time.perf_counter() - started
+
+    print(f"\ndashboard legacy: {len(legacy_statements)} requêtes {legacy_elapsed * 1000:.2f} ms, "
+          f"agrégée: {len(aggregate_statements)} requête {aggregate_elapsed * 1000:.2f} ms")
+    # get_user, congés, maladie (absences + déclarations), 2 comptages
+    assert len(legacy_statements) == 6
+    assert len(aggregate_statements) == 1
+    assert data.total_leave_days == total
+    assert data.used_leave_days == used
+    assert data.sick_days == sick
+    assert data.pending_requests == pending
+    assert data.approved_requests == approved
+
+def test_business_days_sql_matches_working_calendar(db: Session):
+    """La forme close SQL correspond au calendrier Python, fériés inclus"""
+    from datetime import timedelta
+    from sqlalchemy import select, literal
+    from app.crud import aggregates
+    from app.working_calendar import WorkingCalendar
+
+    calendar = WorkingCalendar.from_country("fr")
+    original = aggregates.working_calendar
+    aggregates.working_calendar = calendar
+    try:
+        origin = date(2024, 4, 25)
+        for start_offset in range(10):
+            for length in (0, 1, 4, 6, 13, 40):
+                start = origin + timedelta(days=start_offset)
+                end = start + timedelta(days=length)
+                expression = aggregates.business_days_sql(literal(start), literal(end), date(2024, 1, 1), date(2024, 12, 31))
+                assert db.execute(select(expression)).scalar() == calendar.business_days(start, end)
+    finally:
+        aggregates.working_calendar = original
@@ -0,0 +1,155 @@
+import pytest
+from datetime import date
+from sqlalchemy import and_, text
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import AbsenceRequest, SicknessDeclaration, AbsenceStatus, AbsenceType
+
+def explain(db: Session, query) -> str:
+    """Plan d'exécution SQLite d'une requête ORM"""
+    compiled = query.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+class TestCalendarIndexes:
+    def test_overlap_filter_matches_three_branch_predicate(self, db: Session):
+        """La forme indexable renvoie les mêmes absences que l'ancien OR à trois branches"""
+        periods = [
+            (date(2024, 5, 20), date(2024, 6, 2)),   # finit dans le mois
+            (date(2024, 6, 10), date(2024, 6, 12)),  # contenue dans le mois
+            (date(2024, 6, 28), date(2024, 7, 5)),   # commence dans le mois
+            (date(2024, 5, 1), date(2024, 7, 31)),   # couvre tout le mois
+            (date(2024, 4, 1), date(2024, 5, 31)),   # avant
+            (date(2024, 7, 1), date(2024, 7, 2)),    # après
+        ]
+        db.add_all([
+            AbsenceRequest(user_id=1, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE, start_date=start, end_date=end)
+            for start, end in periods
+        ])
+        db.commit()
+
+        start, end = date(2024, 6, 1), date(2024, 6, 30)
+        found = db.query(AbsenceRequest).filter(crud.overlap_filter(AbsenceRequest, start, end)).all()
+        assert sorted((r.start_date, r.end_date) for r in found) == sorted(periods[:4])
+
+    def test_user_calendar_query_uses_composite_index(self, db: Session):
+        """La requête du calendrier utilisateur passe par un index commençant par user_id"""
+        query = db.query(AbsenceRequest).filter(
+            and_(
+                AbsenceRequest.user_id == 1,
+                crud.overlap_filter(AbsenceRequest, date(2024, 1, 1), date(2024, 12, 31))
+            )
+        )
+        plan = explain(db, query)
+        # Sans statut ni type filtrés, l'index de pagination (user_id, created_at, id) est équivalent
+        assert "USING INDEX ix_absence_requests_user_" in plan and "(user_id=?)" in plan
+
+    def test_admin_calendar_queries_use_range_indexes(self, db: Session):
+        """Les requêtes du calendrier admin passent par l'index (start_date, end_date)"""
+        start, end = date(2024, 6, 1), date(2024, 6, 30)
+        absences = db.query(AbsenceRequest).filter(crud.overlap_filter(AbsenceRequest, start, end))
+        declarations = db.query(SicknessDeclaration).filter(crud.overlap_filter(SicknessDeclaration, start, end))
+
+        assert "ix_absence_requests_start_end" in explain(db, absences)
+        assert "ix_sickness_declarations_start_end" in explain(db, declarations)
+
+    def test_keyset_pagination_uses_created_index(self, db: Session):
+        """La page suivante d'un utilisateur passe par l'index (user_id, created_at, id)"""
+        from datetime import datetime
+        query = db.query(AbsenceRequest).filter(AbsenceRequest.user_id == 1)
+        cursor = crud.encode_cursor(datetime(2024, 6, 1, 12, 0), 42)
+        created_at, row_id = crud.decode_cursor(cursor)
+        assert (created_at, row_id) == (datetime(2024, 6, 1, 12, 0), 42)
+
+        from sqlalchemy import tuple_
+        page = query.filter(tuple_(AbsenceRequest.created_at, AbsenceRequest.id) < tuple_(created_at, row_id)).order_by(
+            AbsenceRequest.created_at.desc(), AbsenceRequest.id.desc()
+        ).limit(10)
+        assert "ix_absence_requests_user_created_id" in explain(db, page)
+
+class TestCalendarEvents:
+    def _seed(self, client, admin_token, user_token):
+        """Créer une absence et une déclaration de maladie pour l'utilisateur de test"""
+        headers = {"Authorization": f"Bearer {user_token}"}
+        response = client.post("/absence-requests/", json={
+            "type": "vacances",
+            "start_date": "2024-06-10",
+            "end_date": "2024-06-12",
+            "reason": "Congés d'été"
+        }, headers=headers)
+        assert response.status_code == 200
+
+        from tests.conftest import TestingSessionLocal
+        from app.models import User
+        db = TestingSessionLocal()
+        try:
+            user = db.query(User).filter(User.email == "user@test.com").first()
+            db.add(SicknessDeclaration(
+                user_id=user.id,
+                start_date=date(2024, 5, 28),
+                end_date=date(2024, 6, 3),
+                description="Grippe",
+                email_sent=True
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def test_event_rows_single_statement(self, client, admin_token, user_token, query_counter):
+        """Absences et déclarations sont lues en une seule requête, sans entités ORM"""
+        self._seed(client, admin_token, user_token)
+        from tests.conftest import TestingSessionLocal
+        db = TestingSessionLocal()
+        try:
+            with query_counter() as statements:
+                rows = crud.get_calendar_event_rows(db, date(2024, 6, 1), date(2024, 6, 30), active_users_only=True)
+            assert len(statements) == 1
+            assert sorted(row.event_source for row in rows) == [crud.ABSENCE_REQUEST, crud.SICKNESS_DECLARATION]
+            declaration = next(row for row in rows if row.event_source == crud.SICKNESS_DECLARATION)
+            assert declaration.type == AbsenceType.MALADIE
+            assert declaration.status == AbsenceStatus.APPROUVE
+            assert declaration.email_sent is True
+        finally:
+            db.close()
+
+    def test_admin_calendar(self, client, admin_token, user_token):
+        """Le calendrier admin construit les événements à partir des lignes légères"""
+        self._seed(client, admin_token, user_token)
+        response = client.get(
+            "/calendar/admin",
+            params={"year": 2024, "month": 6},
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+        assert response.status_code == 200
+        events = {event["event_source"]: event for event in response.json()}
+
+        absence = events["absence_request"]
+        assert absence["title"] == "User Test - Vacances (En attente)"
+        assert absence["reason"] == "Congés d'été"
+        assert absence["user_name"] == "User Test"
+
+        declaration = events["sickness_declaration"]
+        assert declaration["title"] == "User Test - Arrêt maladie ✉️"
+        assert declaration["start"] == "2024-06-01"  # Ajusté au début du mois
+        assert declaration["reason"] == "Grippe"
+        assert declaration["type"] == "maladie"
+
+    def test_user_calendar(self, client, admin_token, user_token):
+        """Le calendrier utilisateur n'affiche que ses propres événements"""
+        self._seed(client, admin_token, user_token)
+        response = client.get(
+            "/calendar/user",
+            params={"year": 2024},
+            headers={"Authorization": f"Bearer {user_token}"}
+        )
+        assert response.status_code == 200
+        titles = sorted(event["title"] for event in response.json())
+        assert titles == ["Arrêt maladie ✉️", "Vacances (En attente)"]
+
+        response = client.get(
+            "/calendar/user",
+            params={"year": 2024},
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+        assert response.json() == []
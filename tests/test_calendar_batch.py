@@ -0,0 +1,212 @@
+import json
+import time
+import threading
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from email.parser import Parser
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from googleapiclient.discovery import build
+
+from app import crud
+from app.models import AbsenceRequest, AbsenceType, AbsenceStatus, CalendarSyncRun, User, UserRole
+from app.calendar_sync_service import calendar_sync_service
+from app.google_calendar_service import google_calendar_service
+
+class FakeCalendarHttp:
+    """
+    Faux serveur Google Calendar (transport httplib2): répond aux requêtes batch multipart
+    et aux listes incrémentales (syncToken), avec une latence fixe par aller-retour,
+    et compte les allers-retours et événements
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.events = {}
+        self.changes = {}  # ID -> numéro de la dernière modification (syncToken)
+        self.sequence = 0
+        self.round_trips = 0
+        self.lock = threading.Lock()
+
+    def _touch(self, event_id: str, updated: datetime = None):
+        self.sequence += 1
+        self.changes[event_id] = self.sequence
+        updated = updated or datetime.now(timezone.utc)
+        self.events[event_id]["updated"] = updated.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+    def edit_remotely(self, event_id: str, **fields):
+        """Modification faite directement dans Google Calendar (après la synchronisation)"""
+        with self.lock:
+            self.events[event_id].update(fields)
+            self._touch(event_id, datetime.now(timezone.utc) + timedelta(minutes=5))
+
+    def delete_remotely(self, event_id: str):
+        with self.lock:
+            self.events[event_id]["status"] = "cancelled"
+            self._touch(event_id, datetime.now(timezone.utc) + timedelta(minutes=5))
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        time.sleep(self.latency)
+        with self.lock:
+            self.round_trips += 1
+        if method == "GET":
+            return self._list(uri)
+        assert "/batch/" in urlparse(uri).path, f"Appel hors batch: {method} {uri}"
+        content_type = {key.lower(): value for key, value in headers.items()}["content-type"]
+        message = Parser().parsestr(f"content-type: {content_type}\r\n\r\n{body}")
+        boundary = "fake-batch-response"
+        parts = []
+        for part in message.get_payload():
+            status, payload = self._handle(part.get_payload())
+            content_id = part["Content-ID"].strip("<>")
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(payload)}\r\n"
+            )
+        content = "".join(parts) + f"--{boundary}--"
+        response = httplib2.Response({"status": 200, "content-type": f"multipart/mixed; boundary={boundary}"})
+        return response, content.encode("utf-8")
+
+    def _list(self, uri: str):
+        query = parse_qs(urlparse(uri).query)
+        since = int(query.get("syncToken", ["0"])[0])
+        with self.lock:
+            items = [self.events[event_id] for event_id, sequence in self.changes.items() if sequence > since]
+            payload = {"items": items, "nextSyncToken": str(self.sequence)}
+        response = httplib2.Response({"status": 200, "content-type": "application/json; charset=UTF-8"})
+        return response, json.dumps(payload).encode("utf-8")
+
+    def _handle(self, http_request: str):
+        head, _, body = http_request.replace("\r\n", "\n").partition("\n\n")
+        method, path, _ = head.split("\n", 1)[0].split(" ", 2)
+        path = urlparse(path).path
+        with self.lock:
+            if method == "POST":
+                event = json.loads(body)
+                event_id = event.setdefault("id", f"auto{len(self.events)}")
+                if event_id in self.events:
+                    return "409 Conflict", {"error": {"code": 409, "message": "The requested identifier already exists."}}
+                self.events[event_id] = event
+                self._touch(event_id)
+                return "200 OK", event
+            event_id = path.rsplit("/", 1)[1]
+            if event_id not in self.events:
+                return "404 Not Found", {"error": {"code": 404, "message": "Not Found"}}
+            self.events[event_id] = {**json.loads(body), "id": event_id}
+            self._touch(event_id)
+            return "200 OK", self.events[event_id]
+
+@pytest.fixture
+def fake_calendar(monkeypatch):
+    http = FakeCalendarHttp()
+    monkeypatch.setattr(google_calendar_service, "service", build("calendar", "v3", http=http, static_discovery=True))
+    monkeypatch.setattr(google_calendar_service, "calendar_id", "primary")
+    monkeypatch.setattr(google_calendar_service, "credentials", None)
+    return http
+
+def _absences(db, count: int):
+    user = User(email="user@test.com", hashed_password="x", first_name="Jean", last_name="Dupont", role=UserRole.USER)
+    db.add(user)
+    db.commit()
+    db.add_all([
+        AbsenceRequest(
+            user_id=user.id, type=AbsenceType.VACANCES, status=AbsenceStatus.APPROUVE,
+            start_date=date(2030, 1, 1) + timedelta(days=i), end_date=date(2030, 1, 1) + timedelta(days=i)
+        )
+        for i in range(count)
+    ])
+    db.commit()
+
+def test_sync_uses_one_round_trip_per_50_events(fake_calendar, db, monkeypatch):
+    """Débit: 500 événements en 10 requêtes batch, envoyées en parallèle"""
+    _absences(db, 500)
+    fake_calendar.latency = 0.05
+    monkeypatch.setattr(google_calendar_service, "batch_concurrency", 5)
+
+    started = time.monotonic()
+    run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.SYNC)
+    elapsed = time.monotonic() - started
+
+    assert run.completed and run.absences_synced == 500 and run.absences_failed == 0
+    assert fake_calendar.round_trips == 10
+    assert len(fake_calendar.events) == 500
+    # 2 vagues de 5 batchs parallèles: au moins 10 fois plus rapide que 500 allers-retours (25 s) un par un
+    assert elapsed < 50 * fake_calendar.latency
+    assert db.query(AbsenceRequest).filter(AbsenceRequest.google_calendar_event_id.is_(None)).count() == 0
+
+def test_interrupted_sync_resumes_from_checkpoint(fake_calendar, db, monkeypatch):
+    """Un appel interrompu par le budget de temps reprend au point de reprise, sans doublon"""
+    _absences(db, 120)
+    monkeypatch.setattr(google_calendar_service, "batch_concurrency", 1)
+
+    run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.SYNC, time_budget=0)
+    assert not run.completed
+    assert run.absences_synced == 50
+
+    # Checkpoint perdu après l'envoi (timeout): le batch rejoué reçoit des 409 sur les ID idempotents
+    run.absence_cursor = 0
+    db.commit()
+    db.query(AbsenceRequest).update({AbsenceRequest.google_calendar_event_id: None})
+    db.commit()
+
+    while not run.completed:
+        run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.SYNC, time_budget=0)
+    assert db.query(CalendarSyncRun).count() == 1
+    assert len(fake_calendar.events) == 120
+    assert db.query(AbsenceRequest).filter(AbsenceRequest.google_calendar_event_id.is_(None)).count() == 0
+
+def test_resync_updates_existing_events(fake_calendar, db):
+    _absences(db, 60)
+    calendar_sync_service.run_full_sync(db, crud.calendar_sync.SYNC)
+    db.query(AbsenceRequest).update({AbsenceRequest.status: AbsenceStatus.REFUSE})
+    db.commit()
+    round_trips = fake_calendar.round_trips
+
+    run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.RESYNC)
+
+    assert run.completed and run.absences_synced == 60
+    assert fake_calendar.round_trips - round_trips == 2
+    assert len(fake_calendar.events) == 60
+    assert all(event["colorId"] == "4" for event in fake_calendar.events.values())
+
+def test_resync_skips_unchanged_events(fake_calendar, db):
+    """Resync incrémentale: aucun appel si aucune donnée n'a changé"""
+    _absences(db, 60)
+    calendar_sync_service.run_full_sync(db, crud.calendar_sync.SYNC)
+    absence = db.query(AbsenceRequest).order_by(AbsenceRequest.id).first()
+    absence.reason = "Motif modifié"
+    db.commit()
+    round_trips = fake_calendar.round_trips
+
+    run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.RESYNC)
+
+    assert run.absences_synced == 1 and run.absences_unchanged == 59
+    assert fake_calendar.round_trips - round_trips == 1
+    assert "Motif modifié" in fake_calendar.events[absence.google_calendar_event_id]["description"]
+
+    run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.RESYNC)
+    assert run.absences_synced == 0 and run.absences_unchanged == 60
+    assert fake_calendar.round_trips - round_trips == 1
+
+def test_pull_detects_remote_edits_and_deletions(fake_calendar, db):
+    """La passe syncToken fait renvoyer les événements modifiés et recréer les supprimés"""
+    _absences(db, 3)
+    calendar_sync_service.run_full_sync(db, crud.calendar_sync.SYNC)
+    assert calendar_sync_service.pull_remote_changes(db) == {"modified": 0, "deleted": 0}
+
+    edited, deleted, untouched = db.query(AbsenceRequest).order_by(AbsenceRequest.id).all()
+    edited_event, deleted_event = edited.google_calendar_event_id, deleted.google_calendar_event_id
+    fake_calendar.edit_remotely(edited_event, summary="Modifié à la main")
+    fake_calendar.delete_remotely(deleted_event)
+
+    assert calendar_sync_service.pull_remote_changes(db) == {"modified": 1, "deleted": 1}
+    # Seules les modifications depuis le syncToken précédent sont relues
+    assert calendar_sync_service.pull_remote_changes(db) == {"modified": 0, "deleted": 0}
+
+    run = calendar_sync_service.run_full_sync(db, crud.calendar_sync.RESYNC)
+    assert run.absences_synced == 2 and run.absences_unchanged == 1
+    assert fake_calendar.events[edited_event]["summary"] != "Modifié à la main"
+    db.refresh(deleted)
+    assert deleted.google_calendar_event_id not in (None, deleted_event)
+    assert fake_calendar.events[deleted.google_calendar_event_id].get("status") != "cancelled"
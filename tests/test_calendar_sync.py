@@ -0,0 +1,142 @@
+import pytest
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+from googleapiclient.errors import HttpError
+
+from app import crud
+from app.models import AbsenceRequest, AbsenceType, CalendarSyncJob, CalendarSyncStatus, User, UserRole
+from app.calendar_sync_service import calendar_sync_service
+from app.google_calendar_service import GoogleCalendarService, google_calendar_service
+
+REQUEST_DATA = {
+    "type": "vacances",
+    "start_date": "2030-07-01",
+    "end_date": "2030-07-05",
+    "reason": "Vacances d'été"
+}
+
+@pytest.fixture
+def calendar(monkeypatch):
+    """Google Calendar configuré, appels à l'API simulés; synchronisation uniquement via drain"""
+    monkeypatch.setattr(calendar_sync_service, "dispatch_mode", "cron")
+    fake = MagicMock()
+    fake.create_event.side_effect = lambda target, event_id=None: event_id
+    fake.update_event.return_value = True
+    fake.delete_event.return_value = True
+    with patch.object(google_calendar_service, "is_configured", return_value=True), \
+         patch.object(google_calendar_service, "is_enabled", return_value=True), \
+         patch.object(google_calendar_service, "create_event", fake.create_event), \
+         patch.object(google_calendar_service, "update_event", fake.update_event), \
+         patch.object(google_calendar_service, "delete_event", fake.delete_event):
+        yield fake
+
+def _absence(db) -> AbsenceRequest:
+    user = User(email="user@test.com", hashed_password="x", first_name="Jean", last_name="Dupont", role=UserRole.USER)
+    db.add(user)
+    db.commit()
+    absence = AbsenceRequest(user_id=user.id, type=AbsenceType.VACANCES, start_date=date(2030, 7, 1), end_date=date(2030, 7, 5))
+    db.add(absence)
+    db.commit()
+    return absence
+
+def test_writes_return_before_calendar_and_updates_are_coalesced(calendar, client, admin_token, user_token):
+    """La requête n'appelle pas Google; création puis modifications donnent un seul appel"""
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = client.post("/absence-requests/", json=REQUEST_DATA, headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 200
+    request_id = response.json()["id"]
+    for status in ("approuve", "refuse"):
+        response = client.put(f"/absence-requests/{request_id}/status", json={"status": status}, headers=headers)
+        assert response.status_code == 200
+    calendar.create_event.assert_not_called()
+
+    from tests.conftest import TestingSessionLocal
+    db = TestingSessionLocal()
+    try:
+        [job] = db.query(CalendarSyncJob).all()
+        assert job.revision == 2
+        assert calendar_sync_service.drain(db) == {"synced": 1, "failed": 0}
+
+        [call] = calendar.create_event.call_args_list
+        assert call.args[0].status.value == "refuse"  # État final de la demande
+        assert call.kwargs["event_id"] == job.idempotency_key
+        calendar.update_event.assert_not_called()
+        assert db.get(AbsenceRequest, request_id).google_calendar_event_id == job.idempotency_key
+        assert crud.get_calendar_sync_counts(db)["synchronise"] == 1
+    finally:
+        db.close()
+
+def test_new_absence_and_its_job_share_one_commit(calendar, db):
+    """L'absence créée et son job de synchronisation sont validés, ou abandonnés, ensemble"""
+    from app import schemas
+    user = User(email="user@test.com", hashed_password="x", first_name="Jean", last_name="Dupont", role=UserRole.USER)
+    db.add(user)
+    db.commit()
+    request = schemas.AbsenceRequestCreate(type=AbsenceType.VACANCES, start_date=date(2030, 7, 1), end_date=date(2030, 7, 5))
+
+    absence = crud.add_absence_request(db, request, user.id)
+    calendar_sync_service.request(db, absence)
+    db.rollback()  # Interruption avant le commit
+    assert db.query(AbsenceRequest).count() == 0
+    assert db.query(CalendarSyncJob).count() == 0
+
+    absence = crud.add_absence_request(db, request, user.id)
+    calendar_sync_service.request(db, absence)
+    db.commit()
+    [job] = db.query(CalendarSyncJob).all()
+    assert job.target_id == absence.id
+    assert job.idempotency_key == crud.calendar_idempotency_key(absence)
+
+def test_failed_sync_is_retried_with_backoff(calendar, db):
+    absence = _absence(db)
+    crud.enqueue_calendar_sync(db, absence)
+    db.commit()
+    calendar.create_event.side_effect = None
+    calendar.create_event.return_value = None
+
+    assert calendar_sync_service.drain(db) == {"synced": 0, "failed": 1}
+    job = db.query(CalendarSyncJob).one()
+    assert job.status == CalendarSyncStatus.EN_ATTENTE
+    assert job.next_attempt_at > datetime.utcnow()
+    # Pas de nouvelle tentative avant l'échéance
+    assert calendar_sync_service.drain(db) == {"synced": 0, "failed": 0}
+
+def test_delete_replaces_pending_creation(calendar, db):
+    """Une suppression regroupée avec une création en attente supprime l'ID idempotent"""
+    absence = _absence(db)
+    crud.enqueue_calendar_sync(db, absence)
+    crud.enqueue_calendar_sync(db, absence, crud.calendar_sync.DELETE)
+    db.commit()
+
+    assert calendar_sync_service.drain(db) == {"synced": 1, "failed": 0}
+    calendar.create_event.assert_not_called()
+    calendar.delete_event.assert_called_once_with(crud.calendar_idempotency_key(absence))
+
+def test_change_during_sync_is_not_lost(calendar, db):
+    """Une modification regroupée pendant l'appel à Google relance le job"""
+    absence = _absence(db)
+    job = crud.enqueue_calendar_sync(db, absence)
+    db.commit()
+    [due] = crud.get_due_calendar_sync_jobs(db)
+    assert crud.claim_calendar_sync_job(db, due)
+
+    revision = job.revision
+    crud.enqueue_calendar_sync(db, absence)
+    db.commit()
+    assert crud.mark_calendar_sync_done(db, job, revision) is False
+    assert job.status == CalendarSyncStatus.EN_ATTENTE
+    assert crud.get_due_calendar_sync_jobs(db) == [job]
+
+def test_replayed_creation_returns_existing_event():
+    """Un 409 sur l'ID idempotent signifie que la première tentative a abouti"""
+    service = GoogleCalendarService.__new__(GoogleCalendarService)
+    service.calendar_id = "primary"
+    service.service = MagicMock()
+    service.service.events.return_value.insert.return_value.execute.side_effect = HttpError(
+        MagicMock(status=409, reason="Conflict"), b'{"error": {"message": "The requested identifier already exists."}}'
+    )
+    service._build_event_data = MagicMock(return_value={"summary": "Absence"})
+
+    assert service.create_event(MagicMock(), event_id="0123abcd") == "0123abcd"
+    body = service.service.events.return_value.insert.call_args.kwargs["body"]
+    assert body["id"] == "0123abcd"
@@ -0,0 +1,109 @@
+"""
+Démarrage à froid de api/index.py: chaque mesure importe l'application dans un nouveau processus
+"""
+import os
+import sys
+import base64
+import json
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budget d'import de api/index.py (cumul mesuré par python -X importtime)
+IMPORT_BUDGET_MS = float(os.getenv("COLD_START_IMPORT_BUDGET_MS", "100"))
+
+def _env() -> dict:
+    return {
+        **os.environ,
+        "ENVIRONMENT": "test",
+        # Configuration présente: le client ne doit pourtant pas être construit à l'import
+        "GOOGLE_CALENDAR_CREDENTIALS": base64.b64encode(json.dumps({"type": "service_account"}).encode()).decode(),
+        "GOOGLE_CALENDAR_ID": "primary"
+    }
+
+def _run(code: str) -> str:
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=_env(), capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+def _import_times(module: str) -> dict:
+    """Durée cumulée d'import (ms) de chaque module chargé par l'import de module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+def _import_seconds(after_import: str = "") -> float:
+    """Durée de l'import de l'application (plus le code after_import), meilleure de 3 mesures"""
+    code = (
+        "import time\n"
+        "started = time.perf_counter()\n"
+        "import app.main\n"
+        f"{after_import}\n"
+        "print(time.perf_counter() - started)"
+    )
+    return min(float(_run(code)) for _ in range(3))
+
+def test_entry_point_import_budget():
+    """api/index.py ne charge pas l'application: son import reste sous le budget"""
+    times = _import_times("api.index")
+    assert "app.main" not in times and "sqlalchemy" not in times
+    assert times["api.index"] <= IMPORT_BUDGET_MS, f"Import de api/index.py: {times['api.index']:.0f} ms"
+
+def test_heavy_services_are_not_loaded_at_import():
+    """Client Google et moteur de modèles d'email initialisés au premier usage"""
+    loaded = _run(
+        "import sys, app.main\n"
+        "print(sorted(name for name in ('googleapiclient.discovery', 'google.oauth2.service_account', 'jinja2') "
+        "if name in sys.modules))"
+    )
+    assert loaded == "[]"
+
+def test_entry_point_serves_health_then_application():
+    import api.index
+
+    client = TestClient(api.index.app)
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "OK", "environment": "test"}
+    # Toute autre requête est servie par l'application FastAPI
+    assert client.get("/does-not-exist").status_code == 404
+    assert api.index.get_application() is api.index.get_application()
+
+def test_ephemeral_sqlite_fallback_is_initialized_once(tmp_path, monkeypatch):
+    """Repli SQLite de production (propre à l'instance): schéma et administrateur créés au chargement"""
+    import init_db
+    from sqlalchemy import create_engine, inspect
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'absences.db'}")
+    admins = []
+    monkeypatch.setattr(init_db, "engine", engine)
+    monkeypatch.setattr(init_db, "ENVIRONMENT", "production")
+    monkeypatch.setattr(init_db, "create_admin_user", lambda: admins.append(True))
+
+    init_db.init_ephemeral_db()
+    assert inspect(engine).has_table("users") and admins == [True]
+    init_db.init_ephemeral_db()
+    assert admins == [True]
+
+@pytest.mark.benchmark
+def test_cold_start_benchmark():
+    """Gain de l'initialisation différée: import seul contre import + construction du client Calendar"""
+    lazy = _import_seconds()
+    eager = _import_seconds(
+        "from google.auth.credentials import AnonymousCredentials\n"
+        "from app.google_calendar_service import google_calendar_service\n"
+        "google_calendar_service._build_service(AnonymousCredentials())"
+    )
+    print(f"\nImport de l'application: {lazy * 1000:.0f} ms (avec client Google Calendar: {eager * 1000:.0f} ms, "
+          f"gain {(eager - lazy) * 1000:.0f} ms)")
+    assert lazy < eager
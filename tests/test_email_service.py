@@ -0,0 +1,96 @@
+import smtplib
+import pytest
+from unittest.mock import patch
+
+from app.email_service import EmailService
+
+class FakeSMTP:
+    """Serveur SMTP simulé: compte les connexions, handshakes et messages"""
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.logins = 0
+        self.sent = []
+        self.alive = True
+        self.fail_next_send = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        self.logins += 1
+
+    def noop(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("Connexion fermée")
+        return (250, b"OK")
+
+    def send_message(self, msg):
+        if not self.alive or self.fail_next_send:
+            self.fail_next_send = False
+            raise smtplib.SMTPServerDisconnected("Connexion fermée")
+        self.sent.append(msg["Subject"])
+
+    def quit(self):
+        self.alive = False
+
+    def close(self):
+        self.alive = False
+
+@pytest.fixture
+def smtp_service(monkeypatch):
+    """EmailService configuré en SMTP sur le serveur simulé"""
+    FakeSMTP.instances = []
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setenv("SMTP_USERNAME", "expediteur@test.com")
+    monkeypatch.setenv("SMTP_PASSWORD", "secret")
+    monkeypatch.setenv("EMAIL_FROM", "expediteur@test.com")
+    monkeypatch.delenv("RESEND_API_KEY", raising=False)
+    return EmailService()
+
+def test_smtp_session_is_reused_between_emails(smtp_service):
+    """Une seule connexion TLS + login pour plusieurs emails successifs"""
+    for i in range(3):
+        assert smtp_service.send_email(["a@test.com"], f"Sujet {i}", "Corps")
+
+    assert len(FakeSMTP.instances) == 1
+    assert FakeSMTP.instances[0].logins == 1
+    assert len(FakeSMTP.instances[0].sent) == 3
+
+def test_dead_session_is_replaced_after_noop(smtp_service):
+    """Une session coupée pendant l'inactivité est détectée par NOOP et remplacée"""
+    assert smtp_service.send_email(["a@test.com"], "Premier", "Corps")
+    FakeSMTP.instances[0].alive = False
+
+    assert smtp_service.send_email(["a@test.com"], "Second", "Corps")
+    assert len(FakeSMTP.instances) == 2
+    assert FakeSMTP.instances[1].sent == ["Gestion des absences - Second"]
+
+def test_disconnect_during_send_reconnects_once(smtp_service):
+    """Une déconnexion pendant l'envoi déclenche une reconnexion et un nouvel essai"""
+    assert smtp_service.send_email(["a@test.com"], "Premier", "Corps")
+    FakeSMTP.instances[0].fail_next_send = True
+
+    assert smtp_service.send_email(["a@test.com"], "Second", "Corps")
+    assert len(FakeSMTP.instances) == 2
+
+def test_send_many_uses_one_session(smtp_service):
+    """send_many envoie toute la rafale sur une seule session, même si le pool est vide"""
+    smtp_service._smtp_pool.max_size = 0  # Sans épinglage, chaque envoi rouvrirait une session
+    messages = [
+        {"to_emails": [f"admin{i}@test.com"], "subject": f"Notification {i}", "body": "Corps"}
+        for i in range(5)
+    ]
+    assert smtp_service.send_many(messages) == [True] * 5
+    assert len(FakeSMTP.instances) == 1
+    assert len(FakeSMTP.instances[0].sent) == 5
+
+def test_pool_expires_idle_sessions(smtp_service):
+    """Une session inactive trop longtemps est fermée plutôt que réutilisée"""
+    smtp_service._smtp_pool.max_idle = 0
+    assert smtp_service.send_email(["a@test.com"], "Premier", "Corps")
+    with patch("app.email_service.time.monotonic", return_value=10**9):
+        assert smtp_service.send_email(["a@test.com"], "Second", "Corps")
+    assert len(FakeSMTP.instances) == 2
+    assert FakeSMTP.instances[0].alive is False
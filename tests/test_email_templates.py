@@ -0,0 +1,108 @@
+import time
+from unittest.mock import patch
+from jinja2 import Environment, Template
+
+from app.email_templates import EmailTemplateRegistry, TEMPLATES, email_templates
+from app.email_service import EmailService
+
+ABSENCE_CONTEXT = dict(
+    user_name="Jean Dupont", absence_type="vacances", start_date="2024-07-01",
+    end_date="2024-07-05", reason="Congés d'été", request_id=12
+)
+
+def test_all_notifications_are_registered():
+    """Chaque notification a son modèle compilé au démarrage"""
+    for name in (
+        "absence_request", "absence_status", "absence_modification", "absence_deletion",
+        "admin_absence", "sickness_declaration", "sickness_viewed", "user_created", "user_updated"
+    ):
+        assert name in email_templates
+
+def test_templates_are_compiled_once(monkeypatch):
+    """Compilation au premier rendu uniquement, puis réutilisation des modèles compilés"""
+    calls = []
+    original_compile = Environment.compile
+
+    def counting_compile(self, *args, **kwargs):
+        calls.append(args)
+        return original_compile(self, *args, **kwargs)
+
+    monkeypatch.setattr(Environment, "compile", counting_compile)
+    registry = EmailTemplateRegistry()
+    assert calls == []
+    registry.render("absence_modification", **ABSENCE_CONTEXT)
+    compiled = len(calls)
+    for _ in range(10):
+        registry.render("absence_modification", **ABSENCE_CONTEXT)
+
+    assert compiled == 3 * len(TEMPLATES)
+    assert len(calls) == compiled
+
+def test_render_content():
+    """Sujet, texte et HTML contiennent les informations de la notification"""
+    subject, body, html_body = email_templates.render("absence_request", **dict(ABSENCE_CONTEXT, reason=None))
+
+    assert subject == "Nouvelle demande d'absence - Jean Dupont"
+    assert "Type : vacances" in body
+    assert "Raison : Non spécifiée" in body
+    assert "<li><strong>Début :</strong> 2024-07-01</li>" in html_body
+    assert "Système de gestion des absences" in body and "<br>Système de gestion des absences" in html_body
+
+def test_optional_comment():
+    """Le commentaire de l'administrateur n'apparaît que s'il est fourni"""
+    context = dict(user_name="Jean", absence_type="vacances", status_text="approuvée")
+    _, body, html_body = email_templates.render("absence_status", admin_comment=None, **context)
+    assert "Commentaire" not in body and "Commentaire" not in html_body
+
+    _, body, html_body = email_templates.render("absence_status", admin_comment="Bon repos", **context)
+    assert "Commentaire de l'administrateur : Bon repos" in body
+    assert "Bon repos</p>" in html_body
+
+def test_html_values_are_escaped():
+    """Les valeurs saisies par les utilisateurs sont échappées dans le HTML uniquement"""
+    _, body, html_body = email_templates.render("absence_request", **dict(ABSENCE_CONTEXT, reason="<script>x</script>"))
+    assert "<script>" in body
+    assert "<script>" not in html_body
+    assert "&lt;script&gt;" in html_body
+
+def test_subject_cache_keys_on_subject_variables():
+    """Le cache des sujets ne dépend que des variables du sujet"""
+    registry = EmailTemplateRegistry()
+    for day in range(1, 6):
+        registry.render("absence_request", **dict(ABSENCE_CONTEXT, start_date=f"2024-07-0{day}"))
+
+    info = registry.subject_cache_info()
+    assert info.misses == 1
+    assert info.hits == 4
+
+def test_notification_uses_registry():
+    """Les notifications du service email passent par le registre de modèles"""
+    service = EmailService()
+    with patch.object(service, "send_email", return_value=True) as send_email:
+        service.send_sickness_declaration_viewed_notification("a@test.com", "Jean", "2024-07-01", "2024-07-02", "Admin")
+
+    to_emails, subject, body, html_body = send_email.call_args.args
+    assert to_emails == ["a@test.com"]
+    assert subject == "Déclaration de maladie consultée - Jean"
+    assert "consultée par l'administrateur Admin" in body
+    assert "<strong>Admin</strong>" in html_body
+
+def test_render_throughput_benchmark():
+    """Débit de rendu: modèles précompilés vs compilation à chaque envoi"""
+    count = 300
+    subject_source, text_source, html_source = TEMPLATES["absence_modification"]
+
+    started = time.perf_counter()
+    for _ in range(count):
+        for source in (subject_source, text_source, html_source):
+            Template(source, autoescape=source is html_source).render(ABSENCE_CONTEXT, signature="")
+    uncompiled = time.perf_counter() - started
+
+    registry = EmailTemplateRegistry()
+    started = time.perf_counter()
+    for _ in range(count):
+        registry.render("absence_modification", **ABSENCE_CONTEXT)
+    compiled = time.perf_counter() - started
+
+    print(f"\nRendu email: {count / uncompiled:.0f}/s en compilant, {count / compiled:.0f}/s précompilé")
+    assert compiled < uncompiled
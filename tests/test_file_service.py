@@ -0,0 +1,87 @@
+import io
+import os
+import asyncio
+import hashlib
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.file_service import FileService
+
+class CountingStream(io.BytesIO):
+    """Flux d'upload qui mesure la quantité lue et la taille des lectures"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+        self.largest_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        self.largest_read = max(self.largest_read, len(chunk))
+        return chunk
+
+@pytest.fixture
+def file_service(tmp_path, monkeypatch):
+    monkeypatch.setenv("UPLOAD_DIR", str(tmp_path / "uploads"))
+    return FileService()
+
+def _stored_files(file_service):
+    return sorted(str(path) for path in file_service.upload_dir.rglob("*") if path.is_file())
+
+def _upload(data: bytes, filename: str = "certificat.pdf"):
+    stream = CountingStream(data)
+    return UploadFile(stream, filename=filename), stream
+
+def test_save_pdf_streams_and_hashes(file_service):
+    """Le fichier est copié par morceaux, haché au fil de l'eau et renommé dans upload_dir"""
+    data = b"%PDF-1.4\n" + os.urandom(3 * 1024 * 1024)
+    upload, stream = _upload(data)
+
+    filename, file_path, sha256 = asyncio.run(file_service.save_pdf(upload))
+
+    assert filename == "certificat.pdf"
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    with open(file_path, "rb") as f:
+        assert f.read() == data
+    assert stream.largest_read <= file_service.chunk_size
+    # Stocké sous son empreinte, aucun fichier temporaire ne reste dans le répertoire
+    assert file_path == str(file_service.upload_dir / sha256[:2] / f"{sha256}.pdf")
+    assert _stored_files(file_service) == [file_path]
+
+def test_oversize_upload_is_aborted_early(file_service):
+    """Un fichier trop volumineux est refusé dès le dépassement, sans lire la suite"""
+    file_service.max_file_size = 1024 * 1024
+    upload, stream = _upload(os.urandom(5 * 1024 * 1024))
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(file_service.save_pdf(upload))
+
+    assert exc_info.value.status_code == 400
+    assert stream.bytes_read <= file_service.max_file_size + file_service.chunk_size
+    assert _stored_files(file_service) == []
+
+def test_file_at_size_limit_is_accepted(file_service):
+    file_service.max_file_size = 256 * 1024
+    upload, _ = _upload(os.urandom(256 * 1024))
+
+    _, file_path, _ = asyncio.run(file_service.save_pdf(upload))
+    assert os.path.getsize(file_path) == 256 * 1024
+
+def test_non_pdf_is_rejected(file_service):
+    upload, stream = _upload(b"texte", filename="notes.txt")
+
+    with pytest.raises(HTTPException):
+        asyncio.run(file_service.save_pdf(upload))
+    assert stream.bytes_read == 0
+
+def test_identical_uploads_are_stored_once(file_service):
+    """Un même certificat envoyé deux fois n'occupe qu'un fichier"""
+    data = b"%PDF-1.4\n" + os.urandom(100 * 1024)
+
+    _, first_path, first_sha = asyncio.run(file_service.save_pdf(_upload(data, "arret.pdf")[0]))
+    _, second_path, second_sha = asyncio.run(file_service.save_pdf(_upload(data, "copie.pdf")[0]))
+
+    assert first_sha == second_sha
+    assert first_path == second_path
+    assert _stored_files(file_service) == [first_path]
@@ -0,0 +1,197 @@
+import pytest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models import NotificationOutbox, NotificationStatus, SicknessDeclaration, User, UserRole
+from app.notification_service import notification_service
+
+REQUEST_DATA = {
+    "type": "vacances",
+    "start_date": "2030-07-01",
+    "end_date": "2030-07-05",
+    "reason": "Vacances d'été"
+}
+
+def _outbox(db: Session, notification: str):
+    return db.query(NotificationOutbox).filter(NotificationOutbox.notification == notification).all()
+
+@patch('app.email_service.email_service.send_absence_request_notification', return_value=True)
+def test_request_writes_outbox_and_delivers_after_response(mock_email, client, user_token):
+    """La demande enregistre la notification dans l'outbox, envoyée ensuite en tâche de fond"""
+    response = client.post("/absence-requests/", json=REQUEST_DATA, headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 200
+
+    mock_email.assert_called_once()
+    assert mock_email.call_args[1]["absence_type"] == "vacances"
+    assert "hello.obvious@gmail.com" in mock_email.call_args[1]["admin_emails"]
+
+    from tests.conftest import TestingSessionLocal
+    db = TestingSessionLocal()
+    try:
+        [entry] = _outbox(db, "absence_request_notification")
+        assert entry.status == NotificationStatus.ENVOYE
+        assert entry.attempts == 1 and entry.sent_at is not None
+    finally:
+        db.close()
+
+@patch('app.email_service.email_service.send_absence_request_notification')
+def test_cron_dispatch_keeps_email_out_of_request(mock_email, client, user_token, monkeypatch):
+    """En mode cron, la requête n'envoie rien: le drain du cron livre la notification"""
+    monkeypatch.setattr(notification_service, "dispatch_mode", "cron")
+    monkeypatch.setenv("CRON_SECRET", "secret-de-test")
+
+    response = client.post("/absence-requests/", json=REQUEST_DATA, headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 200
+    mock_email.assert_not_called()
+
+    assert client.get("/notifications/drain").status_code == 401
+    response = client.get("/notifications/drain", headers={"Authorization": "Bearer secret-de-test"})
+    assert response.status_code == 200
+    assert response.json()["sent"] == 1
+    assert response.json()["outbox"]["envoye"] == 1
+    mock_email.assert_called_once()
+
+def test_failed_delivery_is_retried_with_backoff(db: Session):
+    """Un échec replanifie l'envoi avec un délai croissant, puis abandonne"""
+    crud.enqueue_notification(db, "user_created_notification", user_email="a@test.com", user_name="A B")
+    db.commit()
+
+    with patch('app.email_service.email_service.send_user_created_notification', return_value=False) as mock_email:
+        delays = []
+        for attempt in range(crud.notifications.MAX_NOTIFICATION_ATTEMPTS):
+            assert notification_service.drain(db) == {"sent": 0, "failed": 1}
+            entry = db.query(NotificationOutbox).one()
+            if entry.status == NotificationStatus.EN_ATTENTE:
+                delays.append(entry.next_attempt_at - datetime.utcnow())
+                # Pas de nouvelle tentative avant l'échéance
+                assert notification_service.drain(db) == {"sent": 0, "failed": 0}
+                entry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+                db.commit()
+
+    assert mock_email.call_count == crud.notifications.MAX_NOTIFICATION_ATTEMPTS
+    assert entry.status == NotificationStatus.ECHEC
+    assert entry.last_error
+    assert all(later > earlier for earlier, later in zip(delays, delays[1:]))
+
+def test_sickness_email_marks_declaration_on_delivery(db: Session):
+    """La déclaration n'est marquée envoyée qu'une fois l'email livré"""
+    user = User(email="malade@test.com", hashed_password="x", first_name="Jean", last_name="Dupont", role=UserRole.USER)
+    db.add(user)
+    db.commit()
+    declaration = SicknessDeclaration(user_id=user.id, start_date=date(2030, 1, 6), end_date=date(2030, 1, 8))
+    db.add(declaration)
+    db.commit()
+
+    crud.enqueue_notification(
+        db, "sickness_declaration_email",
+        sickness_declaration_id=declaration.id,
+        user_name="Jean Dupont",
+        to_emails=["malade@test.com"],
+        start_date=str(declaration.start_date),
+        end_date=str(declaration.end_date)
+    )
+    db.commit()
+    db.refresh(declaration)
+    assert declaration.email_sent is False
+
+    with patch('app.email_service.email_service.send_sickness_declaration_email', return_value=True) as mock_email:
+        assert notification_service.drain(db) == {"sent": 1, "failed": 0}
+    assert mock_email.call_args[1]["to_emails"] == ["malade@test.com"]
+    db.refresh(declaration)
+    assert declaration.email_sent is True
+
+def test_claim_prevents_double_delivery(db: Session):
+    """Une notification réservée par un worker n'est pas reprise par un autre"""
+    from tests.conftest import TestingSessionLocal
+    crud.enqueue_notification(db, "user_created_notification", user_email="a@test.com", user_name="A B")
+    db.commit()
+
+    other = TestingSessionLocal()
+    try:
+        [first] = crud.get_due_notifications(db)
+        [second] = crud.get_due_notifications(other)  # Même notification vue par un second worker
+        assert crud.claim_notification(db, first) is True
+        assert crud.claim_notification(other, second) is False
+    finally:
+        other.close()
+    assert crud.get_due_notifications(db) == []
+
+def test_failed_sickness_upload_leaves_no_email(client, user_token, tmp_path, monkeypatch):
+    """Une erreur après l'enregistrement du fichier supprime la déclaration sans laisser d'email dans l'outbox"""
+    from app.file_service import FileService
+    from app.calendar_sync_service import calendar_sync_service
+    from app.routes import sickness_declarations
+    from tests.conftest import TestingSessionLocal
+
+    monkeypatch.setenv("UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(sickness_declarations, "file_service", FileService())
+    with patch.object(calendar_sync_service, "request", side_effect=RuntimeError("calendrier indisponible")):
+        response = client.post(
+            "/sickness-declarations/",
+            data={"start_date": "2030-01-06", "end_date": "2030-01-08"},
+            files={"pdf_file": ("arret.pdf", b"%PDF-1.4 arret", "application/pdf")},
+            headers={"Authorization": f"Bearer {user_token}"}
+        )
+    assert response.status_code == 400
+
+    db = TestingSessionLocal()
+    try:
+        assert db.query(SicknessDeclaration).count() == 0
+        assert _outbox(db, "sickness_declaration_email") == []
+    finally:
+        db.close()
+
+@patch('app.email_service.email_service.send_sickness_declaration_email', return_value=True)
+def test_resend_declaration_email_goes_through_outbox(mock_email, client, admin_token, tmp_path):
+    """Le renvoi de l'email passe par l'outbox et est livré après la réponse"""
+    from tests.conftest import TestingSessionLocal
+    pdf_path = tmp_path / "arret.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 arret")
+
+    db = TestingSessionLocal()
+    try:
+        user = User(email="malade@test.com", hashed_password="x", first_name="Jean", last_name="Dupont", role=UserRole.USER)
+        db.add(user)
+        db.commit()
+        declaration = SicknessDeclaration(
+            user_id=user.id, start_date=date(2030, 1, 6), end_date=date(2030, 1, 8),
+            pdf_filename="arret.pdf", pdf_path=str(pdf_path)
+        )
+        db.add(declaration)
+        db.commit()
+        declaration_id = declaration.id
+    finally:
+        db.close()
+
+    response = client.post(f"/sickness-declarations/{declaration_id}/resend-email", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+
+    mock_email.assert_called_once()
+    assert "malade@test.com" in mock_email.call_args[1]["to_emails"]
+    assert mock_email.call_args[1]["pdf_path"] == str(pdf_path)
+
+    db = TestingSessionLocal()
+    try:
+        [entry] = _outbox(db, "sickness_declaration_email")
+        assert entry.status == NotificationStatus.ENVOYE
+        assert db.get(SicknessDeclaration, declaration_id).email_sent is True
+    finally:
+        db.close()
+
+def test_deleting_declaration_cancels_pending_email(db: Session):
+    user = User(email="malade@test.com", hashed_password="x", first_name="Jean", last_name="Dupont", role=UserRole.USER)
+    db.add(user)
+    db.commit()
+    declaration = SicknessDeclaration(user_id=user.id, start_date=date(2030, 1, 6), end_date=date(2030, 1, 8))
+    db.add(declaration)
+    db.commit()
+    crud.enqueue_notification(db, "sickness_declaration_email", sickness_declaration_id=declaration.id, to_emails=["malade@test.com"])
+    db.commit()
+
+    assert crud.delete_sickness_declaration(db, declaration.id) is True
+    [entry] = _outbox(db, "sickness_declaration_email")
+    db.refresh(entry)
+    assert entry.status == NotificationStatus.ECHEC
+    assert crud.get_due_notifications(db) == []
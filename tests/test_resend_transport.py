@@ -0,0 +1,149 @@
+import os
+import json
+import base64
+import time
+import asyncio
+import threading
+import httpx
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.email_service import EmailService
+
+class ResendStubHandler(BaseHTTPRequestHandler):
+    """Stub local de l'API Resend (HTTP/1.1 keep-alive)"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append((self.path, payload))
+            server.connections.add(self.client_address)
+        if server.delay:
+            time.sleep(server.delay)
+        if self.path == "/emails/batch":
+            body = json.dumps({"data": [{"id": f"batch-{i}"} for i in range(len(payload))]})
+        else:
+            body = json.dumps({"id": "email"})
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body.encode())
+        except BrokenPipeError:
+            pass  # Client parti après son timeout
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def resend_stub():
+    """Serveur Resend local: requêtes reçues et connexions TCP distinctes"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ResendStubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.connections = set()
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def resend_service(resend_stub, monkeypatch):
+    monkeypatch.setenv("RESEND_API_KEY", "re_test")
+    monkeypatch.setenv("RESEND_API_URL", resend_stub.url)
+    return EmailService()
+
+def test_resend_connection_is_kept_alive(resend_service, resend_stub):
+    """Les envois successifs réutilisent la même connexion HTTP"""
+    for i in range(20):
+        assert resend_service.send_email(["a@test.com"], f"Sujet {i}", "Corps")
+
+    assert len(resend_stub.requests) == 20
+    assert len(resend_stub.connections) == 1
+    path, payload = resend_stub.requests[0]
+    assert path == "/emails"
+    assert payload["subject"] == "Gestion des absences - Sujet 0"
+
+def test_send_many_uses_batch_endpoint(resend_service, resend_stub, tmp_path):
+    """Des messages distincts partent en un appel batch; les pièces jointes via /emails"""
+    attachment = tmp_path / "arret.pdf"
+    attachment.write_bytes(b"%PDF-1.4 test")
+    messages = [
+        {"to_emails": [f"admin{i}@test.com"], "subject": f"Notification {i}", "body": "Corps"}
+        for i in range(3)
+    ]
+    messages.append({"to_emails": ["rh@test.com"], "subject": "Arrêt", "body": "Corps", "attachment_path": str(attachment)})
+
+    assert resend_service.send_many(messages) == [True] * 4
+    paths = sorted(path for path, _ in resend_stub.requests)
+    assert paths == ["/emails", "/emails/batch"]
+    batch = next(payload for path, payload in resend_stub.requests if path == "/emails/batch")
+    assert [email["to"] for email in batch] == [["admin0@test.com"], ["admin1@test.com"], ["admin2@test.com"]]
+
+def test_attachment_is_streamed(resend_service, resend_stub, tmp_path):
+    """La pièce jointe est encodée au fil de l'envoi et arrive intacte"""
+    data = os.urandom(300 * 1024)
+    attachment = tmp_path / "arret.pdf"
+    attachment.write_bytes(data)
+
+    assert resend_service.send_email_with_attachment(["rh@test.com"], "Arrêt", "Corps", attachment_path=str(attachment))
+    path, payload = resend_stub.requests[0]
+    assert path == "/emails"
+    assert payload["attachments"][0]["filename"] == "arret.pdf"
+    assert base64.b64decode(payload["attachments"][0]["content"]) == data
+
+def test_send_many_async(resend_service, resend_stub):
+    """send_many_async utilise le client partagé de la boucle courante"""
+    messages = [{"to_emails": [f"u{i}@test.com"], "subject": "S", "body": "B"} for i in range(250)]
+
+    async def send():
+        try:
+            return await resend_service.send_many_async(messages)
+        finally:
+            await resend_service.resend_transport.aclose()
+
+    assert asyncio.run(send()) == [True] * 250
+    # 100 emails maximum par appel batch
+    assert sorted(len(payload) for _, payload in resend_stub.requests) == [50, 100, 100]
+
+def test_hung_connection_times_out(resend_stub, monkeypatch):
+    """Un serveur qui ne répond pas ne bloque pas l'envoi au-delà du timeout"""
+    monkeypatch.setenv("RESEND_API_KEY", "re_test")
+    monkeypatch.setenv("RESEND_API_URL", resend_stub.url)
+    monkeypatch.setenv("RESEND_TIMEOUT", "0.2")
+    service = EmailService()
+    resend_stub.delay = 2
+
+    started = time.perf_counter()
+    assert service.send_email(["a@test.com"], "Sujet", "Corps") is False
+    assert time.perf_counter() - started < 1.5
+
+def test_resend_throughput_benchmark(resend_service, resend_stub):
+    """Débit d'envoi: client partagé vs une connexion par requête (ancien requests.post)"""
+    count = 100
+
+    started = time.perf_counter()
+    for i in range(count):
+        response = httpx.post(f"{resend_stub.url}/emails", json={"to": ["a@test.com"], "subject": str(i)})
+        assert response.status_code == 200
+    unpooled = time.perf_counter() - started
+    unpooled_connections = len(resend_stub.connections)
+
+    resend_stub.connections.clear()
+    started = time.perf_counter()
+    for i in range(count):
+        assert resend_service.send_email(["a@test.com"], str(i), "Corps")
+    pooled = time.perf_counter() - started
+
+    print(f"\nResend stub: {count / unpooled:.0f} emails/s sans pool, {count / pooled:.0f} emails/s avec client partagé")
+    assert unpooled_connections == count
+    assert len(resend_stub.connections) == 1
+    assert pooled < unpooled
@@ -12,6 +12,7 @@ from app.crud import (
     mark_sickness_declaration_viewed
 )
 from app.models import User, SicknessDeclaration, UserRole
+from app import auth
 from app.auth import get_password_hash
 
 def test_create_sickness_declaration(db: Session):
@@ -220,4 +221,152 @@ def test_get_sickness_declaration_not_found(db: Session):
 def test_update_sickness_declaration_file_not_found(db: Session):
     """Test de mise à jour d'une déclaration inexistante"""
     updated = update_sickness_declaration_file(db, 999, "test.pdf", "/test.pdf")
-    assert updated is None 
\ No newline at end of file
+    assert updated is None
+
+
+def test_list_sickness_declarations_constant_queries(client, admin_token, statement_budget):
+    """Le nombre de requêtes SQL de la liste ne dépend pas du nombre de déclarations (pas de N+1)"""
+    from tests.conftest import TestingSessionLocal
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    def seed(prefix, count):
+        db = TestingSessionLocal()
+        try:
+            for i in range(count):
+                user = User(
+                    email=f"{prefix}{i}@test.com",
+                    hashed_password="x",
+                    first_name="Employé",
+                    last_name=str(i),
+                    role=UserRole.USER
+                )
+                db.add(user)
+                db.flush()
+                db.add(SicknessDeclaration(user_id=user.id, start_date=date(2024, 1, 15), end_date=date(2024, 1, 17)))
+            db.commit()
+        finally:
+            db.close()
+
+    # Première requête: lecture de l'utilisateur authentifié, mis en cache pour les suivantes
+    auth.principal_cache.clear()
+    response = client.get("/sickness-declarations/", headers=headers)
+    assert response.status_code == 200 and response.json() == []
+    assert len(statement_budget[-1]) == 2
+
+    seed("premier", 1)
+    response = client.get("/sickness-declarations/", headers=headers)
+    assert response.status_code == 200 and len(response.json()) == 1
+    # Une seule requête: déclarations et utilisateurs (jointure), authentification servie par le cache
+    assert len(statement_budget[-1]) == 1
+
+    seed("employe", 5)
+    response = client.get("/sickness-declarations/", headers=headers)
+    assert len(response.json()) == 6
+    assert {d["user"]["last_name"] for d in response.json()} == {"0", "1", "2", "3", "4"}
+    assert len(statement_budget[-1]) == 1
+
+class TestSicknessPdfDownload:
+    """Téléchargement du PDF: ETag, 304 et requêtes Range"""
+
+    @pytest.fixture
+    def pdf_declaration(self, tmp_path, admin_token):
+        import os
+        import hashlib
+        from tests.conftest import TestingSessionLocal
+        data = b"%PDF-1.4\n" + os.urandom(200 * 1024)
+        path = tmp_path / "certificat.pdf"
+        path.write_bytes(data)
+        db = TestingSessionLocal()
+        try:
+            user = db.query(User).first()
+            declaration = SicknessDeclaration(
+                user_id=user.id, start_date=date(2024, 1, 15), end_date=date(2024, 1, 17),
+                pdf_filename="certificat.pdf", pdf_path=str(path), pdf_sha256=hashlib.sha256(data).hexdigest()
+            )
+            db.add(declaration)
+            db.commit()
+            return declaration.id, declaration.pdf_sha256, data
+        finally:
+            db.close()
+
+    def test_full_download_has_validators(self, client, admin_token, pdf_declaration):
+        declaration_id, sha256, data = pdf_declaration
+        response = client.get(f"/sickness-declarations/{declaration_id}/pdf", headers={"Authorization": f"Bearer {admin_token}"})
+
+        assert response.status_code == 200
+        assert response.content == data
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.headers["content-disposition"] == 'inline; filename="certificat.pdf"'
+        assert response.headers["etag"] == f'"{sha256}"'
+        assert response.headers["accept-ranges"] == "bytes"
+        assert "last-modified" in response.headers
+
+    def test_matching_etag_returns_304(self, client, admin_token, pdf_declaration):
+        declaration_id, sha256, _ = pdf_declaration
+        headers = {"Authorization": f"Bearer {admin_token}", "If-None-Match": f'"{sha256}"'}
+        response = client.get(f"/sickness-declarations/{declaration_id}/pdf", headers=headers)
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == f'"{sha256}"'
+
+        headers["If-None-Match"] = '"autre"'
+        assert client.get(f"/sickness-declarations/{declaration_id}/pdf", headers=headers).status_code == 200
+
+    def test_if_modified_since_returns_304(self, client, admin_token, pdf_declaration):
+        declaration_id, _, _ = pdf_declaration
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        last_modified = client.get(f"/sickness-declarations/{declaration_id}/pdf", headers=headers).headers["last-modified"]
+
+        response = client.get(f"/sickness-declarations/{declaration_id}/pdf", headers={**headers, "If-Modified-Since": last_modified})
+        assert response.status_code == 304
+
+    def test_range_request(self, client, admin_token, pdf_declaration):
+        declaration_id, _, data = pdf_declaration
+        headers = {"Authorization": f"Bearer {admin_token}", "Range": "bytes=100-1123"}
+        response = client.get(f"/sickness-declarations/{declaration_id}/pdf", headers=headers)
+
+        assert response.status_code == 206
+        assert response.content == data[100:1124]
+        assert response.headers["content-range"] == f"bytes 100-1123/{len(data)}"
+        assert response.headers["content-length"] == "1024"
+
+        headers["Range"] = "bytes=-500"
+        response = client.get(f"/sickness-declarations/{declaration_id}/pdf", headers=headers)
+        assert response.status_code == 206
+        assert response.content == data[-500:]
+
+    def test_unsatisfiable_range_returns_416(self, client, admin_token, pdf_declaration):
+        declaration_id, _, data = pdf_declaration
+        headers = {"Authorization": f"Bearer {admin_token}", "Range": f"bytes={len(data)}-"}
+        response = client.get(f"/sickness-declarations/{declaration_id}/pdf", headers=headers)
+
+        assert response.status_code == 416
+        assert response.headers["content-range"] == f"bytes */{len(data)}"
+
+    def test_stale_if_range_serves_full_file(self, client, admin_token, pdf_declaration):
+        declaration_id, _, data = pdf_declaration
+        headers = {"Authorization": f"Bearer {admin_token}", "Range": "bytes=0-99", "If-Range": '"ancienne-version"'}
+        response = client.get(f"/sickness-declarations/{declaration_id}/pdf", headers=headers)
+
+        assert response.status_code == 200
+        assert response.content == data
+
+    def test_zerocopy_send_when_server_supports_it(self, tmp_path):
+        """Le serveur ASGI qui expose zerocopysend reçoit le descripteur et la plage, sans lecture du fichier"""
+        import os
+        import asyncio
+        from app.file_responses import RangeFileResponse
+        path = tmp_path / "certificat.pdf"
+        path.write_bytes(b"x" * 4096)
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        response = RangeFileResponse(str(path), byte_range=(10, 19), stat_result=os.stat(path), media_type="application/pdf")
+        asyncio.run(response({"type": "http", "extensions": {"http.response.zerocopysend": {}}}, None, send))
+
+        assert messages[0]["status"] == 206
+        assert messages[1]["type"] == "http.response.zerocopysend"
+        assert (messages[1]["offset"], messages[1]["count"]) == (10, 10)
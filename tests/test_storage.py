@@ -0,0 +1,312 @@
+import os
+import hashlib
+import threading
+import pytest
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import ANY, patch
+
+from app import crud
+from app.models import User, UserRole, SicknessDeclaration, StoredFile, StoredFileChunk
+from app.storage import DatabaseStorageBackend, LocalStorageBackend, S3StorageBackend, blob_key
+
+class S3StubHandler(BaseHTTPRequestHandler):
+    """Stub local d'un service compatible S3 (type MinIO): objets en mémoire, requêtes signées exigées"""
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _authorized(self):
+        authorization = self.headers.get("Authorization", "")
+        return authorization.startswith("AWS4-HMAC-SHA256 Credential=minio/") and self.headers.get("x-amz-date")
+
+    def do_HEAD(self):
+        self.server.log.append(("HEAD", self.path))
+        self._reply(200 if self.path in self.server.objects else 404)
+
+    def do_GET(self):
+        self.server.log.append(("GET", self.path))
+        if not self._authorized():
+            return self._reply(403)
+        data = self.server.objects.get(self.path)
+        self._reply(200, data) if data is not None else self._reply(404)
+
+    def do_PUT(self):
+        self.server.log.append(("PUT", self.path))
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        # S3 refuse un corps dont l'empreinte ne correspond pas à x-amz-content-sha256
+        if not self._authorized() or hashlib.sha256(data).hexdigest() != self.headers["x-amz-content-sha256"]:
+            return self._reply(400)
+        self.server.objects[self.path] = data
+        self._reply(200)
+
+    def do_DELETE(self):
+        self.server.log.append(("DELETE", self.path))
+        self.server.objects.pop(self.path, None)
+        self._reply(204)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def s3_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), S3StubHandler)
+    server.daemon_threads = True
+    server.objects = {}
+    server.log = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def s3_backend(s3_stub, tmp_path):
+    return S3StorageBackend("certificats", s3_stub.url, "minio", "minio-secret", cache_dir=tmp_path / "cache")
+
+def _temp_file(tmp_path, data: bytes, name: str = "upload.part"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path), hashlib.sha256(data).hexdigest()
+
+def test_s3_put_get_delete(s3_stub, s3_backend, tmp_path):
+    data = b"%PDF-1.4\n" + os.urandom(150 * 1024)
+    source, sha256 = _temp_file(tmp_path, data)
+
+    reference = s3_backend.put(blob_key(sha256), source)
+    assert reference == f"s3://certificats/{blob_key(sha256)}"
+    assert s3_stub.objects[f"/certificats/{blob_key(sha256)}"] == data
+    assert not os.path.exists(source)
+
+    with open(s3_backend.local_path(reference), "rb") as f:
+        assert f.read() == data
+    # Deuxième lecture servie par le cache local
+    s3_backend.local_path(reference)
+    assert [entry for entry in s3_stub.log if entry[0] == "GET"] == [("GET", f"/certificats/{blob_key(sha256)}")]
+
+    assert s3_backend.delete(reference)
+    assert s3_stub.objects == {}
+    with pytest.raises(FileNotFoundError):
+        s3_backend.local_path(reference)
+
+def test_s3_put_skips_existing_content(s3_stub, s3_backend, tmp_path):
+    data = os.urandom(1024)
+    first, sha256 = _temp_file(tmp_path, data, "a.part")
+    second, _ = _temp_file(tmp_path, data, "b.part")
+
+    s3_backend.put(blob_key(sha256), first)
+    s3_backend.put(blob_key(sha256), second)
+
+    assert [method for method, _ in s3_stub.log] == ["HEAD", "PUT", "HEAD"]
+    assert not os.path.exists(second)
+
+def test_local_backend_deduplicates(tmp_path):
+    backend = LocalStorageBackend(tmp_path / "store")
+    data = os.urandom(1024)
+    first, sha256 = _temp_file(tmp_path, data, "a.part")
+    second, _ = _temp_file(tmp_path, data, "b.part")
+
+    assert backend.put(blob_key(sha256), first) == backend.put(blob_key(sha256), second)
+    assert not os.path.exists(second)
+    assert len([path for path in (tmp_path / "store").rglob("*") if path.is_file()]) == 1
+
+class TestDatabaseStorage:
+    """Stockage en base par morceaux, relu via le cache disque local"""
+
+    @pytest.fixture
+    def backend(self, db, tmp_path):
+        from tests.conftest import engine
+        return DatabaseStorageBackend(engine, cache_dir=tmp_path / "cache", chunk_size=64 * 1024)
+
+    def test_roundtrip_in_chunks(self, db, backend, tmp_path):
+        data = b"%PDF-1.4\n" + os.urandom(1024 * 1024)
+        source, sha256 = _temp_file(tmp_path, data)
+
+        reference = backend.put(blob_key(sha256), source)
+
+        assert reference == f"db://{blob_key(sha256)}"
+        assert not os.path.exists(source)
+        assert db.query(StoredFileChunk).filter(StoredFileChunk.sha256 == sha256).count() == len(data) // (64 * 1024) + 1
+        with open(backend.local_path(reference), "rb") as f:
+            assert f.read() == data
+
+    def test_survives_instance_recycling(self, db, backend, tmp_path):
+        """Un nouveau cache vide (instance recyclée) relit le contenu depuis la base"""
+        from tests.conftest import engine
+        data = os.urandom(200 * 1024)
+        source, sha256 = _temp_file(tmp_path, data)
+        reference = backend.put(blob_key(sha256), source)
+        backend.local_path(reference)
+
+        recycled = DatabaseStorageBackend(engine, cache_dir=tmp_path / "nouveau-cache")
+        with open(recycled.local_path(reference), "rb") as f:
+            assert f.read() == data
+
+    def test_hot_files_are_served_from_cache(self, db, backend, tmp_path, query_counter):
+        source, sha256 = _temp_file(tmp_path, os.urandom(10 * 1024))
+        reference = backend.put(blob_key(sha256), source)
+        first = backend.local_path(reference)
+
+        with query_counter() as statements:
+            assert backend.local_path(reference) == first
+        assert statements == []
+
+    def test_cache_evicts_least_recently_used(self, db, tmp_path):
+        from tests.conftest import engine
+        backend = DatabaseStorageBackend(engine, cache_dir=tmp_path / "cache", cache_max_bytes=150 * 1024)
+        references = []
+        for name in ("a", "b"):
+            source, sha256 = _temp_file(tmp_path, os.urandom(100 * 1024), f"{name}.part")
+            references.append(backend.put(blob_key(sha256), source))
+
+        first = backend.local_path(references[0])
+        backend.local_path(references[1])
+
+        assert not os.path.exists(first)
+        # Toujours disponible depuis la base
+        assert os.path.getsize(backend.local_path(references[0])) == 100 * 1024
+
+    def test_identical_content_stored_once(self, db, backend, tmp_path):
+        data = os.urandom(100 * 1024)
+        first, sha256 = _temp_file(tmp_path, data, "a.part")
+        second, _ = _temp_file(tmp_path, data, "b.part")
+
+        assert backend.put(blob_key(sha256), first) == backend.put(blob_key(sha256), second)
+        assert db.query(StoredFileChunk).count() == 2
+
+    def test_delete_removes_chunks_and_cache(self, db, backend, tmp_path):
+        source, sha256 = _temp_file(tmp_path, os.urandom(1024))
+        reference = backend.put(blob_key(sha256), source)
+        cached = backend.local_path(reference)
+
+        assert backend.delete(reference)
+        assert not os.path.exists(cached)
+        assert db.query(StoredFileChunk).count() == 0
+        with pytest.raises(FileNotFoundError):
+            backend.local_path(reference)
+
+    def test_empty_file(self, db, backend, tmp_path):
+        source, sha256 = _temp_file(tmp_path, b"")
+        reference = backend.put(blob_key(sha256), source)
+        assert os.path.getsize(backend.local_path(reference)) == 0
+
+    def test_last_reference_deleted_in_same_transaction(self, db, backend, tmp_path, monkeypatch):
+        """Les morceaux sont supprimés avec la ligne stored_files, sur la connexion de la session"""
+        from app.crud.files import file_service
+        monkeypatch.setattr(file_service, "storage", backend)
+        user = User(email="db@test.com", hashed_password="x", first_name="D", last_name="B", role=UserRole.USER)
+        db.add(user)
+        db.commit()
+        declaration = SicknessDeclaration(user_id=user.id, start_date=date(2024, 3, 4), end_date=date(2024, 3, 5))
+        db.add(declaration)
+        db.commit()
+        source, sha256 = _temp_file(tmp_path, os.urandom(1024))
+        reference = backend.put(blob_key(sha256), source)
+        crud.update_sickness_declaration_file(db, declaration.id, "arret.pdf", reference, sha256)
+
+        assert crud.delete_sickness_declaration(db, declaration.id)
+        assert db.query(StoredFileChunk).count() == 0
+        assert crud.get_stored_file(db, sha256) is None
+
+class TestStoredFileReferences:
+    """Comptage des références: le fichier n'est supprimé qu'avec sa dernière déclaration"""
+
+    @pytest.fixture
+    def user(self, db):
+        user = User(email="refcount@test.com", hashed_password="x", first_name="Ref", last_name="Count", role=UserRole.USER)
+        db.add(user)
+        db.commit()
+        return user
+
+    def _declaration(self, db, user):
+        declaration = SicknessDeclaration(user_id=user.id, start_date=date(2024, 3, 4), end_date=date(2024, 3, 5))
+        db.add(declaration)
+        db.commit()
+        return declaration
+
+    def test_file_deleted_when_last_reference_released(self, db, user):
+        sha256 = "a" * 64
+        first = self._declaration(db, user)
+        second = self._declaration(db, user)
+        crud.update_sickness_declaration_file(db, first.id, "arret.pdf", "/stockage/aa.pdf", sha256)
+        crud.update_sickness_declaration_file(db, second.id, "arret.pdf", "/stockage/aa.pdf", sha256)
+        assert crud.get_stored_file(db, sha256).ref_count == 2
+
+        with patch("app.crud.files.file_service.delete_file") as delete_file:
+            crud.delete_sickness_declaration(db, first.id)
+            delete_file.assert_not_called()
+            assert crud.get_stored_file(db, sha256).ref_count == 1
+
+            crud.delete_sickness_declaration(db, second.id)
+            delete_file.assert_called_once_with("/stockage/aa.pdf", connection=ANY)
+        assert crud.get_stored_file(db, sha256) is None
+
+    def test_replacing_file_releases_previous_content(self, db, user):
+        declaration = self._declaration(db, user)
+        crud.update_sickness_declaration_file(db, declaration.id, "v1.pdf", "/stockage/v1.pdf", "1" * 64)
+
+        with patch("app.crud.files.file_service.delete_file") as delete_file:
+            crud.update_sickness_declaration_file(db, declaration.id, "v2.pdf", "/stockage/v2.pdf", "2" * 64)
+        delete_file.assert_called_once_with("/stockage/v1.pdf", connection=ANY)
+        assert db.query(StoredFile).count() == 1
+
+    def test_reserved_content_survives_release_of_last_reference(self, db, user):
+        """Une référence réservée avant le dépôt empêche la suppression du contenu déjà présent"""
+        sha256 = "b" * 64
+        first = self._declaration(db, user)
+        crud.update_sickness_declaration_file(db, first.id, "arret.pdf", "/stockage/bb.pdf", sha256)
+
+        # Nouveau dépôt du même contenu: référence acquise avant put (qui ignore le doublon)
+        crud.reserve_stored_file(db, sha256, "/stockage/bb.pdf")
+        with patch("app.crud.files.file_service.delete_file") as delete_file:
+            crud.delete_sickness_declaration(db, first.id)
+        delete_file.assert_not_called()
+
+        second = self._declaration(db, user)
+        crud.update_sickness_declaration_file(db, second.id, "arret.pdf", "/stockage/bb.pdf", sha256, reference_held=True)
+        assert crud.get_stored_file(db, sha256).ref_count == 1
+
+    def test_abandoned_upload_releases_reservation(self, db, user):
+        crud.reserve_stored_file(db, "c" * 64, "/stockage/cc.pdf")
+        with patch("app.crud.files.file_service.delete_file") as delete_file:
+            crud.cancel_stored_file(db, "c" * 64)
+        delete_file.assert_called_once_with("/stockage/cc.pdf", connection=ANY)
+        assert crud.get_stored_file(db, "c" * 64) is None
+
+    def test_legacy_file_without_hash_is_kept(self, db, user):
+        declaration = self._declaration(db, user)
+        crud.update_sickness_declaration_file(db, declaration.id, "ancien.pdf", "/uploads/ancien.pdf")
+
+        with patch("app.crud.files.file_service.delete_file") as delete_file:
+            crud.delete_sickness_declaration(db, declaration.id)
+        delete_file.assert_not_called()
+
+def test_failed_upload_releases_stored_content(client, user_token, tmp_path, monkeypatch):
+    """Une erreur après le dépôt du PDF libère sa référence et supprime le contenu inutilisé"""
+    from app.file_service import FileService
+    from app.calendar_sync_service import calendar_sync_service
+    from app.routes import sickness_declarations
+    from tests.conftest import TestingSessionLocal
+
+    monkeypatch.setenv("UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(sickness_declarations, "file_service", FileService())
+    with patch.object(calendar_sync_service, "request", side_effect=RuntimeError("calendrier indisponible")):
+        response = client.post(
+            "/sickness-declarations/",
+            data={"start_date": "2030-01-06", "end_date": "2030-01-08"},
+            files={"pdf_file": ("arret.pdf", b"%PDF-1.4 arret", "application/pdf")},
+            headers={"Authorization": f"Bearer {user_token}"}
+        )
+    assert response.status_code == 400
+
+    db = TestingSessionLocal()
+    try:
+        assert db.query(StoredFile).count() == 0
+    finally:
+        db.close()
+    assert [path for path in (tmp_path / "uploads").rglob("*") if path.is_file()] == []
@@ -65,6 +65,16 @@ class TestUsers:
         assert isinstance(data, list)
         assert len(data) >= 1  # Au moins l'admin
     
+    def test_get_users_with_cursor(self, client, admin_token, user_token):
+        """Test pagination par curseur de la liste des utilisateurs"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        first = client.get("/users/", params={"cursor": "", "limit": 1}, headers=headers).json()
+        assert len(first["items"]) == 1 and first["next_cursor"]
+        
+        second = client.get("/users/", params={"cursor": first["next_cursor"], "limit": 1}, headers=headers).json()
+        assert second["next_cursor"] is None
+        assert {first["items"][0]["email"], second["items"][0]["email"]} == {"admin@test.com", "user@test.com"}
+    
     def test_get_users_as_user_forbidden(self, client, user_token):
         """Test récupération de la liste des utilisateurs par un utilisateur normal (interdit)"""
         response = client.get("/users/", headers={"Authorization": f"Bearer {user_token}"})